@@ -1,6 +1,7 @@
 __all__ = [
     "BaseS3Wrapper",
     "AWSClient",
+    "AWSClientRegistry",
     "S3Client",
     "BaseSQSWrapper",
     "SQSClient",
@@ -9,10 +10,12 @@ __all__ = [
     "constant",
     "SchedulerClientWrapper",
     "SNSClient",
-    "BaseSNSWrapper"
+    "BaseSNSWrapper",
+    "OffloadExecutor",
 ]
 
 from .constants import constant
-from .wrappers import (AWSClient, BaseS3Wrapper, BaseSQSWrapper, Presigner,
-                       RedisProducerConsumerManager, S3Client,
+from .offload_executor import OffloadExecutor
+from .wrappers import (AWSClient, AWSClientRegistry, BaseS3Wrapper,
+                       BaseSQSWrapper, Presigner, RedisProducerConsumerManager, S3Client,
                        SchedulerClientWrapper, SQSClient, SNSClient, BaseSNSWrapper)
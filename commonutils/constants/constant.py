@@ -12,6 +12,11 @@ DEFAULTS = {
         "MAX_FILE_SIZE_IN_BYTES": (10**6) * 5,
         "ALLOWED_SUCCESS_ACTION_STATUS": {"200", "201", "204"},
     },
+    "MULTIPART": {
+        "PART_SIZE_IN_BYTES": 8 * 1024 * 1024,
+        "MAX_CONCURRENCY": 4,
+        "COPY_PART_SIZE_IN_BYTES": 512 * 1024 * 1024,
+    },
 }
 
 EVENT_SCHEDULER_CREATE_DEFINITION = {
@@ -41,6 +46,10 @@ class Constant:
     SCHEDULER_NAME = "Name"
     AWS_DOMAIN = "amazonaws.com"
     AWS_SIGNED_HEADERS = "host;x-amz-date"
+    SQS_MAX_BATCH_ENTRIES = 10
+    SQS_MAX_PAYLOAD_SIZE = 256 * 1024
+    SQS_MAX_DELAY_SECONDS = 900
+    S3_MAX_DELETE_BATCH_KEYS = 1000
 
 
 @unique
@@ -67,6 +76,7 @@ class DelayQueueTime(Enum):
 class AwsErrorType(Enum):
     SQSNotExist = "AWS.SimpleQueueService.NonExistentQueue"
     SQSRequestSizeExceeded = "AWS.SimpleQueueService.BatchRequestTooLong"
+    SQSMessageTooLong = "MessageTooLong"
 
 
 class EventBridgeSchedulerType(CustomEnum):
@@ -32,3 +32,20 @@ class ErrorMessages(Enum):
     PARAMETERS_NOT_ALLOWED = "Parameters {param_key} not allowed for {queue_name}"
     AwsSQSPayloadSize = "Payload size exceeds SQS limit of 256 KBs."
     AwsSQSPublishError = "Error publishing to sqs: {error}, retrying count: {count}"
+    AwsSQSInvalidDelaySeconds = "delay_seconds must be between 0 and {max_delay}, got {delay_seconds}"
+    AwsSQSInvalidCodec = "Invalid SQS payload codec: {codec}"
+    AwsSQSCodecNotInstalled = "SQS payload codec requires {package} to be installed"
+    AwsS3TooManyParts = "Multipart upload exceeds {max_parts} parts, use a bigger part size"
+    AwsS3IncompleteRead = "Incomplete read of {key} bytes {start}-{end}"
+    AwsS3ChecksumMismatch = "Downloaded content of {key} does not match its ETag {etag}"
+    AwsS3DeleteKeysMissing = "Either keys or prefix is required to delete files"
+    AwsS3DeleteError = "Exception while deleting S3 keys: {error}, attempt: {count}"
+    AwsS3PresignExpiryTooLong = "SigV4 presigned URLs expire in at most {max_expiry} seconds, got {expires_in}"
+    AwsS3SyncLocalToLocal = "S3 sync needs an s3:// source or destination, got {source} and {destination}"
+    SchedulerInvalidExpression = "Invalid schedule expression {expression}: {reason}"
+    SchedulerNotFound = "Schedule {name} does not exist in group {group}"
+    SchedulerConflict = "Schedule {name} already exists in group {group}"
+    SchedulerGroupNotFound = "Schedule group {group} does not exist"
+    SchedulerTargetNotFound = "No handler or producer for schedule target {arn}"
+    SchedulerUnsupportedCall = "Unsupported local scheduler call {method} {path}"
+    SchedulerInvalidSpec = "Invalid schedule {name}: {reason}"
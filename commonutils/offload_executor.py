@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class OffloadExecutor:
+    """
+    Process-wide thread pool for blocking work (botocore calls, file IO) run from the event loop.
+    Threads are created once and reused instead of one executor (and thread) per call.
+    Usage:
+        OffloadExecutor.configure(max_workers=8)  # optional, before the first run()
+        arn = await OffloadExecutor.run(client.get_function, FunctionName=name)
+        OffloadExecutor.stats()  # queue depth and time spent waiting / running
+    """
+
+    _executor = None
+    _max_workers = min(32, (os.cpu_count() or 1) + 4)
+    _lock = threading.Lock()
+    _stats = {
+        "submitted": 0,
+        "running": 0,
+        "completed": 0,
+        "failed": 0,
+        "wait_time_total": 0.0,
+        "wait_time_max": 0.0,
+        "run_time_total": 0.0,
+    }
+
+    @classmethod
+    def configure(cls, max_workers: int):
+        """
+        Resize the pool, running calls finish on the previous one.
+        """
+        previous_executor = cls._executor
+        cls._max_workers = max_workers
+        cls._executor = None
+        if previous_executor is not None:
+            previous_executor.shutdown(wait=False)
+
+    @classmethod
+    async def run(cls, func, *args, **kwargs):
+        """
+        :return: result of func(*args, **kwargs), run in the shared pool
+        """
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            cls._stats["submitted"] += 1
+        return await loop.run_in_executor(
+            cls._get_executor(),
+            partial(cls._run_measured, time.monotonic(), func, *args, **kwargs),
+        )
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: counters since start, queued is the number of calls waiting for a thread
+        """
+        with cls._lock:
+            stats = dict(cls._stats)
+        stats["queued"] = (
+            stats["submitted"] - stats["running"] - stats["completed"] - stats["failed"]
+        )
+        stats["max_workers"] = cls._max_workers
+        return stats
+
+    @classmethod
+    def shutdown(cls, wait: bool = True):
+        executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=cls._max_workers,
+                        thread_name_prefix="commonutils-offload",
+                    )
+        return cls._executor
+
+    @classmethod
+    def _run_measured(cls, submitted_at, func, *args, **kwargs):
+        started_at = time.monotonic()
+        wait_time = started_at - submitted_at
+        with cls._lock:
+            cls._stats["running"] += 1
+            cls._stats["wait_time_total"] += wait_time
+            cls._stats["wait_time_max"] = max(cls._stats["wait_time_max"], wait_time)
+        outcome = "failed"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "completed"
+            return result
+        finally:
+            with cls._lock:
+                cls._stats["running"] -= 1
+                cls._stats[outcome] += 1
+                cls._stats["run_time_total"] += time.monotonic() - started_at
@@ -1,5 +1,6 @@
 __all__ = [
     "AWSClient",
+    "AWSClientRegistry",
     "BaseS3Wrapper",
     "S3Client",
     "BaseSQSWrapper",
@@ -10,6 +11,7 @@ __all__ = [
 ]
 
 
-from .aws import (AWSClient, BaseS3Wrapper, BaseSQSWrapper, Presigner,
-                  S3Client, SchedulerClientWrapper, SQSClient, SNSClient, BaseSNSWrapper)
+from .aws import (AWSClient, AWSClientRegistry, BaseS3Wrapper, BaseSQSWrapper,
+                  Presigner, S3Client, SchedulerClientWrapper, SQSClient, SNSClient,
+                  BaseSNSWrapper)
 from .producer_consumer import RedisProducerConsumerManager
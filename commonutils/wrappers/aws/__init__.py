@@ -1,10 +1,19 @@
 __all__ = [
     "AWSClient",
+    "AWSClientRegistry",
     "BaseS3Wrapper",
     "S3Client",
+    "S3Object",
+    "S3Sync",
     "BaseSQSWrapper",
     "SQSClient",
+    "BufferedSQSProducer",
+    "PayloadCodec",
+    "LargePayloadStore",
     "Presigner",
+    "PresignedUrlCache",
+    "LocalScheduler",
+    "ResolutionCache",
     "SchedulerClientWrapper",
     "BaseLambdaWrapper",
     "SNSClient",
@@ -12,8 +21,12 @@ __all__ = [
 ]
 
 from .aws_client import AWSClient
-from .event_bridge_scheduler import SchedulerClientWrapper
+from .client_registry import AWSClientRegistry
+from .event_bridge_scheduler import LocalScheduler, SchedulerClientWrapper
 from .lambdaa import BaseLambdaWrapper
-from .s3 import BaseS3Wrapper, Presigner, S3Client
-from .sqs import BaseSQSWrapper, SQSClient
+from .resolution_cache import ResolutionCache
+from .s3 import (BaseS3Wrapper, PresignedUrlCache, Presigner, S3Client,
+                 S3Object, S3Sync)
+from .sqs import (BaseSQSWrapper, BufferedSQSProducer, LargePayloadStore,
+                  PayloadCodec, SQSClient)
 from .sns import BaseSNSWrapper, SNSClient
@@ -3,10 +3,12 @@ from aiobotocore.endpoint import MAX_POOL_CONNECTIONS
 from aiobotocore.session import get_session
 
 from ...constants import ErrorMessages
+from .dns_resolver import TTLCachingResolver
 
 
 class AWSClient:
     DEFAULT_TIMEOUT_IN_SECONDS = 10
+    DEFAULT_KEEPALIVE_TIMEOUT_IN_SECONDS = 12
 
     @classmethod
     async def create_aws_client(
@@ -17,8 +19,22 @@ class AWSClient:
         aws_access_key_id=None,
         **kwargs
     ):
+        """
+        Connection pool arguments (all optional):
+        :param max_pool_connections: max connections of the client, CONCURRENCY_LIMIT when not set
+        :param concurrency_limit: max connections, used when max_pool_connections is not set
+        :param concurrency_limit_host: accepted for compatibility, aiobotocore has no per host limit
+        :param keepalive_timeout: seconds an idle connection is kept open (default 12, like
+        aiobotocore), not used with force_close
+        :param ttl_dns_cache: seconds DNS lookups are cached for
+        :param force_close: close connections after each request
+        :param proxies: {scheme: proxy url}
+        :param proxies_config: botocore proxies_config (CA bundle, client cert)
+        TCP_NODELAY is always set by aiohttp on its connections.
+        :param session: aiobotocore session the client is created from, a new one when not set
+        """
         try:
-            session = get_session()
+            session = kwargs.get("session") or get_session()
 
             connect_timeout = (
                 kwargs.get("connect_timeout") or cls.DEFAULT_TIMEOUT_IN_SECONDS
@@ -27,16 +43,18 @@ class AWSClient:
             signature_version = kwargs.get("signature_version", None)
             endpoint_url = kwargs.get("endpoint_url")
             max_pool_connections = (
-                kwargs.get("max_pool_connections") or MAX_POOL_CONNECTIONS
+                kwargs.get("max_pool_connections")
+                or kwargs.get("concurrency_limit")
+                or MAX_POOL_CONNECTIONS
             )
-            # _connector_args = {'limit': kwargs.get('concurrency_limit') or 0,
-            #                    'limit_per_host': kwargs.get('concurrency_limit_host') or 0,
-            #                    'enable_cleanup_closed': True}
             config = AioConfig(
                 connect_timeout=connect_timeout,
                 read_timeout=read_timeout,
                 signature_version=signature_version,
                 max_pool_connections=max_pool_connections,
+                proxies=kwargs.get("proxies"),
+                proxies_config=kwargs.get("proxies_config"),
+                connector_args=cls._get_connector_args(**kwargs),
             )
             client_args = {
                 "service_name": aws_service_name,
@@ -50,3 +68,81 @@ class AWSClient:
             return client
         except Exception as error:
             raise Exception(ErrorMessages.AwsConnectionError.value.format(error=error))
+
+    @classmethod
+    def get_connection_pool_stats(cls, client):
+        """
+        :return: connection pool usage of an entered client, None when it has no open pool.
+        acquired == limit means requests are queueing for a connection (pool saturated).
+        acquired, acquired_per_host and waiting come from aiohttp internals, they are None when
+        the installed aiohttp does not have them.
+        """
+        connector = cls._get_connector(client)
+        if connector is None:
+            return None
+        acquired_per_host = getattr(connector, "_acquired_per_host", None)
+        if hasattr(acquired_per_host, "items"):
+            acquired_per_host = {
+                getattr(key, "host", str(key)): cls._count(connections)
+                for key, connections in acquired_per_host.items()
+            }
+        else:
+            acquired_per_host = None
+        waiters = getattr(connector, "_waiters", None)
+        waiting = None
+        if hasattr(waiters, "values"):
+            waiting = sum(cls._count(keyed) or 0 for keyed in waiters.values())
+        return {
+            "limit": getattr(connector, "limit", None),
+            "limit_per_host": getattr(connector, "limit_per_host", None),
+            "acquired": cls._count(getattr(connector, "_acquired", None)),
+            "acquired_per_host": acquired_per_host,
+            "waiting": waiting,
+        }
+
+    @staticmethod
+    def _count(items):
+        try:
+            return len(items)
+        except TypeError:
+            return None
+
+    @staticmethod
+    def get_connection_config(config: dict):
+        """
+        Connection pool arguments from a wrapper config
+        :param config: service config, uses KEEPALIVE_TIMEOUT, DNS_CACHE_TTL, FORCE_CLOSE,
+        PROXIES and PROXIES_CONFIG
+        """
+        config = config or {}
+        connection_config = {
+            "keepalive_timeout": config.get("KEEPALIVE_TIMEOUT"),
+            "ttl_dns_cache": config.get("DNS_CACHE_TTL"),
+            "force_close": config.get("FORCE_CLOSE"),
+            "proxies": config.get("PROXIES"),
+            "proxies_config": config.get("PROXIES_CONFIG"),
+        }
+        return {k: v for k, v in connection_config.items() if v is not None}
+
+    @classmethod
+    def _get_connector_args(cls, **kwargs):
+        connector_args = {}
+        if kwargs.get("force_close"):
+            # aiohttp refuses a keepalive_timeout on connections closed after each request
+            connector_args["force_close"] = True
+            connector_args["keepalive_timeout"] = None
+        elif kwargs.get("keepalive_timeout") is not None:
+            connector_args["keepalive_timeout"] = kwargs["keepalive_timeout"]
+        else:
+            connector_args["keepalive_timeout"] = cls.DEFAULT_KEEPALIVE_TIMEOUT_IN_SECONDS
+        if kwargs.get("ttl_dns_cache") is not None:
+            # connector's own dns cache has a fixed ttl, so it is replaced by the resolver
+            connector_args["use_dns_cache"] = False
+            connector_args["resolver"] = TTLCachingResolver(kwargs["ttl_dns_cache"])
+        return connector_args
+
+    @staticmethod
+    def _get_connector(client):
+        endpoint = getattr(client, "_endpoint", None)
+        http_session = getattr(endpoint, "http_session", None)
+        return getattr(http_session, "_connector", None)
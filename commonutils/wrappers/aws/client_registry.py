@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+
+from aiobotocore.endpoint import MAX_POOL_CONNECTIONS
+
+from .aws_client import AWSClient
+
+logger = logging.getLogger()
+
+
+class AWSClientRegistry:
+    """
+    Process-wide registry of aiobotocore clients.
+    Wrappers asking for a client with the same service, region, endpoint, credentials and config
+    share one client (and its connection pool). Clients are reference counted and closed when
+    the last wrapper releases them, close_all() closes everything left on app shutdown.
+    Usage (Sanic):
+        async def warm_up_aws_clients(_app, loop):
+            await AWSClientRegistry.warm_up({"aws_service_name": "sqs", "region_name": "ap-south-1"})
+
+        async def close_aws_clients(_app, loop):
+            await AWSClientRegistry.close_all()
+    """
+
+    _entries = {}
+    _keys_by_client = {}
+    _locks = {}  # key -> [lock, number of acquire calls using it]
+
+    @classmethod
+    async def acquire(
+        cls,
+        aws_service_name: str,
+        region_name: str,
+        aws_secret_access_key=None,
+        aws_access_key_id=None,
+        **kwargs
+    ):
+        """
+        :return: entered aiobotocore client, release it with release() once done
+        Accepts the same arguments as AWSClient.create_aws_client.
+        """
+        key = cls._get_key(
+            aws_service_name,
+            region_name,
+            aws_secret_access_key,
+            aws_access_key_id,
+            **kwargs
+        )
+        lock = cls._locks.setdefault(key, [asyncio.Lock(), 0])
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                entry = cls._entries.get(key)
+                if entry is None:
+                    client_context = await AWSClient.create_aws_client(
+                        aws_service_name,
+                        region_name=region_name,
+                        aws_secret_access_key=aws_secret_access_key,
+                        aws_access_key_id=aws_access_key_id,
+                        **kwargs
+                    )
+                    client = await client_context.__aenter__()
+                    entry = {
+                        "context": client_context,
+                        "client": client,
+                        "references": 0,
+                    }
+                    cls._entries[key] = entry
+                    cls._keys_by_client[id(client)] = key
+                entry["references"] += 1
+                return entry["client"]
+        finally:
+            lock[1] -= 1
+            if lock[1] == 0:
+                # only needed while a client is being created, so locks do not pile up
+                del cls._locks[key]
+
+    @classmethod
+    async def release(cls, client):
+        """
+        Drop a reference to client, it is closed once no reference is left.
+        Clients not created by the registry are closed right away.
+        """
+        if client is None:
+            return
+        key = cls._keys_by_client.get(id(client))
+        if key is None:
+            await client.close()
+            return
+        entry = cls._entries[key]
+        entry["references"] -= 1
+        if entry["references"] <= 0:
+            await cls._close(key)
+
+    @classmethod
+    async def warm_up(cls, *client_specs: dict):
+        """
+        Create clients ahead of the first request, each spec holds the arguments of acquire().
+        Arguments are compared by their effective value (unset timeouts and pool sizes are the
+        AWSClient defaults), so a spec matching a wrapper's config warms the wrapper's client.
+        The registry keeps a reference to these clients until close_all().
+        """
+        await asyncio.gather(*[cls.acquire(**spec) for spec in client_specs])
+
+    @classmethod
+    async def close_all(cls):
+        for key in list(cls._entries):
+            await cls._close(key)
+
+    @classmethod
+    def stats(cls):
+        return [
+            {
+                "service": key[0],
+                "region": key[1],
+                "endpoint_url": key[2],
+                "references": entry["references"],
+                "connection_pool": AWSClient.get_connection_pool_stats(
+                    entry["client"]
+                ),
+            }
+            for key, entry in cls._entries.items()
+        ]
+
+    @classmethod
+    async def _close(cls, key):
+        entry = cls._entries.pop(key, None)
+        if entry is None:
+            return
+        cls._keys_by_client.pop(id(entry["client"]), None)
+        try:
+            await entry["context"].__aexit__(None, None, None)
+        except Exception as e:
+            logger.info("Exception while closing {} client {}".format(key[0], str(e)))
+
+    @staticmethod
+    def _get_key(
+        aws_service_name,
+        region_name,
+        aws_secret_access_key,
+        aws_access_key_id,
+        **kwargs
+    ):
+        secret_hash = None
+        if aws_secret_access_key:
+            secret_hash = hashlib.sha256(aws_secret_access_key.encode()).hexdigest()
+        kwargs = AWSClientRegistry._get_effective_kwargs(**kwargs)
+        return (
+            aws_service_name,
+            region_name,
+            kwargs.get("endpoint_url"),
+            aws_access_key_id or None,
+            secret_hash,
+            repr(sorted((k, v) for k, v in kwargs.items() if v is not None)),
+        )
+
+    @staticmethod
+    def _get_effective_kwargs(**kwargs):
+        """
+        :return: kwargs with the values AWSClient falls back to, wrappers pass 0 / None / ""
+        for settings that are not configured
+        """
+        default_timeout = AWSClient.DEFAULT_TIMEOUT_IN_SECONDS
+        effective_kwargs = {k: v for k, v in kwargs.items() if v not in (None, "", 0)}
+        effective_kwargs["connect_timeout"] = (
+            kwargs.get("connect_timeout") or default_timeout
+        )
+        effective_kwargs["read_timeout"] = kwargs.get("read_timeout") or default_timeout
+        effective_kwargs["max_pool_connections"] = (
+            kwargs.get("max_pool_connections")
+            or kwargs.get("concurrency_limit")
+            or MAX_POOL_CONNECTIONS
+        )
+        effective_kwargs.pop("concurrency_limit", None)
+        # not applied by AWSClient
+        effective_kwargs.pop("concurrency_limit_host", None)
+        if not kwargs.get("force_close"):
+            keepalive_timeout = kwargs.get("keepalive_timeout")
+            if keepalive_timeout is None:
+                keepalive_timeout = AWSClient.DEFAULT_KEEPALIVE_TIMEOUT_IN_SECONDS
+            effective_kwargs["keepalive_timeout"] = keepalive_timeout
+        return effective_kwargs
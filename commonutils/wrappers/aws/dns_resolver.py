@@ -0,0 +1,31 @@
+import socket
+import time
+
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+
+class TTLCachingResolver(AbstractResolver):
+    """
+    aiohttp resolver caching lookups for ttl seconds.
+    aiobotocore does not expose the ttl_dns_cache argument of TCPConnector, passing this
+    resolver (with use_dns_cache disabled) gives the same control.
+    """
+
+    def __init__(self, ttl: float, resolver: AbstractResolver = None):
+        self.ttl = ttl
+        self._resolver = resolver or DefaultResolver()
+        self._cache = {}
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        key = (host, port, family)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        hosts = await self._resolver.resolve(host, port, family)
+        self._cache[key] = (time.monotonic() + self.ttl, hosts)
+        return hosts
+
+    async def close(self):
+        self._cache.clear()
+        await self._resolver.close()
@@ -1,4 +1,12 @@
-__all__ = ["EventBridgeSchedulerClient", "SchedulerClientWrapper"]
+__all__ = [
+    "EventBridgeSchedulerClient",
+    "LocalScheduler",
+    "ScheduleExpression",
+    "SchedulerAPIException",
+    "SchedulerClientWrapper",
+]
 
 from .event_bridge_scheduler_client import EventBridgeSchedulerClient
-from .scheduler_client import SchedulerClientWrapper
+from .local_scheduler import LocalScheduler
+from .schedule_expression import ScheduleExpression
+from .scheduler_client import SchedulerAPIException, SchedulerClientWrapper
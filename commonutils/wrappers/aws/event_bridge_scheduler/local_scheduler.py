@@ -0,0 +1,451 @@
+import asyncio
+import copy
+import heapq
+import itertools
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+from commonutils.constants import Constant, ErrorMessages, EventBridgeSchedulerType
+
+from .schedule_expression import DEFAULT_TIMEZONE, parse_schedule_expression
+from .scheduler_client import SchedulerAPIException
+
+logger = logging.getLogger()
+
+
+class LocalScheduler:
+    """
+    In-process EventBridge Scheduler, plugged into SchedulerClientWrapper as its backend:
+        scheduler = LocalScheduler(handlers={"reminders": ReminderHandler})
+        wrapper = SchedulerClientWrapper(config, backend=scheduler)
+        await wrapper.initialize_event_scheduler(ReminderHandler)
+        await wrapper.create_sqs_event_schedule("reminder-1", "rate(1 minute)", msg=payload)
+    The wrapper API is unchanged but no call leaves the process, which also makes it a
+    stand-in for EventBridge in tests. Schedules are kept in a heap ordered by next fire time
+    and the target Input is delivered directly to the SQSHandler of the target queue / lambda
+    (handlers), or pushed with a RedisProducerConsumerManager (producer) when the target has
+    no handler. Failed deliveries are retried after milliseconds, following the RetryPolicy
+    of the schedule.
+    With redis_wrapper, schedules are persisted in a hash and their next fire times in a sorted
+    set, and loaded back by start(); a fire missed while the process was down is delivered
+    once. Use one LocalScheduler per redis_key_prefix. redis_wrapper must expose hset, hdel,
+    hgetall, zadd(key, {member: score}), zrem and zrange(key, start, end, withscores=True).
+    """
+
+    LOCAL_ACCOUNT_ID = "000000000000"
+    DEFAULT_RETRY_BACKOFF = 0.05  # seconds, doubled on every retry
+    MAX_RETRY_BACKOFF = 60
+    DEFAULT_MAX_EVENT_AGE = 86400
+    # returned by the API but not accepted in a create / update
+    READ_ONLY_FIELDS = {"Arn", "ClientToken", "CreationDate", "LastModificationDate"}
+
+    def __init__(
+        self,
+        handlers: dict = None,
+        producer=None,
+        redis_wrapper=None,
+        redis_key_prefix: str = "commonutils:local_scheduler:",
+        region: str = "ap-south-1",
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        delete_after_completion: bool = True,
+    ):
+        """
+        :param handlers: {queue or lambda name: SQSHandler} called with the Input of the schedule
+        :param producer: RedisProducerConsumerManager the Input is pushed to, for targets
+        without a handler
+        :param redis_wrapper: optional persistence of the schedules
+        :param redis_key_prefix: prefix of the redis keys
+        :param region: region of the ARNs returned to the wrapper
+        :param retry_backoff: delay before the first retry of a failed delivery, in seconds
+        :param delete_after_completion: delete one time (at) schedules once delivered, like
+        ActionAfterCompletion DELETE
+        """
+        self.handlers = dict(handlers or {})
+        self.producer = producer
+        self.redis_wrapper = redis_wrapper
+        self.definitions_key = redis_key_prefix + "definitions"
+        self.fire_times_key = redis_key_prefix + "fire_times"
+        self.region = region
+        self.retry_backoff = retry_backoff
+        self.delete_after_completion = delete_after_completion
+        self._schedules = {}  # (group, name) -> schedule
+        self._groups = {"default"}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._loop_task = None
+        self._deliveries = set()
+
+    async def start(self, event_handler=None, queue_name: str = None):
+        """
+        Loads persisted schedules and starts firing them
+        :param event_handler: SQSHandler of queue_name, added to handlers
+        """
+        if event_handler is not None and queue_name:
+            self.handlers.setdefault(queue_name, event_handler)
+        if self._loop_task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        if self.redis_wrapper is not None:
+            await self._load()
+        self._loop_task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """
+        Stops firing schedules, in-flight deliveries are awaited
+        """
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    def get_target_arn(self, target_type: str, target_resource_name: str):
+        """
+        :return: local ARN of a queue / lambda, its last segment is target_resource_name
+        """
+        if target_type.strip() == EventBridgeSchedulerType.LAMBDA.value:
+            service, resource = "lambda", "function:" + target_resource_name
+        else:
+            service, resource = "sqs", target_resource_name
+        return "arn:aws:{}:{}:{}:{}".format(
+            service, self.region, self.LOCAL_ACCOUNT_ID, resource
+        )
+
+    async def call_api(self, method: str, full_path: str, schedule_definition=None):
+        """
+        Serves a call of SchedulerClientWrapper._call_aws_api
+        :return: status, response like the EventBridge Scheduler API
+        """
+        url = urlsplit(full_path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+
+        if len(parts) == 2 and parts[0] == "schedule-groups" and method == "POST":
+            self._groups.add(parts[1])
+            return 200, {"ScheduleGroupArn": self._get_arn("schedule-group", parts[1])}
+        if parts == ["schedules"] and method == "GET":
+            return 200, self._list_schedules(query)
+        if len(parts) == 2 and parts[0] == "schedules":
+            name = parts[1]
+            if method in ("POST", "PUT"):
+                group = schedule_definition.get(Constant.SCHEDULER_GROUP_NAME) or "default"
+                return 200, await self._put_schedule(
+                    (group, name), schedule_definition, create=method == "POST"
+                )
+            key = (query.get("groupName", "default"), name)
+            if method == "GET":
+                return 200, self._describe_schedule(key, self._get_schedule(key))
+            if method == "DELETE":
+                self._get_schedule(key)
+                await self._delete_schedule(key)
+                return 200, None
+        raise SchedulerAPIException(
+            ErrorMessages.SchedulerUnsupportedCall.value.format(
+                method=method, path=full_path
+            ),
+            400,
+        )
+
+    async def _put_schedule(self, key, schedule_definition, create):
+        group, name = key
+        if group not in self._groups:
+            raise SchedulerAPIException(
+                ErrorMessages.SchedulerGroupNotFound.value.format(group=group), 404
+            )
+        previous = self._schedules.get(key)
+        if create and previous is not None:
+            raise SchedulerAPIException(
+                ErrorMessages.SchedulerConflict.value.format(name=name, group=group), 409
+            )
+        if not create and previous is None:
+            self._get_schedule(key)
+        try:
+            expression = parse_schedule_expression(
+                schedule_definition[Constant.SCHEDULER_EXPRESSION],
+                schedule_definition.get("ScheduleExpressionTimezone")
+                or DEFAULT_TIMEZONE,
+            )
+        except Exception as e:
+            raise SchedulerAPIException(str(e), 400)
+
+        definition = {
+            field: value
+            for field, value in copy.deepcopy(schedule_definition).items()
+            if field not in self.READ_ONLY_FIELDS
+        }
+        definition[Constant.SCHEDULER_NAME] = name
+        definition[Constant.SCHEDULER_GROUP_NAME] = group
+        now = time.time()
+        schedule = self._new_schedule(
+            definition, expression, previous["created"] if previous else now, now
+        )
+        self._schedules[key] = schedule
+        fire_time = self._get_next_fire_time(schedule, now)
+        self._push(key, schedule, fire_time)
+        if self.redis_wrapper is not None:
+            await self._persist(key, schedule, fire_time)
+        return {"ScheduleArn": self._get_arn("schedule", group, name)}
+
+    def _new_schedule(self, definition, expression, created, modified):
+        return {
+            "definition": definition,
+            "expression": expression,
+            "created": created,
+            "modified": modified,
+            # heap entries of a previous version of the schedule are skipped
+            "generation": next(self._sequence),
+        }
+
+    def _get_schedule(self, key):
+        schedule = self._schedules.get(key)
+        if schedule is None:
+            raise SchedulerAPIException(
+                ErrorMessages.SchedulerNotFound.value.format(name=key[1], group=key[0]),
+                404,
+            )
+        return schedule
+
+    async def _delete_schedule(self, key):
+        self._schedules.pop(key, None)
+        # lazily removed heap entries are dropped once they outnumber the schedules
+        if len(self._heap) > 2 * len(self._schedules) + 64:
+            self._heap = [
+                entry
+                for entry in self._heap
+                if entry[2] in self._schedules
+                and self._schedules[entry[2]]["generation"] == entry[3]
+            ]
+            heapq.heapify(self._heap)
+        if self.redis_wrapper is not None:
+            member = "/".join(key)
+            try:
+                await self.redis_wrapper.hdel(self.definitions_key, member)
+                await self.redis_wrapper.zrem(self.fire_times_key, member)
+            except Exception as e:
+                logger.error(
+                    "Local schedule delete failed with error {}".format(str(e))
+                )
+
+    def _describe_schedule(self, key, schedule):
+        return dict(
+            copy.deepcopy(schedule["definition"]),
+            Arn=self._get_arn("schedule", *key),
+            CreationDate=schedule["created"],
+            LastModificationDate=schedule["modified"],
+        )
+
+    def _list_schedules(self, query):
+        group = query.get("ScheduleGroup")
+        name_prefix = query.get("NamePrefix", "")
+        state = query.get("State")
+        keys = sorted(
+            key
+            for key, schedule in self._schedules.items()
+            if (not group or key[0] == group)
+            and key[1].startswith(name_prefix)
+            and (not state or schedule["definition"].get("State") == state)
+        )
+        start = int(query.get(Constant.SCHEDULER_NEXT_TOKEN, 0))
+        end = start + int(query.get("MaxResults", 100))
+        response = {"Schedules": []}
+        for key in keys[start:end]:
+            schedule = self._schedules[key]
+            definition = schedule["definition"]
+            response["Schedules"].append(
+                {
+                    "Arn": self._get_arn("schedule", *key),
+                    "CreationDate": schedule["created"],
+                    "GroupName": key[0],
+                    "LastModificationDate": schedule["modified"],
+                    "Name": key[1],
+                    "State": definition.get("State"),
+                    "Target": {
+                        "Arn": definition[Constant.SCHEDULER_TARGET].get(
+                            Constant.SCHEDULER_ARN
+                        )
+                    },
+                }
+            )
+        if end < len(keys):
+            response[Constant.SCHEDULER_NEXT_TOKEN] = str(end)
+        return response
+
+    @staticmethod
+    def _get_next_fire_time(schedule, after):
+        """
+        :return: next fire time after the after timestamp, None when the schedule will not fire
+        """
+        if schedule["definition"].get("State", "ENABLED") != "ENABLED":
+            return None
+        fire_time = schedule["expression"].next_fire_time(
+            datetime.fromtimestamp(after, timezone.utc),
+            start=datetime.fromtimestamp(schedule["created"], timezone.utc),
+        )
+        return fire_time.timestamp() if fire_time is not None else None
+
+    def _push(self, key, schedule, fire_time, attempt=0, first_fire_time=None):
+        if fire_time is None:
+            return
+        heapq.heappush(
+            self._heap,
+            (
+                fire_time,
+                next(self._sequence),
+                key,
+                schedule["generation"],
+                attempt,
+                first_fire_time or fire_time,
+            ),
+        )
+        if self._wakeup is not None and self._heap[0][0] == fire_time:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                self._fire(heapq.heappop(self._heap), now)
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, entry, now):
+        fire_time, _, key, generation, attempt, first_fire_time = entry
+        schedule = self._schedules.get(key)
+        if schedule is None or schedule["generation"] != generation:
+            return
+        next_fire_time = None
+        if attempt == 0:
+            # fires missed while the loop was busy or down are not replayed one by one
+            next_fire_time = self._get_next_fire_time(schedule, max(fire_time, now))
+            self._push(key, schedule, next_fire_time)
+        delivery = asyncio.ensure_future(
+            self._deliver(key, schedule, attempt, first_fire_time, next_fire_time)
+        )
+        self._deliveries.add(delivery)
+        delivery.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, key, schedule, attempt, first_fire_time, next_fire_time):
+        if attempt == 0 and self.redis_wrapper is not None:
+            await self._persist_fire_time(key, next_fire_time)
+        target = schedule["definition"][Constant.SCHEDULER_TARGET]
+        try:
+            await self._send(target)
+        except Exception as e:
+            retry_policy = target.get("RetryPolicy") or {}
+            event_age = time.time() - first_fire_time
+            if attempt < retry_policy.get(
+                "MaximumRetryAttempts", 0
+            ) and event_age < retry_policy.get(
+                "MaximumEventAgeInSeconds", self.DEFAULT_MAX_EVENT_AGE
+            ):
+                delay = min(self.retry_backoff * 2**attempt, self.MAX_RETRY_BACKOFF)
+                logger.warning(
+                    "Local schedule {} delivery failed with error {}, retrying in {}s".format(
+                        key[1], str(e), delay
+                    )
+                )
+                self._push(key, schedule, time.time() + delay, attempt + 1, first_fire_time)
+                return
+            logger.error(
+                "Local schedule {} dropped after {} attempts, error {}".format(
+                    key[1], attempt + 1, str(e)
+                )
+            )
+        if (
+            schedule["expression"].kind == "at"
+            and self.delete_after_completion
+            and self._schedules.get(key) is schedule
+        ):
+            await self._delete_schedule(key)
+
+    async def _send(self, target):
+        arn = target.get(Constant.SCHEDULER_ARN) or ""
+        handler = self.handlers.get(arn.split(":")[-1])
+        if handler is not None:
+            await handler.handle_event(target.get("Input", ""))
+        elif self.producer is not None:
+            # produce_data logs its errors, push_data raises them so they are retried
+            await self.producer.push_data(target.get("Input", ""))
+        else:
+            raise Exception(ErrorMessages.SchedulerTargetNotFound.value.format(arn=arn))
+
+    async def _persist(self, key, schedule, fire_time):
+        try:
+            await self.redis_wrapper.hset(
+                self.definitions_key,
+                "/".join(key),
+                json.dumps(
+                    {
+                        "definition": schedule["definition"],
+                        "created": schedule["created"],
+                        "modified": schedule["modified"],
+                    }
+                ),
+            )
+        except Exception as e:
+            logger.error(
+                "Local schedule persist failed with error {}".format(str(e))
+            )
+        await self._persist_fire_time(key, fire_time)
+
+    async def _persist_fire_time(self, key, fire_time):
+        member = "/".join(key)
+        try:
+            if fire_time is None:
+                await self.redis_wrapper.zrem(self.fire_times_key, member)
+            else:
+                await self.redis_wrapper.zadd(self.fire_times_key, {member: fire_time})
+        except Exception as e:
+            logger.error(
+                "Local schedule persist failed with error {}".format(str(e))
+            )
+
+    async def _load(self):
+        definitions = await self.redis_wrapper.hgetall(self.definitions_key) or {}
+        fire_times = {
+            self._decode(member): float(score)
+            for member, score in await self.redis_wrapper.zrange(
+                self.fire_times_key, 0, -1, withscores=True
+            )
+        }
+        now = time.time()
+        for member, value in definitions.items():
+            member, value = self._decode(member), json.loads(self._decode(value))
+            group, name = member.split("/", 1)
+            definition = value["definition"]
+            try:
+                expression = parse_schedule_expression(
+                    definition[Constant.SCHEDULER_EXPRESSION],
+                    definition.get("ScheduleExpressionTimezone") or DEFAULT_TIMEZONE,
+                )
+            except Exception as e:
+                logger.error(
+                    "Local schedule {} not loaded, error {}".format(name, str(e))
+                )
+                continue
+            schedule = self._new_schedule(
+                definition, expression, value["created"], value["modified"]
+            )
+            self._groups.add(group)
+            self._schedules[(group, name)] = schedule
+            fire_time = fire_times.get(member)
+            if fire_time is None:
+                fire_time = self._get_next_fire_time(schedule, now)
+            self._push((group, name), schedule, fire_time)
+
+    def _get_arn(self, resource_type, *names):
+        return "arn:aws:scheduler:{}:{}:{}/{}".format(
+            self.region, self.LOCAL_ACCOUNT_ID, resource_type, "/".join(names)
+        )
+
+    @staticmethod
+    def _decode(value):
+        return value.decode() if isinstance(value, bytes) else value
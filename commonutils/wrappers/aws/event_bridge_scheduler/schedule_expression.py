@@ -0,0 +1,253 @@
+import calendar
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+from dateutil import tz
+
+from commonutils.constants import EVENT_SCHEDULER_CREATE_DEFINITION, ErrorMessages
+
+DEFAULT_TIMEZONE = EVENT_SCHEDULER_CREATE_DEFINITION["ScheduleExpressionTimezone"]
+AT_EXPRESSION = re.compile(r"^at\((\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})\)$")
+RATE_EXPRESSION = re.compile(r"^rate\((\d+)\s+(minute|minutes|hour|hours|day|days)\)$")
+CRON_EXPRESSION = re.compile(r"^cron\((.*)\)$")
+RATE_UNITS_IN_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ["JAN", "FEB", "MAR", "APR", "MAY", "JUN"]
+        + ["JUL", "AUG", "SEP", "OCT", "NOV", "DEC"],
+        1,
+    )
+}
+# cron day of week numbering, 1 is Sunday
+DAYS_OF_WEEK = {
+    name: number
+    for number, name in enumerate(["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"], 1)
+}
+MAX_YEAR = 2199
+
+
+class ScheduleExpression:
+    """
+    EventBridge Scheduler expression, parsed and evaluated locally:
+        at(2023-06-02T13:30:00)         one time, in the schedule timezone
+        rate(5 minutes)                 every 5 minutes from the schedule start
+        cron(0/15 9-18 ? * MON-FRI *)   minutes hours day-of-month month day-of-week year
+    Cron fields support , - * / and ? (day of month or day of week), L and W (day of month),
+    L and # (day of week), month and day names.
+    """
+
+    def __init__(self, expression: str, timezone_name: str = DEFAULT_TIMEZONE):
+        """
+        Raises when expression or timezone_name is not valid.
+        """
+        self.expression = expression.strip()
+        self.timezone = tz.gettz(timezone_name)
+        if self.timezone is None:
+            self._invalid("unknown timezone {}".format(timezone_name))
+        self.at = self.rate = None
+        self._cron = None
+
+        at_match = AT_EXPRESSION.match(self.expression)
+        rate_match = RATE_EXPRESSION.match(self.expression)
+        cron_match = CRON_EXPRESSION.match(self.expression)
+        if at_match:
+            self.kind = "at"
+            try:
+                local_time = datetime.strptime(at_match.group(1), "%Y-%m-%dT%H:%M:%S")
+            except ValueError as e:
+                self._invalid(str(e))
+            self.at = self._to_utc(local_time)
+        elif rate_match:
+            self.kind = "rate"
+            value = int(rate_match.group(1))
+            if value < 1:
+                self._invalid("rate value must be positive")
+            unit = rate_match.group(2).rstrip("s")
+            self.rate = timedelta(seconds=value * RATE_UNITS_IN_SECONDS[unit])
+        elif cron_match:
+            self.kind = "cron"
+            self._cron = self._parse_cron(cron_match.group(1))
+        else:
+            self._invalid("expected at(...), rate(...) or cron(...)")
+
+    def next_fire_time(self, after: datetime, start: datetime = None):
+        """
+        :param after: aware datetime, the returned time is strictly after it
+        :param start: start of a rate schedule, defaults to after
+        :return: next fire time as an aware UTC datetime, None when the schedule will not fire
+        """
+        after = after.astimezone(timezone.utc)
+        if self.kind == "at":
+            return self.at if self.at > after else None
+        if self.kind == "rate":
+            start = (start or after).astimezone(timezone.utc)
+            if start > after:
+                return start
+            periods = (after - start) // self.rate + 1
+            return start + periods * self.rate
+        return self._next_cron_time(after)
+
+    def _next_cron_time(self, after):
+        minutes, hours, days_of_month, months, days_of_week, years = self._cron
+        day = after.astimezone(self.timezone).date()
+        while day.year <= MAX_YEAR:
+            if day.year not in years:
+                day = date(day.year + 1, 1, 1)
+                continue
+            if day.month not in months:
+                day = self._first_day_of_next_month(day)
+                continue
+            if self._day_matches(day, days_of_month, days_of_week):
+                for hour in hours:
+                    for minute in minutes:
+                        fire_time = self._to_utc(
+                            datetime(day.year, day.month, day.day, hour, minute)
+                        )
+                        if fire_time > after:
+                            return fire_time
+            day += timedelta(days=1)
+        return None
+
+    @staticmethod
+    def _day_matches(day, days_of_month, days_of_week):
+        last_day = calendar.monthrange(day.year, day.month)[1]
+        if days_of_month is not None:
+            for value in days_of_month:
+                if value == "L":
+                    if day.day == last_day:
+                        return True
+                elif isinstance(value, tuple):
+                    # nearest weekday to day n (W), or to the last day (LW)
+                    target = last_day if value[1] == "L" else min(value[1], last_day)
+                    target_date = day.replace(day=target)
+                    if target_date.weekday() == 5:
+                        target_date -= timedelta(days=1 if target > 1 else -2)
+                    elif target_date.weekday() == 6:
+                        target_date += timedelta(days=1 if target < last_day else -2)
+                    if day == target_date:
+                        return True
+                elif day.day == value:
+                    return True
+            return False
+
+        cron_day_of_week = (day.weekday() + 1) % 7 + 1
+        for value in days_of_week:
+            if isinstance(value, tuple):
+                kind, weekday, nth = value
+                if weekday != cron_day_of_week:
+                    continue
+                if kind == "#" and (day.day - 1) // 7 + 1 == nth:
+                    return True
+                if kind == "L" and day.day + 7 > last_day:
+                    return True
+            elif value == cron_day_of_week:
+                return True
+        return False
+
+    def _parse_cron(self, fields):
+        fields = fields.split()
+        if len(fields) != 6:
+            self._invalid("cron expressions have 6 fields")
+        minutes, hours, days_of_month, months, days_of_week, years = fields
+        if (days_of_month == "?") == (days_of_week == "?"):
+            self._invalid("one of day-of-month and day-of-week must be ?")
+        return (
+            sorted(self._parse_field(minutes, 0, 59)),
+            sorted(self._parse_field(hours, 0, 23)),
+            None if days_of_month == "?" else self._parse_days_of_month(days_of_month),
+            self._parse_field(months, 1, 12, MONTHS),
+            None if days_of_week == "?" else self._parse_days_of_week(days_of_week),
+            self._parse_field(years, 1970, MAX_YEAR),
+        )
+
+    def _parse_days_of_month(self, field):
+        values = []
+        for part in field.split(","):
+            if part == "L":
+                values.append("L")
+            elif part == "LW":
+                values.append(("W", "L"))
+            elif part.endswith("W"):
+                values.append(("W", self._parse_number(part[:-1], 1, 31)))
+            else:
+                values.extend(self._parse_field(part, 1, 31))
+        return values
+
+    def _parse_days_of_week(self, field):
+        values = []
+        for part in field.split(","):
+            if "#" in part:
+                weekday, nth = part.split("#", 1)
+                values.append(
+                    (
+                        "#",
+                        self._parse_number(weekday, 1, 7, DAYS_OF_WEEK),
+                        self._parse_number(nth, 1, 5),
+                    )
+                )
+            elif part.endswith("L") and len(part) > 1:
+                values.append(
+                    ("L", self._parse_number(part[:-1], 1, 7, DAYS_OF_WEEK), None)
+                )
+            else:
+                values.extend(self._parse_field(part, 1, 7, DAYS_OF_WEEK))
+        return values
+
+    def _parse_field(self, field, minimum, maximum, names=None):
+        values = set()
+        for part in field.split(","):
+            step = None
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = self._parse_number(step, 1, maximum)
+            if part == "*":
+                first, last = minimum, maximum
+            elif "-" in part:
+                first, last = part.split("-", 1)
+                first = self._parse_number(first, minimum, maximum, names)
+                last = self._parse_number(last, minimum, maximum, names)
+            else:
+                first = self._parse_number(part, minimum, maximum, names)
+                # a/b means every b from a to the end of the range
+                last = maximum if step else first
+            if first > last:
+                self._invalid("empty range {}".format(part))
+            values.update(range(first, last + 1, step or 1))
+        return values
+
+    def _parse_number(self, value, minimum, maximum, names=None):
+        value = value.upper()
+        if names and value in names:
+            return names[value]
+        if not value.isdigit() or not minimum <= int(value) <= maximum:
+            self._invalid(
+                "{} is not between {} and {}".format(value, minimum, maximum)
+            )
+        return int(value)
+
+    def _to_utc(self, local_time):
+        return local_time.replace(tzinfo=self.timezone).astimezone(timezone.utc)
+
+    @staticmethod
+    def _first_day_of_next_month(day):
+        if day.month == 12:
+            return date(day.year + 1, 1, 1)
+        return date(day.year, day.month + 1, 1)
+
+    def _invalid(self, reason):
+        raise Exception(
+            ErrorMessages.SchedulerInvalidExpression.value.format(
+                expression=self.expression, reason=reason
+            )
+        )
+
+
+@lru_cache(maxsize=1024)
+def parse_schedule_expression(expression: str, timezone_name: str = DEFAULT_TIMEZONE):
+    """
+    :return: ScheduleExpression, parsed once per expression and timezone
+    Raises when expression or timezone_name is not valid.
+    """
+    return ScheduleExpression(expression, timezone_name)
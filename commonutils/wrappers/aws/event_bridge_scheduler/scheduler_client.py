@@ -2,11 +2,11 @@ import asyncio
 import copy
 import json
 import logging
+import random
 import uuid
-from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+from urllib.parse import quote, urlencode
 
-from aiohttp import ContentTypeError
+from aiohttp import ClientError, ContentTypeError
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 from botocore.credentials import Credentials
@@ -16,22 +16,46 @@ logger = logging.getLogger()
 
 from commonutils.base_api_request import BaseApiRequest
 from commonutils.constants import (EVENT_SCHEDULER_CREATE_DEFINITION, Constant,
-                                   EventBridgeSchedulerType)
+                                   ErrorMessages, EventBridgeSchedulerType)
 from commonutils.handlers import SQSHandler
+from commonutils.offload_executor import OffloadExecutor
 from commonutils.utils import Singleton
 from commonutils.wrappers.aws.lambdaa import BaseLambdaWrapper
 from commonutils.wrappers.aws.sqs import BaseSQSWrapper
 
+from .schedule_expression import DEFAULT_TIMEZONE, parse_schedule_expression
+
+
+class SchedulerAPIException(Exception):
+    """
+    Non 200 response of the EventBridge Scheduler API
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
 
 class SchedulerClientWrapper(metaclass=Singleton):
-    def __init__(self, config: dict):
+    BULK_MAX_CONCURRENCY = 10
+    BULK_MAX_RETRIES = 5
+    BULK_RETRY_BACKOFF = 0.2
+    # throttling and server errors
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+    LIST_PAGE_SIZE = 100
+
+    def __init__(self, config: dict, backend=None):
+        """
+        :param backend: optional LocalScheduler, schedules are then managed and fired in process
+        instead of by EventBridge Scheduler
+        """
         self.config = config
+        self.backend = backend
         self.event_scheduler_config = self.config.get("EVENT_SCHEDULER", {})
         self.group_name = self.event_scheduler_config.get(
             "SCHEDULER_GROUP_NAME", "default"
         )
         self.queue_name = self.event_scheduler_config.get("SQS_QUEUE_NAME")
-        self.sqs_arn_dict = {}
         self.base_sqs_wrapper = None
         self.lambda_wrapper = None
         self.aws_region = self.event_scheduler_config.get(
@@ -60,6 +84,10 @@ class SchedulerClientWrapper(metaclass=Singleton):
         subscribes to queue to process SQS messages, if SQS_QUEUE_NAME
         present in EVENT_SCHEDULER config
         """
+        if self.backend is not None:
+            await self.backend.start(event_handler, self.queue_name)
+            await self._create_schedule_group()
+            return None
         await self._create_schedule_group()
         if len(self.queue_name) > 0:
             await self._initialise_sqs_client(self.config)
@@ -131,10 +159,14 @@ class SchedulerClientWrapper(metaclass=Singleton):
         full_path = self.path.format(schedule_name)
         await self._call_aws_api(full_path, "POST", schedule_definition)
 
-    async def _call_aws_api(self, full_path, method, schedule_definition):
+    async def _call_aws_api(
+        self, full_path, method, schedule_definition, offload_signing=False
+    ):
+        if self.backend is not None:
+            return await self.backend.call_api(method, full_path, schedule_definition)
         url = f"https://{self.aws_service}.{self.aws_region}.{Constant.AWS_DOMAIN}{full_path}"
         headers = await self._get_aws_auth_headers(
-            method, url, payload=schedule_definition
+            method, url, payload=schedule_definition, offload=offload_signing
         )
 
         aws_response, status = None, None
@@ -150,7 +182,7 @@ class SchedulerClientWrapper(metaclass=Singleton):
                     status, aws_response
                 )
                 logger.error(_msg)
-                raise Exception(_msg)
+                raise SchedulerAPIException(_msg, status)
             else:
                 try:
                     aws_response = await response.json()
@@ -197,6 +229,181 @@ class SchedulerClientWrapper(metaclass=Singleton):
 
         await self._create_schedule(schedule_definition, schedule_name)
 
+    async def create_event_schedules(
+        self,
+        schedules,
+        max_concurrency=BULK_MAX_CONCURRENCY,
+        max_retries=BULK_MAX_RETRIES,
+    ):
+        """
+        Creates Event Bridge Schedules concurrently, throttled calls are retried with backoff
+        :param schedules: iterable of dicts with the arguments of create_sqs_event_schedule
+        (schedule_name, schedule_expression, msg, schedule_description, queue_name), or with
+        "target_type": "lambda" those of create_lambda_event_schedule (target_resource_name)
+        :param max_concurrency: max number of API calls in flight
+        :param max_retries: max retries of a throttled / failed call
+        :return: [{"schedule_name", "status", "error"}] in the order of schedules,
+        error is None when the schedule was created. Specs failing validation are reported
+        with status None and are not sent.
+        """
+        # validated up front, an invalid spec fails on its own instead of the whole call
+        specs = [(spec, self._validate_schedule_spec(spec)) for spec in schedules]
+
+        async def _create(item):
+            spec, error = item
+            if error is not None:
+                raise Exception(error)
+            schedule_definition = SchedulerDefinition().event_scheduler_definition
+            target_type = spec.get("target_type", EventBridgeSchedulerType.SQS.value)
+            if target_type == EventBridgeSchedulerType.SQS.value:
+                target_resource_name = spec.get("queue_name") or self.queue_name
+            else:
+                target_resource_name = spec["target_resource_name"]
+            await self._create_schedule_definition(
+                spec.get("msg", ""),
+                schedule_definition,
+                spec.get("schedule_description", ""),
+                spec["schedule_expression"],
+                spec["schedule_name"],
+                target_resource_name,
+                target_type,
+            )
+            # same token on retries, so a retried create is not applied twice
+            schedule_definition["ClientToken"] = str(uuid.uuid1())
+            return await self._call_aws_api_with_retry(
+                self.path.format(spec["schedule_name"]),
+                "POST",
+                schedule_definition,
+                max_retries,
+            )
+
+        return await self._run_bulk(
+            (
+                (spec.get("schedule_name") if isinstance(spec, dict) else None, (spec, error))
+                for spec, error in specs
+            ),
+            _create,
+            max_concurrency,
+        )
+
+    def _validate_schedule_spec(self, spec):
+        """
+        :return: error message when spec of create_event_schedules is not valid, else None
+        """
+        if not isinstance(spec, dict):
+            return ErrorMessages.SchedulerInvalidSpec.value.format(
+                name=None, reason="expected a dict, got {}".format(type(spec).__name__)
+            )
+        schedule_name = spec.get("schedule_name")
+        target_type = spec.get("target_type", EventBridgeSchedulerType.SQS.value)
+        if not schedule_name:
+            reason = "schedule_name is required"
+        elif not spec.get("schedule_expression"):
+            reason = "schedule_expression is required"
+        elif target_type not in EventBridgeSchedulerType.get_all_values():
+            reason = "unknown target_type {}".format(target_type)
+        elif target_type == EventBridgeSchedulerType.LAMBDA.value and not spec.get(
+            "target_resource_name"
+        ):
+            reason = "target_resource_name is required"
+        elif target_type == EventBridgeSchedulerType.SQS.value and not (
+            spec.get("queue_name") or self.queue_name
+        ):
+            reason = "queue_name is required"
+        else:
+            try:
+                parse_schedule_expression(
+                    spec["schedule_expression"],
+                    EVENT_SCHEDULER_CREATE_DEFINITION.get("ScheduleExpressionTimezone")
+                    or DEFAULT_TIMEZONE,
+                )
+            except Exception as e:
+                return str(e)
+            return None
+        return ErrorMessages.SchedulerInvalidSpec.value.format(
+            name=schedule_name, reason=reason
+        )
+
+    async def delete_event_schedules(
+        self,
+        schedule_names,
+        max_concurrency=BULK_MAX_CONCURRENCY,
+        max_retries=BULK_MAX_RETRIES,
+    ):
+        """
+        Deletes Event Bridge Schedules concurrently, throttled calls are retried with backoff
+        :param schedule_names: iterable of names of the schedules to be deleted
+        :param max_concurrency: max number of API calls in flight
+        :param max_retries: max retries of a throttled / failed call
+        :return: [{"schedule_name", "status", "error"}] in the order of schedule_names,
+        error is None when the schedule was deleted
+        """
+
+        async def _delete(schedule_name):
+            full_path = self.path.format(
+                schedule_name
+                + "?clientToken="
+                + str(uuid.uuid1())
+                + "&groupName="
+                + self.group_name
+            )
+            return await self._call_aws_api_with_retry(
+                full_path, "DELETE", None, max_retries
+            )
+
+        return await self._run_bulk(
+            ((schedule_name, schedule_name) for schedule_name in schedule_names),
+            _delete,
+            max_concurrency,
+        )
+
+    @staticmethod
+    async def _run_bulk(items, operation, max_concurrency):
+        """
+        Runs operation on every (schedule_name, item) with max_concurrency workers, so
+        only max_concurrency calls exist at a time whatever the number of items.
+        """
+        items = enumerate(items)
+        results = {}
+
+        async def _worker():
+            for index, (schedule_name, item) in items:
+                try:
+                    status, _ = await operation(item)
+                    results[index] = {
+                        "schedule_name": schedule_name,
+                        "status": status,
+                        "error": None,
+                    }
+                except Exception as e:
+                    results[index] = {
+                        "schedule_name": schedule_name,
+                        "status": getattr(e, "status", None),
+                        "error": str(e),
+                    }
+
+        await asyncio.gather(*[_worker() for _ in range(max_concurrency)])
+        return [results[index] for index in range(len(results))]
+
+    async def _call_aws_api_with_retry(
+        self, full_path, method, schedule_definition, max_retries
+    ):
+        attempt = 0
+        while True:
+            try:
+                return await self._call_aws_api(
+                    full_path, method, schedule_definition, offload_signing=True
+                )
+            except SchedulerAPIException as e:
+                if e.status not in self.RETRYABLE_STATUSES or attempt >= max_retries:
+                    raise
+            except (ClientError, asyncio.TimeoutError):
+                if attempt >= max_retries:
+                    raise
+            attempt += 1
+            backoff = self.BULK_RETRY_BACKOFF * (2 ** (attempt - 1))
+            await asyncio.sleep(random.uniform(backoff / 2, backoff))
+
     async def get_event_schedule(self, schedule_name):
         """
         Fetches an Event Bridge Schedule
@@ -207,6 +414,59 @@ class SchedulerClientWrapper(metaclass=Singleton):
         status, aws_response = await self._call_aws_api(full_path, "GET", None)
         return aws_response
 
+    async def list_event_schedules(
+        self,
+        name_prefix=None,
+        state=None,
+        group_name=None,
+        page_size=LIST_PAGE_SIZE,
+        prefetch=True,
+    ):
+        """
+        Async iterator over Event Bridge Schedules (ListSchedules summaries), following NextToken
+        page by page so memory stays constant whatever the number of schedules
+        :param name_prefix: only schedules whose name starts with name_prefix
+        :param state: only "ENABLED" or "DISABLED" schedules
+        :param group_name: group to list, defaults to the group of this wrapper, "" lists all groups
+        :param page_size: schedules per ListSchedules call, at most 100
+        :param prefetch: fetch the next page while the current one is being iterated
+        """
+        group_name = self.group_name if group_name is None else group_name
+        params = {"MaxResults": min(page_size, self.LIST_PAGE_SIZE)}
+        if name_prefix:
+            params["NamePrefix"] = name_prefix
+        if state:
+            params["State"] = state
+        if group_name:
+            params["ScheduleGroup"] = group_name
+
+        next_page = asyncio.ensure_future(self._list_schedules_page(params))
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                next_token = page.get(Constant.SCHEDULER_NEXT_TOKEN)
+                if next_token and prefetch:
+                    next_page = asyncio.ensure_future(
+                        self._list_schedules_page(params, next_token)
+                    )
+                for schedule in page.get("Schedules", []):
+                    yield schedule
+                if next_token and not prefetch:
+                    next_page = asyncio.ensure_future(
+                        self._list_schedules_page(params, next_token)
+                    )
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def _list_schedules_page(self, params, next_token=None):
+        if next_token:
+            params = dict(params, **{Constant.SCHEDULER_NEXT_TOKEN: next_token})
+        full_path = "/schedules?" + urlencode(sorted(params.items()), quote_via=quote)
+        status, aws_response = await self._call_aws_api(full_path, "GET", None)
+        return aws_response or {}
+
     async def delete_event_schedule(self, schedule_name):
         """
         Deletes an Event Bridge Schedule
@@ -241,6 +501,8 @@ class SchedulerClientWrapper(metaclass=Singleton):
         :param new_target_type: New Target Type sqs or lambda
 
         """
+        # an invalid expression fails here, not after the GET
+        parse_schedule_expression(new_schedule_expression)
         event_schedule = await self.get_event_schedule(schedule_name)
         if event_schedule:
             del event_schedule["CreationDate"]
@@ -276,7 +538,11 @@ class SchedulerClientWrapper(metaclass=Singleton):
         target_resource_name,
         target_type,
     ):
-
+        # validated locally, before any ARN lookup or API call
+        parse_schedule_expression(
+            schedule_expression,
+            schedule_definition.get("ScheduleExpressionTimezone") or DEFAULT_TIMEZONE,
+        )
         schedule_definition[Constant.SCHEDULER_NAME] = schedule_name
         schedule_definition[Constant.SCHEDULER_GROUP_NAME] = self.group_name
         schedule_definition["Description"] = schedule_description
@@ -311,23 +577,22 @@ class SchedulerClientWrapper(metaclass=Singleton):
         logger.debug("schedule definition {}".format(schedule_definition))
 
     async def _get_sqs_arn(self, target_resource_name):
-        arn = self.sqs_arn_dict.get(target_resource_name, None)
-        if arn:
-            return arn
-        else:
-            arn = await self._add_sqs_arn(target_resource_name)
-            return arn
-
-    async def _add_sqs_arn(self, sqs_name):
-        arn = await self.base_sqs_wrapper.get_queue_arn(sqs_name)
-        self.sqs_arn_dict[sqs_name] = arn
-        return arn
+        if self.backend is not None:
+            return self.backend.get_target_arn(
+                EventBridgeSchedulerType.SQS.value, target_resource_name
+            )
+        # cached in ResolutionCache
+        return await self.base_sqs_wrapper.get_queue_arn(target_resource_name)
 
     async def _get_lambda_arn(self, target_resource_name):
+        if self.backend is not None:
+            return self.backend.get_target_arn(
+                EventBridgeSchedulerType.LAMBDA.value, target_resource_name
+            )
         arn = await self.lambda_wrapper.get_lambda_arn(target_resource_name)
         return arn
 
-    async def _get_aws_auth_headers(self, method, full_path, payload=""):
+    async def _get_aws_auth_headers(self, method, full_path, payload="", offload=False):
         if not payload:
             data = None
         else:
@@ -340,11 +605,13 @@ class SchedulerClientWrapper(metaclass=Singleton):
             },
             data=data,
         )
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                executor, partial(self.aws_sigv4.add_auth, request)
-            )
+        refresh_needed = getattr(self.aws_credentials, "refresh_needed", None)
+        if offload or (refresh_needed is not None and refresh_needed()):
+            # refreshing role credentials is a blocking http call
+            await OffloadExecutor.run(self.aws_sigv4.add_auth, request)
+        else:
+            # signing with static / fresh credentials is a few HMACs, cheaper than a thread hop
+            self.aws_sigv4.add_auth(request)
         return dict(request.headers)
 
 
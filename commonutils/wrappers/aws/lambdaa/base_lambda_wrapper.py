@@ -1,12 +1,13 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 
 from botocore.client import Config
 from botocore.session import get_session
 
+from commonutils.offload_executor import OffloadExecutor
 from commonutils.utils import Singleton
 
+from ..resolution_cache import ResolutionCache
+
 
 class BaseLambdaWrapper(metaclass=Singleton):
     DEFAULT_TIMEOUT_IN_SECONDS = 10
@@ -14,7 +15,6 @@ class BaseLambdaWrapper(metaclass=Singleton):
     def __init__(self, config: dict):
         self.config = config.get("LAMBDA", None)
         self.client = None
-        self.arn_dict = {}
 
     async def get_client(self):
         if self.client:
@@ -45,28 +45,27 @@ class BaseLambdaWrapper(metaclass=Singleton):
                 "aws_secret_access_key": aws_secret_access_key,
                 "aws_access_key_id": aws_access_key_id,
             }
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                loop = asyncio.get_running_loop()
-                session = get_session()
-                self.client = await loop.run_in_executor(
-                    executor, partial(session.create_client, **client_args)
-                )
+            session = get_session()
+            self.client = await OffloadExecutor.run(
+                session.create_client, **client_args
+            )
             return self.client
 
     async def get_lambda_arn(self, lambda_name):
-        arn = self.arn_dict.get(lambda_name, None)
-        if arn:
-            return arn
-        else:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                loop = asyncio.get_running_loop()
-                arn = await loop.run_in_executor(
-                    executor, partial(self._add_lambda_arn, lambda_name)
-                )
-            return arn
+        """
+        :return: arn of lambda_name, cached in ResolutionCache
+        """
+        return await ResolutionCache.resolve(
+            (
+                "lambda_arn",
+                self.client.meta.endpoint_url,
+                # credentials of the config, None for the default credential chain
+                self.config.get("AWS_ACCESS_KEY_ID"),
+                lambda_name,
+            ),
+            partial(OffloadExecutor.run, self._get_lambda_arn, lambda_name),
+        )
 
-    def _add_lambda_arn(self, lambda_name):
+    def _get_lambda_arn(self, lambda_name):
         response = self.client.get_function(FunctionName=lambda_name)
-        arn = response.get("Configuration").get("FunctionArn")
-        self.arn_dict[lambda_name] = arn
-        return arn
+        return response.get("Configuration").get("FunctionArn")
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import botocore.exceptions
+
+
+class ResolutionCache:
+    """
+    Process-wide cache of AWS resource lookups: queue URLs, queue ARNs, lambda ARNs.
+    Values are kept for ttl seconds. Lookups failing because the resource does not exist
+    (NOT_FOUND_ERRORS) are kept for negative_ttl seconds and raise an error with the same
+    message meanwhile, other failures (throttling, timeouts) are not cached. Concurrent
+    lookups of a missing key share one call, so a burst of schedules on one queue resolves
+    it once. Keys are scoped by kind, endpoint and credentials:
+        ResolutionCache.configure(ttl=3600, negative_ttl=10)  # optional
+        key = ("lambda_arn", endpoint_url, access_key_id, name)
+        arn = await ResolutionCache.resolve(key, fetch_arn)
+        ResolutionCache.invalidate(key)
+    """
+
+    DEFAULT_MAX_SIZE = 10000
+    DEFAULT_TTL = 3600
+    DEFAULT_NEGATIVE_TTL = 10
+    NOT_FOUND_ERRORS = {
+        "AWS.SimpleQueueService.NonExistentQueue",
+        "QueueDoesNotExist",
+        "ResourceNotFoundException",
+        "ResourceNotFound",
+    }
+
+    _max_size = DEFAULT_MAX_SIZE
+    _ttl = DEFAULT_TTL
+    _negative_ttl = DEFAULT_NEGATIVE_TTL
+    _entries = OrderedDict()  # key -> (expires_at, value, error message)
+    _pending = {}
+    _stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def configure(cls, max_size: int = None, ttl: float = None, negative_ttl: float = None):
+        if max_size is not None:
+            cls._max_size = max_size
+        if ttl is not None:
+            cls._ttl = ttl
+        if negative_ttl is not None:
+            cls._negative_ttl = negative_ttl
+        cls._evict()
+
+    @classmethod
+    async def resolve(cls, key: tuple, resolver):
+        """
+        :param key: hashable key, scoped by kind, endpoint and credentials
+        :param resolver: coroutine function called without arguments on a miss
+        :return: cached or resolved value
+        """
+        entry = cls._entries.get(key)
+        if entry is not None:
+            expires_at, value, error = entry
+            if expires_at > time.monotonic():
+                cls._entries.move_to_end(key)
+                if error is not None:
+                    cls._stats["negative_hits"] += 1
+                    raise Exception(error)
+                cls._stats["hits"] += 1
+                return value
+            del cls._entries[key]
+
+        pending = cls._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # the error instance belongs to the caller that started the lookup
+                raise Exception(str(e))
+        cls._stats["misses"] += 1
+        pending = asyncio.ensure_future(cls._resolve(key, resolver))
+        cls._pending[key] = pending
+        return await asyncio.shield(pending)
+
+    @classmethod
+    def invalidate(cls, key: tuple = None):
+        """
+        Drops key, or every entry when key is None
+        """
+        if key is None:
+            cls._entries.clear()
+        else:
+            cls._entries.pop(key, None)
+
+    @classmethod
+    def stats(cls):
+        return dict(cls._stats, size=len(cls._entries))
+
+    @classmethod
+    async def _resolve(cls, key, resolver):
+        try:
+            value = await resolver()
+        except Exception as e:
+            if cls._is_not_found(e):
+                cls._set(key, (time.monotonic() + cls._negative_ttl, None, str(e)))
+            raise
+        else:
+            cls._set(key, (time.monotonic() + cls._ttl, value, None))
+            return value
+        finally:
+            cls._pending.pop(key, None)
+
+    @classmethod
+    def _is_not_found(cls, error):
+        # wrappers re-raise botocore errors as Exception, the ClientError is their context
+        while error is not None:
+            if isinstance(error, botocore.exceptions.ClientError):
+                return error.response.get("Error", {}).get("Code") in cls.NOT_FOUND_ERRORS
+            error = error.__cause__ or error.__context__
+        return False
+
+    @classmethod
+    def _set(cls, key, entry):
+        cls._entries[key] = entry
+        cls._entries.move_to_end(key)
+        cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        while len(cls._entries) > cls._max_size:
+            cls._entries.popitem(last=False)
+            cls._stats["evictions"] += 1
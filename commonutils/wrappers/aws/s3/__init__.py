@@ -1,5 +1,15 @@
-__all__ = ["BaseS3Wrapper", "S3Client", "Presigner"]
+__all__ = [
+    "BaseS3Wrapper",
+    "S3Client",
+    "S3Object",
+    "S3Sync",
+    "Presigner",
+    "PresignedUrlCache",
+]
 
 from .base_s3_wrapper import BaseS3Wrapper
+from .presigned_url_cache import PresignedUrlCache
 from .presigner import Presigner
 from .s3_client import S3Client
+from .s3_object import S3Object
+from .s3_sync import S3Sync
@@ -1,20 +1,49 @@
 import asyncio
+import csv
 import logging
+import mmap
+import os
+import time
 import uuid
+from collections import OrderedDict, deque
 from functools import wraps
-from sys import getsizeof
 from urllib.parse import unquote
 
+import botocore.exceptions
+import ujson
 from botocore.session import get_session
 
 from commonutils.base_api_request import BaseApiRequest
-from commonutils.constants import DEFAULTS, ErrorMessages, HttpHeaderType
+from commonutils.constants import DEFAULTS, Constant, ErrorMessages, HttpHeaderType
 from commonutils.utils import Singleton, get_file_extension_from_content_type
 
+from ..aws_client import AWSClient
+from ..client_registry import AWSClientRegistry
+from .etag_verifier import ETagVerifier
 from .s3_client import S3Client
+from .s3_object import S3Object
+from .streams import (MIN_PART_SIZE_IN_BYTES, iter_decompressed, iter_lines,
+                      iter_parts, run_blocking)
 
 logger = logging.getLogger()
 
+# S3 limit of parts per multipart upload
+MAX_PARTS = 10000
+# largest object copy_object accepts
+MAX_COPY_SIZE_IN_BYTES = 5 * 1024 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE_IN_BYTES = 64 * 1024
+DEFAULT_VALIDATION_CONCURRENCY = 16
+DEFAULT_HEAD_CACHE_TTL = 30
+HEAD_CACHE_MAX_SIZE = 10000
+# S3 Select is not supported for the account, bucket or object type. AccessDenied and
+# InvalidRequest (also returned for a malformed request) reach the caller instead of
+# falling back to a full object download.
+SELECT_UNAVAILABLE_ERRORS = {
+    "MethodNotAllowed",
+    "NotImplemented",
+    "UnsupportedSqlOperation",
+}
+
 
 def create_client(func):
     @wraps(func)
@@ -30,11 +59,14 @@ def create_client(func):
 class BaseS3Wrapper(metaclass=Singleton):
     presigned_post_defaults = DEFAULTS["PRESIGNED_POST"]
     default_content_types = ["application/pdf", "image", "txt", "pdf", "json"]
+    DELETE_RETRY_BACKOFF = 0.1
+    DELETE_RETRYABLE_ERRORS = {"InternalError", "SlowDown", "ServiceUnavailable"}
 
     def __init__(self, config: dict, client, allowed_content_types=None):
         self.client = client
         self.config = config
         self.allowed_content_types = allowed_content_types
+        self._head_cache = OrderedDict()
 
     @create_client
     async def upload(self, file, content_type, key=None):
@@ -92,6 +124,169 @@ class BaseS3Wrapper(metaclass=Singleton):
             "file_name": key,
         }
 
+    @create_client
+    async def upload_stream(
+        self,
+        source,
+        content_type,
+        key=None,
+        bucket=None,
+        part_size=DEFAULTS["MULTIPART"]["PART_SIZE_IN_BYTES"],
+        max_concurrency=DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+    ):
+        """
+        Upload without loading the whole file in memory. Objects up to part_size bytes are sent
+        with a single put_object, bigger ones with a multipart upload whose parts are uploaded
+        concurrently. At most max_concurrency + 1 parts are held in memory at any time.
+        :param source: bytes, file path, file-like object (sync or async read) or async iterator of bytes
+        :param content_type: content type of the object, validated like upload()
+        :param key: object key, generated under S3_PATH when not passed
+        :param bucket: defaults to S3_BUCKET from config
+        :param part_size: multipart part size in bytes, at least 5 MB
+        :param max_concurrency: max number of parts uploaded at the same time
+        :return: dict with file_url, public_id, format, file_check_sum, file_name and size
+        """
+        config = self.config
+        bucket = bucket or config["S3_BUCKET"]
+        region = config["S3_REGION"]
+        path = config.get("S3_PATH", DEFAULTS["UPLOAD_FOLDER"])
+        acl = config.get("ACL", DEFAULTS["ACL"])
+        resource_type, file_format = content_type.split("/")
+
+        if not key:
+            key = self._get_file_key(path, self._get_file_name(content_type))
+
+        valid_content_types = self.allowed_content_types or self.default_content_types
+        if not any(x in content_type for x in valid_content_types):
+            raise Exception(
+                ErrorMessages.AwsS3InvalidFileTypeError.value.format(
+                    valid_content_types=", ".join(valid_content_types)
+                )
+            )
+
+        object_args = {"Bucket": bucket, "Key": key, "ContentType": content_type}
+        if acl != "no-acl":
+            object_args["ACL"] = acl
+
+        try:
+            etag, size = await self.stream_to_object(
+                object_args, source, part_size, max_concurrency
+            )
+        except Exception as error:
+            exception_type = type(error).__name__
+            raise Exception(
+                ErrorMessages.AwsS3FileUploadErrorWithException.value.format(
+                    exception_type=exception_type, exception=error
+                )
+            )
+        return {
+            "file_url": "https://s3.{}.amazonaws.com/{}/{}".format(region, bucket, key),
+            "public_id": key,
+            "resource_type": resource_type,
+            "format": file_format,
+            "file_check_sum": etag.replace('"', ""),
+            "file_name": key,
+            "size": size,
+        }
+
+    @create_client
+    async def stream_to_object(
+        self,
+        object_args: dict,
+        source,
+        part_size=DEFAULTS["MULTIPART"]["PART_SIZE_IN_BYTES"],
+        max_concurrency=DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+    ):
+        """
+        Upload source as is, with put_object or a multipart upload like upload_stream, without
+        its content type validation and key generation.
+        :param object_args: put_object / create_multipart_upload arguments, with at least Bucket and Key
+        :param source: bytes, file path, file-like object (sync or async read) or async iterator of bytes
+        :param part_size: multipart part size in bytes, at least 5 MB
+        :param max_concurrency: max number of parts uploaded at the same time
+        :return: ETag and size of the uploaded object
+        """
+        parts = iter_parts(source, max(part_size, MIN_PART_SIZE_IN_BYTES))
+        try:
+            try:
+                first_part = await parts.__anext__()
+            except StopAsyncIteration:
+                first_part = b""
+            try:
+                second_part = await parts.__anext__()
+            except StopAsyncIteration:
+                second_part = None
+
+            if second_part is None:
+                resp = await self.client.put_object(Body=first_part, **object_args)
+                return resp.get("ETag"), len(first_part)
+            return await self._multipart_upload(
+                object_args, first_part, second_part, parts, max_concurrency
+            )
+        finally:
+            # closes the file when source is a path
+            await parts.aclose()
+
+    async def _multipart_upload(
+        self, object_args, first_part, second_part, parts, max_concurrency
+    ):
+        upload = await self.client.create_multipart_upload(**object_args)
+        upload_args = {
+            "Bucket": object_args["Bucket"],
+            "Key": object_args["Key"],
+            "UploadId": upload["UploadId"],
+        }
+        semaphore = asyncio.Semaphore(max_concurrency)
+        tasks, size = [], 0
+
+        async def _upload_part(part_number, body):
+            try:
+                resp = await self.client.upload_part(
+                    PartNumber=part_number, Body=body, **upload_args
+                )
+                return {"PartNumber": part_number, "ETag": resp["ETag"]}
+            finally:
+                semaphore.release()
+
+        async def _all_parts():
+            yield first_part
+            yield second_part
+            async for part in parts:
+                yield part
+
+        try:
+            part_number = 0
+            async for part in _all_parts():
+                part_number += 1
+                if part_number > MAX_PARTS:
+                    raise Exception(
+                        ErrorMessages.AwsS3TooManyParts.value.format(max_parts=MAX_PARTS)
+                    )
+                size += len(part)
+                # waits for a running part to finish before the next one is read
+                await semaphore.acquire()
+                tasks.append(asyncio.ensure_future(_upload_part(part_number, part)))
+                if any(task.done() and task.exception() for task in tasks):
+                    break
+            uploaded_parts = await asyncio.gather(*tasks)
+            resp = await self.client.complete_multipart_upload(
+                MultipartUpload={"Parts": uploaded_parts}, **upload_args
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.client.abort_multipart_upload(**upload_args)
+            except Exception as e:
+                logger.info(
+                    "Could not abort multipart upload of {}: {}".format(
+                        object_args["Key"], str(e)
+                    )
+                )
+            raise
+        return resp.get("ETag"), size
+
     async def generate_presigned_post(
         self,
         content_type: str,
@@ -247,18 +442,17 @@ class BaseS3Wrapper(metaclass=Singleton):
         aws_access_key_id = config.get("AWS_ACCESS_KEY_ID", "").strip() or None
         aws_secret_access_key = config.get("AWS_SECRET_ACCESS_KEY", "").strip() or None
 
-        client = await S3Client.create_s3_client(
+        return await AWSClientRegistry.acquire(
+            S3Client.aws_service_name,
             config.get("S3_REGION"),
             aws_secret_access_key=aws_secret_access_key,
             aws_access_key_id=aws_access_key_id,
             endpoint_url=endpoint_url,
             connect_timeout=connect_timeout,
             read_timeout=read_timeout,
-            **kwargs
+            **dict(AWSClient.get_connection_config(config), **kwargs)
         )
 
-        return await client.__aenter__()
-
     async def _s3_client(self):
         """
         Function returns S3 client if it is present otherwise generates S3 client
@@ -266,16 +460,22 @@ class BaseS3Wrapper(metaclass=Singleton):
         :return: AioBaseClient S3 Object
         """
 
+        if self.client is None:
+            self.client = await self._create_s3_client()
+        return self.client
+
+    async def close(self):
         if self.client is not None:
-            return self.client
-        return await self._create_s3_client()
+            # shared client, closed by the registry once no wrapper uses it
+            await AWSClientRegistry.release(self.client)
+            self.client = None
 
     def validate(self, file_object):
         max_size_in_bytes = self.config.get(
             "MAX_FILE_SIZE_IN_BYTES", DEFAULTS["MAX_FILE_SIZE_IN_BYTES"]
         )
         if isinstance(file_object, bytes):
-            file_size = getsizeof(file_object)
+            file_size = len(file_object)
             if file_size > max_size_in_bytes:
                 raise Exception(
                     ErrorMessages.MaxFileSizeExceeded.value.format(
@@ -284,12 +484,14 @@ class BaseS3Wrapper(metaclass=Singleton):
                 )
 
     async def get_presigned_urls(self, user_data, user_id):
-        response = list()
         try:
-            for url_data in user_data:
-                response.append(
-                    await self.get_presigned_data_after_saving(user_id, url_data)
-                )
+            await self._s3_client()
+            response = await asyncio.gather(
+                *[
+                    self.get_presigned_data_after_saving(user_id, url_data)
+                    for url_data in user_data
+                ]
+            )
         except Exception as error:
             raise Exception(
                 ErrorMessages.SomethingWentWrongError.value.format(error=error)
@@ -336,35 +538,86 @@ class BaseS3Wrapper(metaclass=Singleton):
             data.pop("identifier")
         return result, db_data_list
 
-    async def validate_presigned_urls_aws(self, urls):
-        tasks = []
-        for url in urls:
-            tasks.append(self.validate_url_exists_in_aws(url))
-        try:
-            response = await asyncio.gather(*tasks)
-        except Exception as error:
+    async def validate_presigned_urls_aws(
+        self, urls, max_concurrency=DEFAULT_VALIDATION_CONCURRENCY
+    ):
+        """
+        :return: metadata of every url, in order. Raises if any url can not be validated,
+        use validate_presigned_urls for per url results.
+        """
+        results = await self.validate_presigned_urls(urls, max_concurrency)
+        for result in results:
+            if result["error"] is not None:
+                raise Exception(
+                    ErrorMessages.SomethingWentWrongError.value.format(
+                        error=result["error"]
+                    )
+                )
+        return [result["metadata"] for result in results]
 
-            raise Exception(
-                ErrorMessages.SomethingWentWrongError.value.format(error=error)
-            )
-        return response
+    async def validate_presigned_urls(
+        self, urls, max_concurrency=DEFAULT_VALIDATION_CONCURRENCY
+    ):
+        """
+        HEAD every url with at most max_concurrency requests in flight.
+        :return: [{"url", "metadata", "error"}] in the order of urls, metadata is None and error
+        the failure message when the url could not be validated
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-    async def validate_url_exists_in_aws(self, url):
-        _aiohttp_session = await BaseApiRequest.get_session()
-        aws_response = await _aiohttp_session.request("head", url)
-        try:
-            if aws_response.status != 200:
-                raise Exception(ErrorMessages.PresignedUrlDoesNotExist.value)
-            filtered_headers = self._filter_aws_headers_response(aws_response.headers)
+        async def _validate(url):
+            try:
+                async with semaphore:
+                    metadata = await self.validate_url_exists_in_aws(url)
+                return {"url": url, "metadata": metadata, "error": None}
+            except Exception as e:
+                return {"url": url, "metadata": None, "error": str(e)}
 
-            file_name = url.split("/")[-1]
-            filtered_headers.update(name=file_name)
-        finally:
-            if aws_response and hasattr(aws_response, "release"):
-                await aws_response.release()
+        return list(await asyncio.gather(*[_validate(url) for url in urls]))
 
+    async def validate_url_exists_in_aws(self, url):
+        # presigned urls of an object differ only by their query string
+        object_url = url.split("?")[0]
+        filtered_headers = self._get_cached_head(object_url)
+        if filtered_headers is None:
+            _aiohttp_session = await BaseApiRequest.get_session()
+            aws_response = await _aiohttp_session.request("head", url)
+            try:
+                if aws_response.status != 200:
+                    raise Exception(ErrorMessages.PresignedUrlDoesNotExist.value)
+                filtered_headers = self._filter_aws_headers_response(
+                    aws_response.headers
+                )
+            finally:
+                if aws_response and hasattr(aws_response, "release"):
+                    await aws_response.release()
+            self._set_cached_head(object_url, filtered_headers)
+
+        filtered_headers = dict(filtered_headers)
+        file_name = url.split("/")[-1]
+        filtered_headers.update(name=file_name)
         return filtered_headers
 
+    def _get_cached_head(self, object_url):
+        entry = self._head_cache.get(object_url)
+        if entry is None:
+            return None
+        headers, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._head_cache[object_url]
+            return None
+        return headers
+
+    def _set_cached_head(self, object_url, headers):
+        ttl = self.config.get("HEAD_CACHE_TTL", DEFAULT_HEAD_CACHE_TTL)
+        if not ttl:
+            return
+        # only found objects are cached, a missing one may be uploaded any moment
+        self._head_cache[object_url] = (headers, time.monotonic() + ttl)
+        self._head_cache.move_to_end(object_url)
+        while len(self._head_cache) > HEAD_CACHE_MAX_SIZE:
+            self._head_cache.popitem(last=False)
+
     @staticmethod
     def _filter_aws_headers_response(headers):
         file_size = int(headers["CONTENT-LENGTH"])
@@ -379,19 +632,692 @@ class BaseS3Wrapper(metaclass=Singleton):
             "resource_type": resource_type,
         }
 
-    async def delete_file(self, key):
+    @create_client
+    async def put_file(
+        self, key, body, content_type="application/octet-stream", bucket=None
+    ):
+        """
+        Store an object as is, without the content type, size and ACL rules of upload()
+        :param key: object key
+        :param body: bytes or str
+        :param content_type: content type of the object
+        :param bucket: defaults to S3_BUCKET from config
+        :return: ETag of the object
+        """
+        bucket = bucket or self.config["S3_BUCKET"]
+        resp = await self.client.put_object(
+            Bucket=bucket, Key=key, Body=body, ContentType=content_type
+        )
+        return resp.get("ETag", "").replace('"', "")
+
+    @create_client
+    async def read_file(self, key, bucket=None):
+        """
+        :param key: object key
+        :param bucket: defaults to S3_BUCKET from config
+        :return: object content as bytes
+        """
+        bucket = bucket or self.config["S3_BUCKET"]
+        resp = await self.client.get_object(Bucket=bucket, Key=key)
+        async with resp["Body"] as stream:
+            return await stream.read()
+
+    @create_client
+    async def copy_file(
+        self,
+        source_key,
+        key,
+        source_bucket=None,
+        bucket=None,
+        max_concurrency=DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+    ):
+        """
+        Server side copy, the content never leaves S3. Objects uploaded in parts and objects
+        above the copy_object limit (5 GB) are copied part by part with the part layout of the
+        source, so the copy keeps the ETag of the source.
+        :param source_key: key of the object to copy
+        :param key: key of the copy
+        :param source_bucket: defaults to S3_BUCKET from config
+        :param bucket: bucket of the copy, defaults to S3_BUCKET from config
+        :param max_concurrency: max number of parts copied at the same time
+        :return: ETag of the copy
+        """
+        source_bucket = source_bucket or self.config["S3_BUCKET"]
+        bucket = bucket or self.config["S3_BUCKET"]
+        acl = self.config.get("ACL", DEFAULTS["ACL"])
+        copy_source = {"Bucket": source_bucket, "Key": source_key}
+        head = await self.client.head_object(**copy_source)
+        object_args = {"Bucket": bucket, "Key": key}
+        if acl != "no-acl":
+            object_args["ACL"] = acl
+
+        if "-" not in head["ETag"] and head["ContentLength"] <= MAX_COPY_SIZE_IN_BYTES:
+            resp = await self.client.copy_object(
+                CopySource=copy_source, CopySourceIfMatch=head["ETag"], **object_args
+            )
+            return resp["CopyObjectResult"]["ETag"]
+
+        part_size = max(
+            DEFAULTS["MULTIPART"]["COPY_PART_SIZE_IN_BYTES"],
+            -(-head["ContentLength"] // MAX_PARTS),
+        )
+        if "-" in head["ETag"]:
+            first_part = await self.client.head_object(PartNumber=1, **copy_source)
+            part_size = first_part["ContentLength"]
+        upload = await self.client.create_multipart_upload(
+            ContentType=head.get("ContentType", "binary/octet-stream"),
+            Metadata=head.get("Metadata", {}),
+            **object_args
+        )
+        upload_args = {"Bucket": bucket, "Key": key, "UploadId": upload["UploadId"]}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _copy_part(part_number, start, end):
+            async with semaphore:
+                resp = await self.client.upload_part_copy(
+                    PartNumber=part_number,
+                    CopySource=copy_source,
+                    CopySourceIfMatch=head["ETag"],
+                    CopySourceRange="bytes={}-{}".format(start, end),
+                    **upload_args
+                )
+            return {"PartNumber": part_number, "ETag": resp["CopyPartResult"]["ETag"]}
+
+        tasks = [
+            asyncio.ensure_future(_copy_part(part_number, start, end))
+            for part_number, (start, end) in enumerate(
+                self._get_ranges(head["ContentLength"], part_size), 1
+            )
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+            resp = await self.client.complete_multipart_upload(
+                MultipartUpload={"Parts": parts}, **upload_args
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.client.abort_multipart_upload(**upload_args)
+            except Exception as e:
+                logger.info(
+                    "Could not abort multipart copy of {}: {}".format(key, str(e))
+                )
+            raise
+        return resp["ETag"]
+
+    async def stream(
+        self,
+        key,
+        bucket=None,
+        part_size=DEFAULTS["MULTIPART"]["PART_SIZE_IN_BYTES"],
+        max_concurrency=DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+        verify=True,
+    ):
+        """
+        Async iterator over the content of an object, fetched with concurrent ranged GETs
+        and yielded in order. At most max_concurrency parts are held in memory.
+        :param key: object key
+        :param bucket: defaults to S3_BUCKET from config
+        :param part_size: bytes per ranged GET
+        :param max_concurrency: max number of ranged GETs in flight
+        :param verify: check the content against the ETag once the last part is read
+        """
+        await self._s3_client()
+        bucket = bucket or self.config["S3_BUCKET"]
+        head, verifier = await self._head_for_download(bucket, key, verify)
+        ranges = iter(self._get_ranges(head["ContentLength"], part_size))
+        tasks = deque()
+
+        def _schedule_next():
+            byte_range = next(ranges, None)
+            if byte_range is not None:
+                tasks.append(
+                    asyncio.ensure_future(
+                        self._get_range(bucket, key, head["ETag"], *byte_range)
+                    )
+                )
+
+        try:
+            for _ in range(max_concurrency):
+                _schedule_next()
+            while tasks:
+                data = await tasks.popleft()
+                _schedule_next()
+                if verifier is not None:
+                    verifier.update(data)
+                yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._check_etag(verifier, key)
+
+    @create_client
+    async def download(
+        self,
+        key,
+        destination=None,
+        bucket=None,
+        part_size=DEFAULTS["MULTIPART"]["PART_SIZE_IN_BYTES"],
+        max_concurrency=DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+        verify=True,
+        throttle=None,
+    ):
+        """
+        Download an object with concurrent ranged GETs. Interrupted ranges are resumed from
+        the last received byte, and the ETag is sent as If-Match so every range comes from
+        the same version of the object.
+        :param key: object key
+        :param destination: file path, the object is written to <destination>.part and renamed
+        once complete. When not passed the object is returned in an anonymous mmap.
+        :param bucket: defaults to S3_BUCKET from config
+        :param part_size: bytes per ranged GET
+        :param max_concurrency: max number of ranged GETs in flight
+        :param verify: check the content against the ETag
+        :param throttle: coroutine function called with the size of every chunk received,
+        e.g. RateLimiter.acquire to limit the download rate
+        :return: destination, or the mmap holding the object
+        """
+        bucket = bucket or self.config["S3_BUCKET"]
+        head, verifier = await self._head_for_download(bucket, key, verify)
+        size = head["ContentLength"]
+        if destination is None:
+            target = mmap.mmap(-1, max(size, 1))
+        else:
+            temp_path = "{}.part".format(destination)
+            target = await run_blocking(open, temp_path, "wb+")
+            await run_blocking(target.truncate, size)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        write_lock = asyncio.Lock()
+
+        async def _download_range(start, end):
+            async with semaphore:
+                data = await self._get_range(
+                    bucket, key, head["ETag"], start, end, throttle=throttle
+                )
+            async with write_lock:
+                await run_blocking(self._write_at, target, start, data)
+
+        try:
+            await asyncio.gather(
+                *[
+                    _download_range(start, end)
+                    for start, end in self._get_ranges(size, part_size)
+                ]
+            )
+            if verifier is not None:
+                await run_blocking(self._update_verifier, verifier, target, size)
+                self._check_etag(verifier, key)
+        except BaseException:
+            if destination is not None:
+                await run_blocking(target.close)
+                await run_blocking(os.remove, temp_path)
+            else:
+                target.close()
+            raise
+
+        if destination is None:
+            target.seek(0)
+            return target
+        await run_blocking(target.close)
+        await run_blocking(os.replace, temp_path, destination)
+        return destination
+
+    async def _head_for_download(self, bucket, key, verify):
+        head = await self.client.head_object(Bucket=bucket, Key=key)
+        verifier = None
+        # ETags of SSE-KMS / SSE-C encrypted objects are not MD5 based
+        if verify and head.get("ServerSideEncryption") in (None, "AES256"):
+            if "-" in head["ETag"]:
+                first_part = await self.client.head_object(
+                    Bucket=bucket, Key=key, PartNumber=1, IfMatch=head["ETag"]
+                )
+                verifier = ETagVerifier(head["ETag"], first_part["ContentLength"])
+            else:
+                verifier = ETagVerifier(head["ETag"])
+        return head, verifier
+
+    async def _get_range(
+        self, bucket, key, etag, start, end, max_retries=3, throttle=None
+    ):
+        data, attempt = bytearray(), 0
+        while True:
+            try:
+                resp = await self.client.get_object(
+                    Bucket=bucket,
+                    Key=key,
+                    Range="bytes={}-{}".format(start + len(data), end),
+                    IfMatch=etag,
+                )
+                async with resp["Body"] as body:
+                    while True:
+                        chunk = await body.read(DOWNLOAD_CHUNK_SIZE_IN_BYTES)
+                        if not chunk:
+                            break
+                        if throttle is not None:
+                            await throttle(len(chunk))
+                        data.extend(chunk)
+                if len(data) != end - start + 1:
+                    raise Exception(
+                        ErrorMessages.AwsS3IncompleteRead.value.format(
+                            key=key, start=start, end=end
+                        )
+                    )
+                return bytes(data)
+            except botocore.exceptions.ClientError as error:
+                # object was overwritten while downloading, retrying cannot help
+                if error.response["Error"]["Code"] in ("PreconditionFailed", "412"):
+                    raise
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+            except Exception:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+            await asyncio.sleep(0.1 * (2 ** (attempt - 1)))
+
+    @staticmethod
+    def _get_ranges(size, part_size):
+        return [
+            (start, min(start + part_size, size) - 1)
+            for start in range(0, size, part_size)
+        ]
+
+    @staticmethod
+    def _write_at(target, offset, data):
+        target.seek(offset)
+        target.write(data)
+
+    @staticmethod
+    def _update_verifier(verifier, target, size):
+        target.seek(0)
+        remaining = size
+        while remaining > 0:
+            data = target.read(min(DOWNLOAD_CHUNK_SIZE_IN_BYTES * 16, remaining))
+            verifier.update(data)
+            remaining -= len(data)
+
+    @staticmethod
+    def _check_etag(verifier, key):
+        if verifier is not None and not verifier.verify():
+            raise Exception(
+                ErrorMessages.AwsS3ChecksumMismatch.value.format(
+                    key=key, etag=verifier.etag
+                )
+            )
+
+    async def select_records(
+        self,
+        key,
+        expression: str = None,
+        predicate=None,
+        input_format: str = "JSON",
+        compression: str = "NONE",
+        bucket=None,
+    ):
+        """
+        Async iterator of the records of a CSV (with a header line) or JSON lines object
+        matching a query, yielded as dicts while the object is read.
+        With expression, the query runs in S3 (select_object_content) and only matching records
+        are transferred. Without expression, or when S3 Select is not available for the object
+        and predicate is passed, the object is streamed with ranged GETs and predicate is applied
+        to every record.
+            async for row in s3.select_records(
+                "reports/orders.csv",
+                expression="SELECT * FROM S3Object s WHERE s.city = 'Delhi'",
+                predicate=lambda row: row["city"] == "Delhi",
+                input_format="CSV",
+            ):
+        CSV values are strings in both cases, quoted values spanning lines are not supported
+        when streaming.
+        :param key: object key
+        :param expression: S3 Select SQL expression
+        :param predicate: callable(record) -> bool, None keeps every record
+        :param input_format: "CSV" or "JSON" (JSON lines)
+        :param compression: "NONE" or "GZIP"
+        :param bucket: defaults to S3_BUCKET from config
+        """
+        await self._s3_client()
+        bucket = bucket or self.config["S3_BUCKET"]
+        if expression is not None:
+            try:
+                records = self._select_object_content(
+                    bucket, key, expression, input_format, compression
+                )
+                first_record = await records.__anext__()
+            except StopAsyncIteration:
+                return
+            except botocore.exceptions.ClientError as error:
+                if (
+                    predicate is None
+                    or error.response["Error"]["Code"] not in SELECT_UNAVAILABLE_ERRORS
+                ):
+                    raise
+                logger.info(
+                    "S3 Select not available for {}, streaming it: {}".format(
+                        key, str(error)
+                    )
+                )
+            else:
+                yield first_record
+                async for record in records:
+                    yield record
+                return
+
+        async for record in self._scan_records(bucket, key, input_format, compression):
+            if predicate is None or predicate(record):
+                yield record
+
+    async def _select_object_content(
+        self, bucket, key, expression, input_format, compression
+    ):
+        if input_format == "CSV":
+            input_serialization = {"CSV": {"FileHeaderInfo": "USE"}}
+        else:
+            input_serialization = {"JSON": {"Type": "LINES"}}
+        input_serialization["CompressionType"] = compression
+        resp = await self.client.select_object_content(
+            Bucket=bucket,
+            Key=key,
+            Expression=expression,
+            ExpressionType="SQL",
+            InputSerialization=input_serialization,
+            OutputSerialization={"JSON": {"RecordDelimiter": "\n"}},
+        )
+
+        async def _payloads():
+            async for event in resp["Payload"]:
+                if "Records" in event:
+                    yield event["Records"]["Payload"]
+
+        # a record can be split across events
+        async for line in iter_lines(_payloads()):
+            if line:
+                yield ujson.loads(line)
+
+    async def _scan_records(self, bucket, key, input_format, compression):
+        lines = iter_lines(
+            iter_decompressed(self.stream(key, bucket=bucket, verify=False), compression)
+        )
+        if input_format != "CSV":
+            async for line in lines:
+                if line.strip():
+                    yield ujson.loads(line)
+            return
+
+        header = None
+        async for line in lines:
+            if not line:
+                continue
+            row = next(csv.reader([line.decode(Constant.UTF8)]))
+            if header is None:
+                header = row
+                continue
+            yield dict(zip(header, row))
+
+    @create_client
+    async def delete_file(self, key, bucket=None):
         config = self.config
-        bucket = config["S3_BUCKET"]
+        bucket = bucket or config["S3_BUCKET"]
         await self.client.delete_object(Bucket=bucket, Key=key)
 
+    @create_client
+    async def delete_files(
+        self,
+        keys=None,
+        prefix: str = None,
+        bucket=None,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+    ):
+        """
+        Delete keys in batches of 1000 (DeleteObjects limit), running batches concurrently.
+        :param keys: iterable of keys to delete
+        :param prefix: delete every key under this prefix, keys are deleted page by page while
+        listing. Pass "" to empty the bucket.
+        :param bucket: defaults to S3_BUCKET from config
+        :param max_concurrency: max number of DeleteObjects requests in flight
+        :param max_retries: attempts per batch, throttled / internal errors are retried
+        :return: {"Deleted": [key], "Errors": [{"Key", "Code", "Message"}]}
+        """
+        if keys is None and prefix is None:
+            raise Exception(ErrorMessages.AwsS3DeleteKeysMissing.value)
+        bucket = bucket or self.config["S3_BUCKET"]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        result = {"Deleted": [], "Errors": []}
+        tasks = []
+
+        async def _delete_batch(batch):
+            try:
+                response = await self._delete_batch(bucket, batch, max_retries)
+            finally:
+                semaphore.release()
+            result["Deleted"].extend(response["Deleted"])
+            result["Errors"].extend(response["Errors"])
+
+        async def _schedule(batch):
+            # acquired before the task is created so listing waits for free slots
+            await semaphore.acquire()
+            tasks.append(asyncio.ensure_future(_delete_batch(batch)))
+
+        try:
+            if keys is not None:
+                keys = list(keys)
+                for start in range(0, len(keys), Constant.S3_MAX_DELETE_BATCH_KEYS):
+                    await _schedule(
+                        keys[start : start + Constant.S3_MAX_DELETE_BATCH_KEYS]
+                    )
+            else:
+                paginator = self.client.get_paginator("list_objects_v2")
+                async for page in paginator.paginate(
+                    Bucket=bucket,
+                    Prefix=prefix,
+                    PaginationConfig={"PageSize": Constant.S3_MAX_DELETE_BATCH_KEYS},
+                ):
+                    batch = [item["Key"] for item in page.get("Contents", [])]
+                    if batch:
+                        await _schedule(batch)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return result
+
+    async def _delete_batch(self, bucket, keys: list, max_retries: int):
+        deleted, errors, attempt = [], [], 0
+        while keys:
+            attempt += 1
+            try:
+                response = await self.client.delete_objects(
+                    Bucket=bucket,
+                    Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+                )
+                retryable_codes = self.DELETE_RETRYABLE_ERRORS
+            except Exception as e:
+                logger.info(
+                    ErrorMessages.AwsS3DeleteError.value.format(error=e, count=attempt)
+                )
+                code = type(e).__name__
+                if isinstance(e, botocore.exceptions.ClientError):
+                    code = e.response.get("Error", {}).get("Code", code)
+                response = {
+                    "Errors": [
+                        {"Key": key, "Code": code, "Message": str(e)} for key in keys
+                    ]
+                }
+                # access / validation errors fail the same way when retried
+                retryable_codes = set()
+                if self._is_retryable_delete_error(e):
+                    retryable_codes = {code}
+
+            failed_keys, retry_keys = set(), set()
+            for error in response.get("Errors", []):
+                failed_keys.add(error["Key"])
+                if error.get("Code") in retryable_codes and attempt < max_retries:
+                    retry_keys.add(error["Key"])
+                else:
+                    errors.append(
+                        {
+                            "Key": error["Key"],
+                            "Code": error.get("Code"),
+                            "Message": error.get("Message"),
+                        }
+                    )
+            # quiet mode only reports the keys that failed
+            deleted.extend(key for key in keys if key not in failed_keys)
+            keys = [key for key in keys if key in retry_keys]
+            if keys:
+                await asyncio.sleep(self.DELETE_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        return {"Deleted": deleted, "Errors": errors}
+
+    def _is_retryable_delete_error(self, error):
+        if isinstance(error, botocore.exceptions.ClientError):
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            return (
+                error.response.get("Error", {}).get("Code")
+                in self.DELETE_RETRYABLE_ERRORS
+                or (status is not None and status >= 500)
+            )
+        # connection errors and timeouts
+        return isinstance(
+            error,
+            (
+                botocore.exceptions.ConnectionError,
+                botocore.exceptions.HTTPClientError,
+                asyncio.TimeoutError,
+            ),
+        )
+
+    async def list_files(
+        self,
+        prefix: str = "",
+        bucket=None,
+        start_after: str = None,
+        delimiter: str = None,
+        fan_out: bool = False,
+        max_concurrency: int = 4,
+        page_size: int = 1000,
+        suffix: str = None,
+        min_size: int = None,
+        max_size: int = None,
+        modified_after=None,
+        modified_before=None,
+    ):
+        """
+        Async iterator of S3Object, listed page by page with list_objects_v2 so listing can be
+        stopped early and never holds more than a few pages in memory.
+        :param prefix: only keys starting with prefix
+        :param bucket: defaults to S3_BUCKET from config
+        :param start_after: only keys after this key, pass the last key seen to resume a listing
+        :param delimiter: only keys directly under prefix (keys in "sub folders" are skipped)
+        :param fan_out: list every common prefix ("sub folder") under prefix concurrently.
+        Keys are then yielded in order within a common prefix only.
+        :param max_concurrency: max number of common prefixes listed at once with fan_out
+        :param page_size: keys per list_objects_v2 request, at most 1000
+        S3 can only filter on prefix / start_after / delimiter, the filters below are applied
+        to each page as it is listed:
+        :param suffix: only keys ending with suffix
+        :param min_size: only objects of at least min_size bytes
+        :param max_size: only objects of at most max_size bytes
+        :param modified_after: only objects modified after this (aware) datetime
+        :param modified_before: only objects modified before this (aware) datetime
+        """
+        await self._s3_client()
+        bucket = bucket or self.config["S3_BUCKET"]
+
+        def _matches(content):
+            if suffix is not None and not content["Key"].endswith(suffix):
+                return False
+            if min_size is not None and content["Size"] < min_size:
+                return False
+            if max_size is not None and content["Size"] > max_size:
+                return False
+            if modified_after is not None and content["LastModified"] <= modified_after:
+                return False
+            if modified_before is not None and content["LastModified"] >= modified_before:
+                return False
+            return True
+
+        def _list(list_prefix, list_start_after, list_delimiter):
+            return self._list_pages(
+                bucket, list_prefix, list_start_after, list_delimiter, page_size
+            )
+
+        if not fan_out:
+            async for page in _list(prefix, start_after, delimiter):
+                for content in page.get("Contents", []):
+                    if _matches(content):
+                        yield S3Object.from_listing(bucket, content)
+            return
+
+        common_prefixes = []
+        async for page in _list(prefix, start_after, "/"):
+            for content in page.get("Contents", []):
+                if _matches(content):
+                    yield S3Object.from_listing(bucket, content)
+            common_prefixes.extend(
+                item["Prefix"] for item in page.get("CommonPrefixes", [])
+            )
+        if delimiter is not None:
+            return
+
+        queue = asyncio.Queue(maxsize=max_concurrency * page_size)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        done = object()
+
+        async def _list_prefix(common_prefix):
+            try:
+                async with semaphore:
+                    prefix_start_after = None
+                    # start_after is the key inside this prefix the listing resumes from
+                    if start_after and start_after.startswith(common_prefix):
+                        prefix_start_after = start_after
+                    async for page in _list(common_prefix, prefix_start_after, None):
+                        for content in page.get("Contents", []):
+                            if _matches(content):
+                                await queue.put(S3Object.from_listing(bucket, content))
+            except Exception as e:
+                await queue.put(e)
+            await queue.put(done)
+
+        tasks = [
+            asyncio.ensure_future(_list_prefix(common_prefix))
+            for common_prefix in common_prefixes
+        ]
+        try:
+            pending = len(tasks)
+            while pending:
+                item = await queue.get()
+                if item is done:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _list_pages(self, bucket, prefix, start_after, delimiter, page_size):
+        params = {
+            "Bucket": bucket,
+            "Prefix": prefix,
+            "PaginationConfig": {"PageSize": page_size},
+        }
+        if start_after:
+            params["StartAfter"] = start_after
+        if delimiter:
+            params["Delimiter"] = delimiter
+        paginator = self.client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(**params):
+            yield page
+
     async def fetch_files(self, prefix: str = "", delimiter: str = "/"):
-        config = self.config
-        bucket = config["S3_BUCKET"]
-        paginator = self.client.get_paginator("list_objects")
-        files = []
-        async for result in paginator.paginate(
-            Bucket=bucket, Prefix=prefix, Delimiter=delimiter
-        ):
-            for file in result.get("Contents", []):
-                files.append(file.get("Key"))
-        return files
+        return [
+            s3_object.key
+            async for s3_object in self.list_files(prefix, delimiter=delimiter)
+        ]
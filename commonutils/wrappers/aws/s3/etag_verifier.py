@@ -0,0 +1,48 @@
+import hashlib
+
+
+class ETagVerifier:
+    """
+    Recomputes the ETag of an S3 object from its content, fed in order through update().
+    Single part ETags are the MD5 of the object, multipart ones the MD5 of the concatenated
+    part MD5s followed by -<number of parts>, so the part size of the original upload is needed.
+    """
+
+    def __init__(self, etag: str, part_size: int = None):
+        """
+        :param etag: ETag returned by S3, with or without quotes
+        :param part_size: size of the parts of the original upload, only for multipart ETags
+        """
+        self.etag = etag.strip('"')
+        self.multipart = "-" in self.etag
+        self.part_size = part_size
+        self._part_digests = []
+        self._md5 = hashlib.md5()
+        self._part_bytes = 0
+
+    def update(self, data: bytes):
+        view = memoryview(data)
+        while len(view):
+            if self.multipart and self.part_size:
+                take = min(len(view), self.part_size - self._part_bytes)
+            else:
+                take = len(view)
+            self._md5.update(view[:take])
+            self._part_bytes += take
+            view = view[take:]
+            if self.multipart and self._part_bytes == self.part_size:
+                self._part_digests.append(self._md5.digest())
+                self._md5 = hashlib.md5()
+                self._part_bytes = 0
+
+    def verify(self):
+        """
+        :return: True when the content matches the ETag
+        """
+        if not self.multipart:
+            return self._md5.hexdigest() == self.etag
+        digests = list(self._part_digests)
+        if self._part_bytes or not digests:
+            digests.append(self._md5.digest())
+        combined = hashlib.md5(b"".join(digests)).hexdigest()
+        return "{}-{}".format(combined, len(digests)) == self.etag
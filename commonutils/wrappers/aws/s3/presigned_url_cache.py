@@ -0,0 +1,143 @@
+import logging
+import time
+from collections import OrderedDict
+
+import ujson
+
+logger = logging.getLogger()
+
+
+class PresignedUrlCache:
+    """
+    LRU cache of presigned URLs keyed by (bucket, key, operation), used by Presigner.
+    A cached URL is returned while it stays valid for nearly as long as the caller asked for
+    (expires_in less expiry_tolerance seconds, and at least min_validity seconds), so the same
+    object keeps the same URL (CDN / browser cache friendly) and is not signed again.
+    An optional redis tier shares URLs between processes:
+        cache = PresignedUrlCache(max_size=50000, redis_wrapper=redis_wrapper)
+        presigner = Presigner(config, url_cache=cache)
+    redis_wrapper must expose get(key) and set(key, value, ex=seconds), like the RedisWrapper
+    used by RedisProducerConsumerManager.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        min_validity: int = 300,
+        expiry_tolerance: int = 300,
+        redis_wrapper=None,
+        redis_key_prefix: str = "commonutils:presigned_url:",
+    ):
+        """
+        :param max_size: max number of URLs kept in process, least recently used are evicted
+        :param min_validity: seconds a cached URL must still be valid for to be returned
+        :param expiry_tolerance: seconds a cached URL may be valid for less than the expires_in
+        asked for
+        :param redis_wrapper: optional shared tier
+        :param redis_key_prefix: prefix of the redis keys
+        """
+        self.max_size = max_size
+        self.min_validity = min_validity
+        self.expiry_tolerance = expiry_tolerance
+        self.redis_wrapper = redis_wrapper
+        self.redis_key_prefix = redis_key_prefix
+        self._urls = OrderedDict()
+        self._stats = {"hits": 0, "redis_hits": 0, "misses": 0, "evictions": 0}
+
+    async def get(
+        self, bucket_name: str, object_name: str, operation: str, expires_in: int = None
+    ):
+        """
+        :param expires_in: seconds the caller wants the URL to be valid for
+        :return: cached URL, None when missing or expiring before expires_in
+        """
+        cache_key = (bucket_name, object_name, operation)
+        min_validity = self.min_validity
+        if expires_in is not None:
+            min_validity = max(expires_in - self.expiry_tolerance, self.min_validity)
+        entry = self._urls.get(cache_key)
+        if entry is not None:
+            if self._is_valid_for(entry[1], min_validity):
+                self._urls.move_to_end(cache_key)
+                self._stats["hits"] += 1
+                return entry[0]
+            if not self._is_valid_for(entry[1], self.min_validity):
+                del self._urls[cache_key]
+                self._stats["evictions"] += 1
+
+        if self.redis_wrapper is not None:
+            entry = await self._redis_get(cache_key)
+            if entry is not None and self._is_valid_for(entry[1], min_validity):
+                self._set_local(cache_key, *entry)
+                self._stats["redis_hits"] += 1
+                return entry[0]
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(
+        self, bucket_name: str, object_name: str, operation: str, url: str, expires_in: int
+    ):
+        """
+        :param expires_in: seconds the URL was signed for, from now
+        """
+        cache_key = (bucket_name, object_name, operation)
+        expires_at = time.time() + expires_in
+        self._set_local(cache_key, url, expires_at)
+        if self.redis_wrapper is not None:
+            await self._redis_set(cache_key, url, expires_at)
+
+    def stats(self):
+        lookups = self._stats["hits"] + self._stats["redis_hits"] + self._stats["misses"]
+        hit_rate = (
+            (self._stats["hits"] + self._stats["redis_hits"]) / lookups if lookups else 0.0
+        )
+        return dict(self._stats, size=len(self._urls), hit_rate=hit_rate)
+
+    def clear(self):
+        self._urls.clear()
+
+    @staticmethod
+    def _is_valid_for(expires_at, seconds):
+        return expires_at - time.time() >= seconds
+
+    def _set_local(self, cache_key, url, expires_at):
+        self._urls[cache_key] = (url, expires_at)
+        self._urls.move_to_end(cache_key)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _get_redis_key(self, cache_key):
+        return self.redis_key_prefix + ":".join(reversed(cache_key))
+
+    async def _redis_get(self, cache_key):
+        try:
+            value = await self.redis_wrapper.get(self._get_redis_key(cache_key))
+        except Exception as e:
+            logger.error(
+                "Presigned url cache get failed with error {}".format(str(e))
+            )
+            return None
+        if not value:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode()
+        value = ujson.loads(value)
+        return value["url"], value["expires_at"]
+
+    async def _redis_set(self, cache_key, url, expires_at):
+        # kept in redis only as long as it can be served
+        ttl = int(expires_at - time.time() - self.min_validity)
+        if ttl <= 0:
+            return
+        try:
+            await self.redis_wrapper.set(
+                self._get_redis_key(cache_key),
+                ujson.dumps({"url": url, "expires_at": expires_at}),
+                ex=ttl,
+            )
+        except Exception as e:
+            logger.error(
+                "Presigned url cache set failed with error {}".format(str(e))
+            )
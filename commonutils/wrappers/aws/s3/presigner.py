@@ -1,7 +1,15 @@
+import asyncio
+from datetime import datetime, timezone
+from functools import partial
+
+from aiobotocore.session import get_session
+
 from commonutils.constants import ErrorMessages
 
 from .base_s3_wrapper import BaseS3Wrapper
+from .query_signer import S3QuerySigner
 from .s3_client import S3Client
+from .streams import run_blocking
 
 
 class Presigner(BaseS3Wrapper):
@@ -15,15 +23,31 @@ class Presigner(BaseS3Wrapper):
             - So If you use IAM Role Credentials 5 mins before its expiration to generate Presigned URL with
             expiration time of 1 hour the the URL will expire within 5 mins.
          3. IAM Role Credentials usually rotate in around 1 hour on AWS instance.
-         4. That's why we are using new S3 client in each call of this function to support the
-            expires_in value correctly.
+         4. That's why the client is re-created once its credentials are within
+            CREDENTIALS_EXPIRY_MARGIN seconds (config, default 300) of expiring, and expires_in is
+            capped at the remaining lifetime of the credentials.
     """
 
     DEFAULT_PRESIGNED_URL_EXPIRY = 1800  # 30 minutes
+    DEFAULT_CREDENTIALS_EXPIRY_MARGIN = 300  # 5 minutes
     PRESIGNER_GET_CLIENT_METHOD_NAME = "get_object"
+    PRESIGN_OFFLOAD_BATCH_SIZE = 100
+    SIGV4_MAX_EXPIRY = 604800  # 7 days
+    SIGV4_VERSIONS = ("s3v4", "v4")
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, url_cache=None):
+        """
+        :param url_cache: optional PresignedUrlCache, URLs are then reused while valid
+        """
         super().__init__(config, None)
+        self.url_cache = url_cache
+        self.credentials_expiry_margin = config.get(
+            "CREDENTIALS_EXPIRY_MARGIN", self.DEFAULT_CREDENTIALS_EXPIRY_MARGIN
+        )
+        self._client_lock = None
+        self._credentials = None
+        self._unrotated_expiry_time = None
+        self._query_signer = None
 
     async def presigned_get_url(
         self, bucket_name, object_name, expires_in=DEFAULT_PRESIGNED_URL_EXPIRY
@@ -34,11 +58,40 @@ class Presigner(BaseS3Wrapper):
         :param expires_in: Time in seconds for then Presigned URL to remain valid
         :return: Presigned URL as string. If error, return error with formatted message.
         """
+        return await self.get_presigned_url(
+            bucket_name,
+            object_name,
+            operation=self.PRESIGNER_GET_CLIENT_METHOD_NAME,
+            expires_in=expires_in,
+        )
+
+    async def get_presigned_url(
+        self,
+        bucket_name,
+        object_name,
+        operation=PRESIGNER_GET_CLIENT_METHOD_NAME,
+        expires_in=DEFAULT_PRESIGNED_URL_EXPIRY,
+    ):
+        """Generate a presigned URL to operate on a S3 object
+        :param bucket_name: string
+        :param object_name: string (with extension of file object)
+        :param operation: string ('get_object'|'put_object',..etc.)
+        :param expires_in: Time in seconds for then Presigned URL to remain valid
+        :return: Presigned URL as string. If error, return error with formatted message.
+        """
+
+        if self.url_cache is not None:
+            presigned_url = await self.url_cache.get(
+                bucket_name, object_name, operation, expires_in
+            )
+            if presigned_url is not None:
+                return presigned_url
 
         try:
             s3_client = await self._s3_client()
-            presigned_get_url = await s3_client.generate_presigned_url(
-                self.PRESIGNER_GET_CLIENT_METHOD_NAME,
+            expires_in = self._get_expires_in(expires_in)
+            presigned_url = await s3_client.generate_presigned_url(
+                operation,
                 Params={"Bucket": bucket_name, "Key": object_name},
                 ExpiresIn=expires_in,
             )
@@ -49,56 +102,197 @@ class Presigner(BaseS3Wrapper):
             raise Exception(
                 ErrorMessages.SomethingWentWrongError.value.format(error=error_message)
             )
-        finally:
-            # closing s3 client session
-            if s3_client is not None:
-                await s3_client.close()
 
-        return presigned_get_url
+        if self.url_cache is not None:
+            await self.url_cache.set(
+                bucket_name, object_name, operation, presigned_url, expires_in
+            )
+        return presigned_url
 
-    async def get_presigned_url(
+    async def get_presigned_urls_batch(
         self,
         bucket_name,
-        object_name,
+        object_names,
         operation=PRESIGNER_GET_CLIENT_METHOD_NAME,
         expires_in=DEFAULT_PRESIGNED_URL_EXPIRY,
     ):
-        """Generate a presigned URL to operate on a S3 object
+        """Generate presigned URLs for many S3 objects at once
+        With SIG_VERSION s3v4 / v4 objects are signed with one signing key, batches of
+        PRESIGN_OFFLOAD_BATCH_SIZE or more objects in threads so the event loop is not blocked.
+        Other signature versions are signed by botocore.
         :param bucket_name: string
-        :param object_name: string (with extension of file object)
-        :param operation: string ('get_object'|'put_object',..etc.)
-        :param expires_in: Time in seconds for then Presigned URL to remain valid
-        :return: Presigned URL as string. If error, return error with formatted message.
+        :param object_names: list of object names
+        :param operation: string ('get_object'|'head_object'|'put_object'|'delete_object')
+        :param expires_in: Time in seconds for the Presigned URLs to remain valid
+        :return: list of Presigned URLs, in the order of object_names
         """
+        object_names = list(object_names)
+        if self.url_cache is None:
+            return await self._presign_batch(
+                bucket_name, object_names, operation, expires_in
+            )
 
+        cached_urls = await asyncio.gather(
+            *[
+                self.url_cache.get(bucket_name, object_name, operation, expires_in)
+                for object_name in object_names
+            ]
+        )
+        missing = [
+            object_name
+            for object_name, url in zip(object_names, cached_urls)
+            if url is None
+        ]
+        if not missing:
+            return list(cached_urls)
+        await self._s3_client()
+        expires_in = self._get_expires_in(expires_in)
+        signed_urls = dict(
+            zip(
+                missing,
+                await self._presign_batch(bucket_name, missing, operation, expires_in),
+            )
+        )
+        await asyncio.gather(
+            *[
+                self.url_cache.set(bucket_name, object_name, operation, url, expires_in)
+                for object_name, url in signed_urls.items()
+            ]
+        )
+        return [
+            url if url is not None else signed_urls[object_name]
+            for object_name, url in zip(object_names, cached_urls)
+        ]
+
+    async def _presign_batch(self, bucket_name, object_names, operation, expires_in):
         try:
             s3_client = await self._s3_client()
-            presigned_url = await s3_client.generate_presigned_url(
+            expires_in = self._get_expires_in(expires_in)
+            signer = await self._get_query_signer(s3_client, operation)
+            if signer is None:
+                return list(
+                    await asyncio.gather(
+                        *[
+                            s3_client.generate_presigned_url(
+                                operation,
+                                Params={"Bucket": bucket_name, "Key": object_name},
+                                ExpiresIn=expires_in,
+                            )
+                            for object_name in object_names
+                        ]
+                    )
+                )
+
+            if expires_in > self.SIGV4_MAX_EXPIRY:
+                raise Exception(
+                    ErrorMessages.AwsS3PresignExpiryTooLong.value.format(
+                        expires_in=expires_in, max_expiry=self.SIGV4_MAX_EXPIRY
+                    )
+                )
+            presign = partial(
+                self._presign_all,
+                signer,
                 operation,
-                Params={"Bucket": bucket_name, "Key": object_name},
-                ExpiresIn=expires_in,
+                bucket_name,
+                expires_in,
+                datetime.now(timezone.utc),
+            )
+            batch_size = self.PRESIGN_OFFLOAD_BATCH_SIZE
+            if len(object_names) < batch_size:
+                return presign(object_names)
+            batches = await asyncio.gather(
+                *[
+                    run_blocking(presign, object_names[start : start + batch_size])
+                    for start in range(0, len(object_names), batch_size)
+                ]
             )
         except Exception as error:
-            error_message = "Exception for Object {}/{} : {} => {}".format(
-                bucket_name, object_name, type(error), error
+            error_message = "Exception for Objects of {} : {} => {}".format(
+                bucket_name, type(error), error
             )
             raise Exception(
                 ErrorMessages.SomethingWentWrongError.value.format(error=error_message)
             )
-        finally:
-            # closing s3 client session
-            if s3_client is not None:
-                await s3_client.close()
+        return [url for batch in batches for url in batch]
 
-        return presigned_url
+    @staticmethod
+    def _presign_all(signer, operation, bucket_name, expires_in, now, object_names):
+        return [
+            signer.presign(operation, bucket_name, object_name, expires_in, now)
+            for object_name in object_names
+        ]
+
+    async def _get_query_signer(self, client, operation):
+        """
+        :return: S3QuerySigner for the current credentials of client, None when the operation
+        or signature version needs botocore. Without SIG_VERSION botocore picks the version
+        (SigV2 in us-east-1), so only an explicit s3v4 / v4 is signed locally.
+        """
+        if (
+            self._credentials is None
+            or not S3QuerySigner.supports(operation)
+            or self.config.get("SIG_VERSION") not in self.SIGV4_VERSIONS
+        ):
+            return None
+        # refreshes role credentials when needed
+        frozen_credentials = await self._credentials.get_frozen_credentials()
+        signer = self._query_signer
+        if (
+            signer is None
+            or signer.credentials != frozen_credentials
+            or signer.region_name != client.meta.region_name
+        ):
+            signer = S3QuerySigner(
+                frozen_credentials, client.meta.region_name, client.meta.endpoint_url
+            )
+            self._query_signer = signer
+        return signer
 
     async def _s3_client(self):
         """
-        Function returns S3 client if it is present otherwise generates S3 client
-        with config passed on to this class.
+        Function returns the cached S3 client, re-created when its credentials are about
+        to expire.
         :return: AioBaseClient S3 Object
         """
-        return await self._create_s3_client()
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+        async with self._client_lock:
+            if self.client is None or self._credentials_expiring():
+                expired_client, self.client = self.client, await self._create_s3_client()
+                if expired_client is not None:
+                    # presigning is local, no request can be in flight on this client
+                    await expired_client.close()
+                if self._credentials_expiring():
+                    # credentials are not rotated yet, keep this client until they are
+                    self._unrotated_expiry_time = self._get_expiry_time()
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def _credentials_expiring(self):
+        expiry_time = self._get_expiry_time()
+        if expiry_time is None or expiry_time == self._unrotated_expiry_time:
+            return False
+        return self._get_seconds_until(expiry_time) <= self.credentials_expiry_margin
+
+    def _get_expires_in(self, expires_in):
+        expiry_time = self._get_expiry_time()
+        if expiry_time is None:
+            return expires_in
+        return max(1, min(expires_in, int(self._get_seconds_until(expiry_time))))
+
+    def _get_expiry_time(self):
+        """
+        :return: expiry time of the credentials of the client, None for static credentials
+        """
+        return getattr(self._credentials, "_expiry_time", None)
+
+    @staticmethod
+    def _get_seconds_until(expiry_time):
+        return (expiry_time - datetime.now(timezone.utc)).total_seconds()
 
     async def _create_s3_client(self):
         """
@@ -111,10 +305,15 @@ class Presigner(BaseS3Wrapper):
         connect_timeout, read_timeout = timeout_config.get(
             "CONNECT"
         ), timeout_config.get("READ")
+        # the session resolves the credentials the client signs with
+        session = get_session()
         client = await S3Client.create_s3_client(
             self.config.get("S3_REGION"),
             connect_timeout=connect_timeout,
             read_timeout=read_timeout,
             signature_version=self.config.get("SIG_VERSION"),
+            session=session,
         )
-        return await client.__aenter__()
+        client = await client.__aenter__()
+        self._credentials = await session.get_credentials()
+        return client
@@ -0,0 +1,47 @@
+class S3Object:
+    """
+    Metadata of a listed S3 object, slotted as listings can yield millions of them.
+    """
+
+    __slots__ = ("bucket", "key", "size", "etag", "last_modified", "storage_class")
+
+    def __init__(
+        self, bucket, key, size=None, etag=None, last_modified=None, storage_class=None
+    ):
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.storage_class = storage_class
+
+    @classmethod
+    def from_listing(cls, bucket: str, content: dict):
+        """
+        :param content: item of Contents in a list_objects_v2 response
+        """
+        return cls(
+            bucket,
+            content["Key"],
+            size=content.get("Size"),
+            etag=content.get("ETag", "").strip('"') or None,
+            last_modified=content.get("LastModified"),
+            storage_class=content.get("StorageClass"),
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, S3Object):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        # equal objects share bucket, key and etag
+        return hash((self.bucket, self.key, self.etag))
+
+    def __repr__(self):
+        return "S3Object(bucket={!r}, key={!r}, size={!r}, etag={!r})".format(
+            self.bucket, self.key, self.size, self.etag
+        )
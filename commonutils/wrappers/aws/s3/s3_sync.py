@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import time
+from functools import partial
+
+from commonutils.constants import DEFAULTS, ErrorMessages
+
+from .etag_verifier import ETagVerifier
+from .streams import iter_chunks, run_blocking
+
+logger = logging.getLogger()
+
+S3_SCHEME = "s3://"
+HASH_CHUNK_SIZE_IN_BYTES = 1024 * 1024
+# bytes charged to the rate limiter at a time
+THROTTLE_CHUNK_SIZE_IN_BYTES = 1024 * 1024
+
+
+class S3Sync:
+    """
+    Syncs a local directory or an S3 prefix into another one, transferring only what changed.
+    Locations are local paths or s3://bucket/prefix urls:
+        s3_sync = S3Sync(s3_wrapper, max_concurrency=16, bytes_per_second=50 * 1024 * 1024)
+        await s3_sync.sync("/data/backup", "s3://backups/2024/")   # upload
+        await s3_sync.sync("s3://backups/2024/", "/data/restore")  # download
+        await s3_sync.sync("s3://backups/2024/", "s3://archive/2024/")  # server side copy
+    Objects are compared by size, then by ETag. The ETag of a local file is computed from its
+    content, with the part size of the S3 object when it was uploaded in parts.
+    """
+
+    def __init__(
+        self,
+        s3_wrapper,
+        max_concurrency: int = 8,
+        bytes_per_second: int = None,
+        delete: bool = False,
+        part_size: int = DEFAULTS["MULTIPART"]["PART_SIZE_IN_BYTES"],
+    ):
+        """
+        :param s3_wrapper: BaseS3Wrapper used for every S3 call
+        :param max_concurrency: max number of objects transferred at the same time
+        :param bytes_per_second: max average upload / download rate, server side copies are
+        not throttled as their content does not go through this host
+        :param delete: delete objects of the destination missing from the source
+        :param part_size: multipart part size of uploads
+        """
+        self.s3_wrapper = s3_wrapper
+        self.max_concurrency = max_concurrency
+        self.delete = delete
+        self.part_size = part_size
+        self.rate_limiter = RateLimiter(bytes_per_second) if bytes_per_second else None
+
+    async def sync(self, source: str, destination: str, dry_run: bool = False):
+        """
+        :param source: local directory or s3://bucket/prefix
+        :param destination: local directory or s3://bucket/prefix
+        :param dry_run: only compute what would be transferred and deleted
+        :return: {"Transferred": [path], "Skipped": [path], "Deleted": [path],
+        "Errors": [{"Path", "Error"}]}, paths being relative to source / destination
+        """
+        if not self._is_s3(source) and not self._is_s3(destination):
+            raise Exception(
+                ErrorMessages.AwsS3SyncLocalToLocal.value.format(
+                    source=source, destination=destination
+                )
+            )
+        # _is_same and _transfer call the client directly
+        await self.s3_wrapper._s3_client()
+        source_files, destination_files = await asyncio.gather(
+            self._list(source), self._list(destination)
+        )
+        result = {"Transferred": [], "Skipped": [], "Deleted": [], "Errors": []}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _sync_file(path, source_file):
+            async with semaphore:
+                try:
+                    if await self._is_same(
+                        source,
+                        destination,
+                        path,
+                        source_file,
+                        destination_files.get(path),
+                    ):
+                        result["Skipped"].append(path)
+                        return
+                    if not dry_run:
+                        await self._transfer(source, destination, path, source_file)
+                    result["Transferred"].append(path)
+                except Exception as e:
+                    logger.info("Exception while syncing {}: {}".format(path, str(e)))
+                    result["Errors"].append({"Path": path, "Error": str(e)})
+
+        await asyncio.gather(
+            *[_sync_file(path, file) for path, file in source_files.items()]
+        )
+
+        if self.delete:
+            extra_paths = sorted(set(destination_files) - set(source_files))
+            if not dry_run:
+                errors = await self._delete(destination, extra_paths)
+                result["Errors"].extend(errors)
+                failed = {error["Path"] for error in errors}
+                extra_paths = [path for path in extra_paths if path not in failed]
+            result["Deleted"] = extra_paths
+        return result
+
+    async def _list(self, location):
+        """
+        :return: {relative path: S3Object} for S3 locations, {relative path: size} for local ones
+        """
+        if self._is_s3(location):
+            bucket, prefix = self._parse_s3(location)
+            return {
+                s3_object.key[len(prefix) :]: s3_object
+                async for s3_object in self.s3_wrapper.list_files(
+                    prefix, bucket=bucket, fan_out=True
+                )
+                if not s3_object.key.endswith("/")
+            }
+        return await run_blocking(self._list_local, location)
+
+    @staticmethod
+    def _list_local(directory):
+        files = {}
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                path = os.path.join(root, file_name)
+                relative_path = os.path.relpath(path, directory).replace(os.sep, "/")
+                files[relative_path] = os.path.getsize(path)
+        return files
+
+    async def _is_same(self, source, destination, path, source_file, destination_file):
+        if destination_file is None:
+            return False
+        if self._get_size(source_file) != self._get_size(destination_file):
+            return False
+        if self._is_s3(source) and self._is_s3(destination):
+            return source_file.etag == destination_file.etag
+
+        # one side is local, hash it the way S3 computed the ETag of the other side
+        if self._is_s3(source):
+            s3_file, local_path = source_file, os.path.join(destination, path)
+        else:
+            s3_file, local_path = destination_file, os.path.join(source, path)
+        if not s3_file.etag:
+            return False
+        part_size = None
+        if "-" in s3_file.etag:
+            first_part = await self.s3_wrapper.client.head_object(
+                Bucket=s3_file.bucket, Key=s3_file.key, PartNumber=1
+            )
+            part_size = first_part["ContentLength"]
+        return await run_blocking(
+            self._etag_matches, local_path, s3_file.etag, part_size
+        )
+
+    @staticmethod
+    def _etag_matches(local_path, etag, part_size):
+        verifier = ETagVerifier(etag, part_size)
+        with open(local_path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE_IN_BYTES), b""):
+                verifier.update(chunk)
+        return verifier.verify()
+
+    async def _transfer(self, source, destination, path, source_file):
+        if self._is_s3(destination):
+            bucket, prefix = self._parse_s3(destination)
+            key = prefix + path
+            if self._is_s3(source):
+                await self.s3_wrapper.copy_file(
+                    source_file.key,
+                    key,
+                    source_bucket=source_file.bucket,
+                    bucket=bucket,
+                )
+                return
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            object_args = {"Bucket": bucket, "Key": key, "ContentType": content_type}
+            acl = self.s3_wrapper.config.get("ACL", DEFAULTS["ACL"])
+            if acl != "no-acl":
+                object_args["ACL"] = acl
+            chunks = self._read(os.path.join(source, path))
+            try:
+                await self.s3_wrapper.stream_to_object(
+                    object_args,
+                    chunks,
+                    self.part_size,
+                    DEFAULTS["MULTIPART"]["MAX_CONCURRENCY"],
+                )
+            finally:
+                await chunks.aclose()
+            return
+
+        local_path = os.path.join(destination, path)
+        await run_blocking(
+            partial(os.makedirs, os.path.dirname(local_path), exist_ok=True)
+        )
+        await self.s3_wrapper.download(
+            source_file.key,
+            local_path,
+            bucket=source_file.bucket,
+            throttle=self.rate_limiter.acquire if self.rate_limiter else None,
+        )
+
+    async def _read(self, local_path):
+        # charged chunk by chunk as the upload reads them, not the whole file up front
+        async for chunk in iter_chunks(local_path, THROTTLE_CHUNK_SIZE_IN_BYTES):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(len(chunk))
+            yield chunk
+
+    async def _delete(self, location, paths):
+        """
+        :return: errors, [{"Path", "Error"}]
+        """
+        if not paths:
+            return []
+        if self._is_s3(location):
+            bucket, prefix = self._parse_s3(location)
+            response = await self.s3_wrapper.delete_files(
+                keys=[prefix + path for path in paths],
+                bucket=bucket,
+                max_concurrency=self.max_concurrency,
+            )
+            return [
+                {"Path": error["Key"][len(prefix) :], "Error": error["Message"]}
+                for error in response["Errors"]
+            ]
+
+        errors = []
+        for path in paths:
+            try:
+                await run_blocking(os.remove, os.path.join(location, path))
+            except OSError as e:
+                errors.append({"Path": path, "Error": str(e)})
+        return errors
+
+    @staticmethod
+    def _get_size(file):
+        return file if isinstance(file, int) else file.size
+
+    @staticmethod
+    def _is_s3(location):
+        return location.startswith(S3_SCHEME)
+
+    @staticmethod
+    def _parse_s3(location):
+        bucket, _, prefix = location[len(S3_SCHEME) :].partition("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        return bucket, prefix
+
+
+class RateLimiter:
+    """
+    Token bucket limiting an average rate (bytes per second). A single acquire can exceed the
+    rate, later acquires then wait until the debt is paid back.
+    """
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._tokens = rate
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: int):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import zlib
+
+from commonutils.offload_executor import OffloadExecutor
+
+# S3 rejects multipart parts smaller than this, except the last one
+MIN_PART_SIZE_IN_BYTES = 5 * 1024 * 1024
+
+
+async def iter_chunks(source, chunk_size: int):
+    """
+    Read source in chunks without loading it whole.
+    :param source: bytes, file path (str / os.PathLike), file-like object with a sync or async
+    read() method, or an async iterator of bytes
+    :param chunk_size: max bytes per chunk
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset : offset + chunk_size])
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        file_object = await run_blocking(open, source, "rb")
+        try:
+            async for chunk in iter_chunks(file_object, chunk_size):
+                yield chunk
+        finally:
+            await run_blocking(file_object.close)
+        return
+
+    if hasattr(source, "__aiter__"):
+        async for chunk in source:
+            yield chunk
+        return
+
+    read = source.read
+    while True:
+        if asyncio.iscoroutinefunction(read):
+            chunk = await read(chunk_size)
+        else:
+            chunk = await run_blocking(read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def iter_parts(source, part_size: int):
+    """
+    Re-chunk source into parts of exactly part_size bytes, the last one may be smaller.
+    """
+    buffer = bytearray()
+    async for chunk in iter_chunks(source, part_size):
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def run_blocking(func, *args):
+    return await OffloadExecutor.run(func, *args)
+
+
+async def iter_lines(chunks):
+    """
+    Split an async iterator of bytes into lines (without line endings), lines may span chunks.
+    """
+    # pieces of the line still missing its end, joined once the end arrives
+    pending = []
+    async for chunk in chunks:
+        lines = chunk.split(b"\n")
+        if len(lines) == 1:
+            pending.append(chunk)
+            continue
+        lines[0] = b"".join(pending) + lines[0]
+        pending = [lines.pop()]
+        for line in lines:
+            yield line.rstrip(b"\r")
+    line = b"".join(pending)
+    if line:
+        yield line.rstrip(b"\r")
+
+
+async def iter_decompressed(chunks, compression: str):
+    """
+    :param compression: "NONE" or "GZIP"
+    """
+    if compression == "NONE":
+        async for chunk in chunks:
+            yield chunk
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
@@ -1,3 +1,5 @@
+from ..aws_client import AWSClient
+from ..client_registry import AWSClientRegistry
 from .sns_client import SNSClient
 
 
@@ -19,7 +21,10 @@ class BaseSNSWrapper:
         signature_version = self.config.get("signature_version") or None
         concurrency_limit = self._app_config.get("CONCURRENCY_LIMIT") or 0
         concurrency_limit_host = self._app_config.get("CONCURRENCY_LIMIT_HOST") or 0
-        client = await SNSClient.create_sns_client(
+        if self.client is not None:
+            await AWSClientRegistry.release(self.client)
+        self.client = await AWSClientRegistry.acquire(
+            SNSClient.aws_service_name,
             region,
             aws_secret_access_key=aws_secret_access_key,
             aws_access_key_id=aws_access_key_id,
@@ -30,10 +35,15 @@ class BaseSNSWrapper:
             connect_timeout=connect_timeout,
             read_timeout=read_timeout,
             signature_version=signature_version,
+            **AWSClient.get_connection_config(self.config)
         )
+        return self.client
 
-        self.client = await client.__aenter__()
-        return client
+    async def close(self):
+        if self.client is not None:
+            # shared client, closed by the registry once no wrapper uses it
+            await AWSClientRegistry.release(self.client)
+            self.client = None
 
     async def publish_sms(self, message: str, phone_number: str, message_attributes: dict=None):
         if not self.client:
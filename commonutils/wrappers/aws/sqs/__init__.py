@@ -1,4 +1,13 @@
-__all__ = ["BaseSQSWrapper", "SQSClient"]
+__all__ = [
+    "BaseSQSWrapper",
+    "SQSClient",
+    "BufferedSQSProducer",
+    "PayloadCodec",
+    "LargePayloadStore",
+]
 
 from .base_sqs_wrapper import BaseSQSWrapper
+from .buffered_producer import BufferedSQSProducer
+from .large_payload_store import LargePayloadStore
+from .payload_codec import PayloadCodec
 from .sqs_client import SQSClient
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from ....constants import Constant
+
+logger = logging.getLogger()
+
+
+class AckBatcher:
+    """
+    Accumulates receipt handles of processed SQS messages and deletes them with
+    DeleteMessageBatch when batch_size handles are pending or flush_interval seconds
+    have passed since the first pending handle, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        sqs_wrapper,
+        batch_size: int = Constant.SQS_MAX_BATCH_ENTRIES,
+        flush_interval: float = 1,
+        max_retries: int = 3,
+    ):
+        """
+        :param sqs_wrapper: BaseSQSWrapper whose queue the messages were received from
+        :param batch_size: handles per DeleteMessageBatch call, capped at 10
+        :param flush_interval: max seconds a handle waits before being deleted
+        :param max_retries: attempts per handle for retryable (non sender fault) failures
+        """
+        self._sqs_wrapper = sqs_wrapper
+        self.batch_size = min(batch_size, Constant.SQS_MAX_BATCH_ENTRIES)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._pending = []
+        self._timer = None
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    async def add(self, receipt_handle: str, on_deleted=None):
+        """
+        :param receipt_handle: receipt handle of the processed message
+        :param on_deleted: optional callable, called once the message is deleted
+        """
+        self._pending.append((receipt_handle, 0, on_deleted))
+        if len(self._pending) >= self.batch_size:
+            await self.flush(force=False)
+        self._schedule_flush()
+
+    async def flush(self, force: bool = True):
+        """
+        Delete pending handles.
+        :param force: when False only full batches are sent, the remainder waits for the timer
+        """
+        while self._pending and (force or len(self._pending) >= self.batch_size):
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            await self._delete_batch(batch)
+            if force and all(attempts > 0 for _, attempts, _ in self._pending):
+                # only retried handles are left, give SQS a flush_interval before trying again
+                break
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            await self.flush()
+
+    def _schedule_flush(self):
+        if self._pending and self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.exception("Exception while deleting SQS messages {}".format(str(e)))
+        self._schedule_flush()
+
+    async def _delete_batch(self, batch):
+        try:
+            response = await self._sqs_wrapper.purge_batch(
+                [receipt_handle for receipt_handle, _, _ in batch]
+            )
+        except Exception as e:
+            logger.info("Exception while deleting SQS messages {}".format(str(e)))
+            self._retry(batch)
+            return
+
+        retryable = []
+        for successful in response.get("Successful", []):
+            on_deleted = batch[int(successful["Id"])][2]
+            if on_deleted is not None:
+                on_deleted()
+        for failed in response.get("Failed", []):
+            entry = batch[int(failed["Id"])]
+            if failed.get("SenderFault"):
+                # receipt handle is invalid or expired, the message will be redelivered
+                logger.error(
+                    "Could not delete SQS message, code: {}, message: {}".format(
+                        failed.get("Code"), failed.get("Message")
+                    )
+                )
+            else:
+                retryable.append(entry)
+        self._retry(retryable)
+
+    def _retry(self, batch):
+        for receipt_handle, attempts, on_deleted in batch:
+            if attempts + 1 < self.max_retries:
+                self._pending.append((receipt_handle, attempts + 1, on_deleted))
+            else:
+                logger.error(
+                    "Giving up deleting SQS message after {} attempts".format(
+                        attempts + 1
+                    )
+                )
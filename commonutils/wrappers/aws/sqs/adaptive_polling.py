@@ -0,0 +1,63 @@
+import random
+
+from ....constants import Constant
+
+
+class AdaptivePolling:
+    """
+    Tracks receive_message parameters for one receive loop.
+    With adaptive=True, MaxNumberOfMessages grows towards max_limit while batches come
+    back full and WaitTimeSeconds grows towards 20 seconds while they come back empty.
+    Failed receives always back off exponentially with full jitter.
+    """
+
+    MAX_WAIT_TIME_IN_SECONDS = 20
+
+    def __init__(
+        self,
+        max_no_of_messages: int = 1,
+        wait_time_in_seconds: int = 5,
+        adaptive: bool = False,
+        max_limit: int = Constant.SQS_MAX_BATCH_ENTRIES,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30,
+    ):
+        """
+        :param max_no_of_messages: initial MaxNumberOfMessages
+        :param wait_time_in_seconds: initial WaitTimeSeconds, used again as soon as messages arrive
+        :param adaptive: adapt MaxNumberOfMessages and WaitTimeSeconds to the traffic
+        :param max_limit: upper bound for MaxNumberOfMessages
+        :param base_backoff: seconds to back off after the first failed receive
+        :param max_backoff: upper bound of the backoff in seconds
+        """
+        self.max_limit = max(1, min(max_limit, Constant.SQS_MAX_BATCH_ENTRIES))
+        self.max_no_of_messages = max(1, min(max_no_of_messages, self.max_limit))
+        self.wait_time_in_seconds = min(
+            wait_time_in_seconds, self.MAX_WAIT_TIME_IN_SECONDS
+        )
+        self._initial_wait_time_in_seconds = self.wait_time_in_seconds
+        self.adaptive = adaptive
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._errors = 0
+
+    def on_received(self, requested: int, received: int):
+        self._errors = 0
+        if not self.adaptive:
+            return
+        if received == 0:
+            self.wait_time_in_seconds = min(
+                max(self.wait_time_in_seconds * 2, 1), self.MAX_WAIT_TIME_IN_SECONDS
+            )
+            return
+        self.wait_time_in_seconds = self._initial_wait_time_in_seconds
+        if received >= requested:
+            self.max_no_of_messages = min(self.max_no_of_messages * 2, self.max_limit)
+
+    def on_error(self):
+        """
+        :return: seconds to sleep before the next receive
+        """
+        self._errors += 1
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** (self._errors - 1)))
+        return random.uniform(0, backoff)
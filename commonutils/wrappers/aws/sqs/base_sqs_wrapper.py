@@ -1,22 +1,60 @@
+import asyncio
 import logging
+from functools import partial
 
 import botocore.exceptions
 
 from commonutils.handlers import SQSHandler
 
-from ....constants import (AwsErrorType, DelayQueueTime, ErrorMessages,
-                           SQSQueueType)
+from ....constants import (AwsErrorType, Constant, DelayQueueTime,
+                           ErrorMessages, SQSQueueType)
+from ..aws_client import AWSClient
+from ..client_registry import AWSClientRegistry
+from ..resolution_cache import ResolutionCache
+from .ack_batcher import AckBatcher
+from .adaptive_polling import AdaptivePolling
+from .handler_pool import HandlerPool
+from .large_payload_store import LargePayloadStore
+from .payload_codec import PayloadCodec
 from .sqs_client import SQSClient
+from .visibility_heartbeat import VisibilityHeartbeat
 
 logger = logging.getLogger()
 
 
 class BaseSQSWrapper:
-    def __init__(self, config: dict, config_key: str = "SQS"):
+    PUBLISH_RETRY_BACKOFF = 0.1
+    # throttling and server errors, other client errors fail the same way when retried
+    PUBLISH_RETRYABLE_ERRORS = {
+        "RequestThrottled",
+        "ThrottlingException",
+        "Throttling",
+        "ServiceUnavailable",
+        "InternalError",
+        "InternalFailure",
+    }
+
+    def __init__(
+        self,
+        config: dict,
+        config_key: str = "SQS",
+        codec: PayloadCodec = None,
+        large_payload_store: LargePayloadStore = None,
+    ):
+        """
+        :param codec: serialises published payloads, built from SQS_CODEC / SQS_COMPRESSION
+        config when not passed. Messages are published as is when neither is set.
+        :param large_payload_store: offloads bodies above 256 KB to S3 on publish and fetches
+        them back before handle_event. Without it such payloads fail to publish.
+        """
         self.config = config.get(config_key, None)
         self._app_config = config
         self.client = None
         self.queue_url = None
+        self.codec = codec or PayloadCodec.from_config(self.config)
+        self.large_payload_store = large_payload_store
+        self._ack_batcher = None
+        self._visibility_heartbeat = None
 
     async def get_sqs_client(self, queue_name=""):
         aws_access_key_id = self.config.get("AWS_ACCESS_KEY_ID")
@@ -29,7 +67,10 @@ class BaseSQSWrapper:
         signature_version = self.config.get("signature_version") or None
         concurrency_limit = self._app_config.get("CONCURRENCY_LIMIT") or 0
         concurrency_limit_host = self._app_config.get("CONCURRENCY_LIMIT_HOST") or 0
-        client = await SQSClient.create_sqs_client(
+        if self.client is not None:
+            await AWSClientRegistry.release(self.client)
+        self.client = await AWSClientRegistry.acquire(
+            SQSClient.aws_service_name,
             region,
             aws_secret_access_key=aws_secret_access_key,
             aws_access_key_id=aws_access_key_id,
@@ -40,15 +81,21 @@ class BaseSQSWrapper:
             connect_timeout=connect_timeout,
             read_timeout=read_timeout,
             signature_version=signature_version,
+            **AWSClient.get_connection_config(self.config)
         )
-
-        self.client = await client.__aenter__()
-        if client:
-            queue_url = await self.get_queue_url(queue_name)
-            self.queue_url = queue_url
-        return client
+        self.queue_url = await self.get_queue_url(queue_name)
+        return self.client
 
     async def get_queue_url(self, queue_name):
+        """
+        :return: url of queue_name, cached in ResolutionCache
+        """
+        return await ResolutionCache.resolve(
+            self._get_resolution_key("sqs_queue_url", queue_name),
+            partial(self._get_queue_url, queue_name),
+        )
+
+    async def _get_queue_url(self, queue_name):
         try:
             response = await self.client.get_queue_url(QueueName=queue_name)
         except botocore.exceptions.ClientError as err:
@@ -68,6 +115,24 @@ class BaseSQSWrapper:
         return queue_url
 
     async def get_queue_arn(self, queue_name):
+        """
+        :return: arn of queue_name, cached in ResolutionCache
+        """
+        return await ResolutionCache.resolve(
+            self._get_resolution_key("sqs_queue_arn", queue_name),
+            partial(self._get_queue_arn, queue_name),
+        )
+
+    def _get_resolution_key(self, kind, queue_name):
+        # credentials of the config, None for the default credential chain
+        return (
+            kind,
+            self.client.meta.endpoint_url,
+            self.config.get("AWS_ACCESS_KEY_ID"),
+            queue_name,
+        )
+
+    async def _get_queue_arn(self, queue_name):
         queue_url = await self.get_queue_url(queue_name)
         response = await self.get_queue_attributes(
             queue_url=queue_url, attribute_names=["QueueArn"]
@@ -104,39 +169,223 @@ class BaseSQSWrapper:
         """
         Subscribe and process SQS messages
         :param event_handler: Pass your implementation od SQSHandler having a method handle_event(body)
+        :param max_concurrency: max number of handle_event calls in flight, messages are processed
+        one at a time when not passed
+        :param receivers: number of receive loops polling the queue at the same time
+        :param batch_ack: delete processed messages with DeleteMessageBatch instead of one
+        delete_message call per message, pending deletes are flushed on close()
+        :param ack_flush_interval: max seconds a processed message waits to be deleted in batch_ack mode
+        :param extend_visibility: keep extending the visibility timeout of messages while
+        handle_event is running, visibility_timeout defaults to 30 seconds in this mode
+        :param adaptive_polling: grow max_no_of_messages while batches come back full and
+        wait_time_in_seconds while they come back empty. Failed receives always back off
+        exponentially with jitter.
         """
+        max_concurrency = kwargs.pop("max_concurrency", None) or 1
+        receivers = kwargs.pop("receivers", None) or 1
+        adaptive = kwargs.pop("adaptive_polling", False)
+        if kwargs.pop("batch_ack", False):
+            self._ack_batcher = AckBatcher(
+                self, flush_interval=kwargs.pop("ack_flush_interval", None) or 1
+            )
+        if kwargs.pop("extend_visibility", False):
+            kwargs["visibility_timeout"] = kwargs.get("visibility_timeout") or 30
+            self._visibility_heartbeat = VisibilityHeartbeat(
+                self, visibility_timeout=kwargs["visibility_timeout"]
+            )
+            self._visibility_heartbeat.start()
 
+        try:
+            if max_concurrency > 1 or receivers > 1:
+                await self._subscribe_all_concurrently(
+                    event_handler, max_concurrency, receivers, adaptive, **kwargs
+                )
+            else:
+                await self._subscribe_all_sequentially(
+                    event_handler, adaptive, **kwargs
+                )
+        finally:
+            if self._visibility_heartbeat is not None:
+                await self._visibility_heartbeat.stop()
+
+    async def _subscribe_all_sequentially(
+        self, event_handler: SQSHandler, adaptive: bool, **kwargs
+    ):
+        polling = self._get_adaptive_polling(adaptive, **kwargs)
         while True:
             try:
-                response = await self.subscribe(**kwargs)
-                messages = response.get("Messages") if response else None
-                if messages:
-                    for message in messages:
-                        try:
-                            body = message["Body"]
-                            receipt_handle = message["ReceiptHandle"]
-                            await event_handler.handle_event(body)
-                            logger.debug("Successfully processed SQS message")
-                            await self.purge(receipt_handle=receipt_handle)
-                        except Exception as e:
-                            logger.exception(
-                                "Exception while processing SQS message {}".format(
-                                    str(e)
-                                )
-                            )
+                response = await self.subscribe(
+                    **dict(
+                        kwargs,
+                        max_no_of_messages=polling.max_no_of_messages,
+                        wait_time_in_seconds=polling.wait_time_in_seconds,
+                    )
+                )
+                messages = (response.get("Messages") if response else None) or []
+                self._track(messages)
+                polling.on_received(polling.max_no_of_messages, len(messages))
             except Exception as e:
                 logger.exception(
                     "Exception while fetching SQS messages {}".format(str(e))
                 )
+                await asyncio.sleep(polling.on_error())
+                continue
+            for message in messages:
+                await self._process_message(event_handler, message)
+
+    async def _subscribe_all_concurrently(
+        self, event_handler: SQSHandler, max_concurrency, receivers, adaptive, **kwargs
+    ):
+        pool = HandlerPool(max_concurrency)
+        # each receive loop asks for at most its fair share of the pool, so one long-poll
+        # cannot reserve every slot while the other loops are waiting
+        max_limit = max(1, max_concurrency // receivers)
+        receive_loops = [
+            self._receive_loop(
+                event_handler,
+                pool,
+                self._get_adaptive_polling(adaptive, max_limit=max_limit, **kwargs),
+                **kwargs
+            )
+            for _ in range(receivers)
+        ]
+        try:
+            await asyncio.gather(*receive_loops)
+        finally:
+            await pool.join()
+
+    async def _receive_loop(
+        self,
+        event_handler: SQSHandler,
+        pool: HandlerPool,
+        polling: AdaptivePolling,
+        **kwargs
+    ):
+        while True:
+            # blocks while the pool is full, so we never hold messages we cannot process
+            slots = await pool.reserve(polling.max_no_of_messages)
+            messages = []
+            try:
+                response = await self.subscribe(
+                    **dict(
+                        kwargs,
+                        max_no_of_messages=slots,
+                        wait_time_in_seconds=polling.wait_time_in_seconds,
+                    )
+                )
+                messages = (response.get("Messages") if response else None) or []
+                self._track(messages)
+                polling.on_received(slots, len(messages))
+                for message in messages:
+                    pool.submit(self._process_message(event_handler, message))
+            except Exception as e:
+                logger.exception(
+                    "Exception while fetching SQS messages {}".format(str(e))
+                )
+                await pool.release(slots - len(messages))
+                await asyncio.sleep(polling.on_error())
+                continue
+            await pool.release(slots - len(messages))
+
+    @staticmethod
+    def _get_adaptive_polling(
+        adaptive: bool, max_limit: int = Constant.SQS_MAX_BATCH_ENTRIES, **kwargs
+    ):
+        return AdaptivePolling(
+            max_no_of_messages=kwargs.get("max_no_of_messages") or 1,
+            wait_time_in_seconds=kwargs.get("wait_time_in_seconds") or 5,
+            adaptive=adaptive,
+            max_limit=max_limit,
+        )
+
+    async def _process_message(self, event_handler: SQSHandler, message: dict):
+        try:
+            if self.large_payload_store is not None:
+                body = PayloadCodec.decode_message(
+                    await self.large_payload_store.fetch(message)
+                )
+            else:
+                body = PayloadCodec.decode_message(message)
+            await event_handler.handle_event(body)
+            logger.debug("Successfully processed SQS message")
+            await self._ack(message)
+        except Exception as e:
+            logger.exception(
+                "Exception while processing SQS message {}".format(str(e))
+            )
+        finally:
+            if self._visibility_heartbeat is not None:
+                self._visibility_heartbeat.untrack(message.get("ReceiptHandle"))
+
+    def _track(self, messages: list):
+        # from receipt, messages waiting behind a running handler are extended too
+        if self._visibility_heartbeat is not None:
+            for message in messages:
+                self._visibility_heartbeat.track(message.get("ReceiptHandle"))
+
+    async def _ack(self, message: dict):
+        receipt_handle = message["ReceiptHandle"]
+        on_deleted = None
+        if self.large_payload_store is not None:
+            on_deleted = partial(self.large_payload_store.on_ack, message)
+        if self._ack_batcher is not None:
+            await self._ack_batcher.add(receipt_handle, on_deleted=on_deleted)
+        else:
+            await self.purge(receipt_handle=receipt_handle)
+            if on_deleted is not None:
+                on_deleted()
 
     async def close(self):
-        await self.client.close()
+        if self._visibility_heartbeat is not None:
+            await self._visibility_heartbeat.stop()
+        if self._ack_batcher is not None:
+            await self._ack_batcher.close()
+        if self.large_payload_store is not None:
+            await self.large_payload_store.close()
+        # shared client, closed by the registry once no wrapper uses it
+        await AWSClientRegistry.release(self.client)
+        self.client = None
 
     async def purge(self, receipt_handle):
         await self.client.delete_message(
             QueueUrl=self.queue_url, ReceiptHandle=receipt_handle
         )
 
+    async def purge_batch(self, receipt_handles: list):
+        """
+        Delete up to 10 messages in a single DeleteMessageBatch call
+        :param receipt_handles: receipt handles of the messages, entry ids are their positions in this list
+        :return: DeleteMessageBatch response with Successful and Failed entries
+        """
+        entries = [
+            {"Id": str(index), "ReceiptHandle": receipt_handle}
+            for index, receipt_handle in enumerate(receipt_handles)
+        ]
+        return await self.client.delete_message_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+
+    async def change_visibility_batch(
+        self, receipt_handles: list, visibility_timeout: int
+    ):
+        """
+        Change the visibility timeout of up to 10 messages in a single call
+        :param receipt_handles: receipt handles of the messages, entry ids are their positions in this list
+        :param visibility_timeout: new visibility timeout in seconds, counted from now
+        :return: ChangeMessageVisibilityBatch response with Successful and Failed entries
+        """
+        entries = [
+            {
+                "Id": str(index),
+                "ReceiptHandle": receipt_handle,
+                "VisibilityTimeout": visibility_timeout,
+            }
+            for index, receipt_handle in enumerate(receipt_handles)
+        ]
+        return await self.client.change_message_visibility_batch(
+            QueueUrl=self.queue_url, Entries=entries
+        )
+
     async def publish_to_sqs(
         self,
         messages: list = None,
@@ -151,6 +400,7 @@ class BaseSQSWrapper:
         :param attributes: message attributes related to payload
         :param batch: tells if request is a batch request or not.
         :return: True or False
+        When a codec is set payload and MessageBody of messages can be any object it can serialise.
         """
         messages, attributes, payload = messages or [], attributes or {}, payload or ""
         message_group_id, message_deduplication_id = kwargs.get(
@@ -158,42 +408,58 @@ class BaseSQSWrapper:
         ), kwargs.get("message_deduplication_id")
         delay_seconds = kwargs.get("delay_seconds", DelayQueueTime.MINIMUM_TIME.value)
         queue_type = self.get_queue_type()
+        # before offloading, so an invalid call leaves no payload in S3
         self._validate_publish_to_sqs(
             queue_type, message_group_id, message_deduplication_id
         )
+        if not batch:
+            payload, attributes = self._encode_payload(payload, attributes)
+            if self.large_payload_store is not None:
+                offloaded = await self._offload_entry(
+                    {"MessageBody": payload, "MessageAttributes": attributes}
+                )
+                payload = offloaded["MessageBody"]
+                attributes = offloaded["MessageAttributes"]
         _send, _retry_count, sent_response_data = False, 0, {}
         _max_retries = kwargs.get("max_retries") or 3
-        while _send is not True and _retry_count < _max_retries:
+        if batch:
+            # chunked, parallel and retries only the entries SQS reports as failed
+            sent_response_data = await self.publish_batch_to_sqs(
+                messages, max_retries=_max_retries
+            )
+            for failed_entry in sent_response_data["Failed"]:
+                if failed_entry.get("Code") in (
+                    AwsErrorType.SQSRequestSizeExceeded.value,
+                    AwsErrorType.SQSMessageTooLong.value,
+                ):
+                    raise Exception(ErrorMessages.AwsSQSPayloadSize.value)
+            _send = not sent_response_data["Failed"]
+        while not batch and _send is not True and _retry_count < _max_retries:
             try:
-                if not batch:
-                    send_message_data = {
-                        "QueueUrl": self.queue_url,
-                        "MessageBody": payload,
-                        "MessageAttributes": attributes,
-                    }
+                send_message_data = {
+                    "QueueUrl": self.queue_url,
+                    "MessageBody": payload,
+                    "MessageAttributes": attributes,
+                }
 
-                    if queue_type == SQSQueueType.STANDARD_QUEUE_FIFO.value:
-                        send_message_data["MessageGroupId"] = message_group_id
-                        if message_deduplication_id:
-                            send_message_data[
-                                "MessageDeduplicationId"
-                            ] = message_deduplication_id
-                    elif (
-                        delay_seconds
-                        and isinstance(delay_seconds, int)
-                        and DelayQueueTime.MINIMUM_TIME.value
-                        < delay_seconds
-                        < DelayQueueTime.MAXIMUM_TIME.value
-                    ):
-                        send_message_data.update({"DelaySeconds": delay_seconds})
-
-                    sent_response_data = await self.client.send_message(
-                        **send_message_data
-                    )
-                else:
-                    sent_response_data = await self.client.send_message_batch(
-                        QueueUrl=self.queue_url, Entries=messages
-                    )
+                if queue_type == SQSQueueType.STANDARD_QUEUE_FIFO.value:
+                    send_message_data["MessageGroupId"] = message_group_id
+                    if message_deduplication_id:
+                        send_message_data[
+                            "MessageDeduplicationId"
+                        ] = message_deduplication_id
+                elif (
+                    delay_seconds
+                    and isinstance(delay_seconds, int)
+                    and DelayQueueTime.MINIMUM_TIME.value
+                    < delay_seconds
+                    < DelayQueueTime.MAXIMUM_TIME.value
+                ):
+                    send_message_data.update({"DelaySeconds": delay_seconds})
+
+                sent_response_data = await self.client.send_message(
+                    **send_message_data
+                )
                 _send = True
             except botocore.exceptions.ClientError as err:
                 if (
@@ -215,10 +481,171 @@ class BaseSQSWrapper:
                 )
             finally:
                 _retry_count += 1
-        if kwargs.get("return_response") and _send:
+        if kwargs.get("return_response") and (_send or batch):
+            # batch responses list the Failed entries, returned even when some failed
             return sent_response_data
         return _send
 
+    async def publish_batch_to_sqs(
+        self, messages: list, max_parallel_batches: int = 4, max_retries: int = 3
+    ):
+        """
+        Publish any number of messages, split into SendMessageBatch calls that respect
+        the 10 entries and 256 KB limits and sent concurrently. Batches to a FIFO queue are
+        sent one after the other, so messages of a group keep their order.
+        :param messages: SendMessageBatch entries, Id is filled with the position in this list when missing
+        :param max_parallel_batches: max number of SendMessageBatch calls in flight, 1 for FIFO queues
+        :param max_retries: attempts per batch, only the entries listed in Failed are resent
+        :return: dict with Successful and Failed entries of all batches
+        """
+        entries, failed = [], []
+        for index, message in enumerate(messages or []):
+            entry = await self._offload_entry(self._encode_entry(message))
+            entry.setdefault("Id", str(index))
+            if self._get_entry_size(entry) > Constant.SQS_MAX_PAYLOAD_SIZE:
+                failed.append(
+                    {
+                        "Id": entry["Id"],
+                        "SenderFault": True,
+                        "Code": AwsErrorType.SQSMessageTooLong.value,
+                        "Message": ErrorMessages.AwsSQSPayloadSize.value,
+                    }
+                )
+            else:
+                entries.append(entry)
+
+        semaphore = asyncio.Semaphore(max_parallel_batches)
+        if self.get_queue_type() == SQSQueueType.STANDARD_QUEUE_FIFO.value:
+            responses = [
+                await self._send_batch(chunk, semaphore, max_retries)
+                for chunk in self._chunk_entries(entries)
+            ]
+        else:
+            responses = await asyncio.gather(
+                *[
+                    self._send_batch(chunk, semaphore, max_retries)
+                    for chunk in self._chunk_entries(entries)
+                ]
+            )
+        successful = []
+        for response in responses:
+            successful.extend(response["Successful"])
+            failed.extend(response["Failed"])
+        return {"Successful": successful, "Failed": failed}
+
+    async def _send_batch(self, entries: list, semaphore, max_retries: int):
+        successful, failed, attempt = [], [], 0
+        async with semaphore:
+            while entries:
+                try:
+                    response = await self.client.send_message_batch(
+                        QueueUrl=self.queue_url, Entries=entries
+                    )
+                except Exception as e:
+                    logger.info(
+                        ErrorMessages.AwsSQSPublishError.value.format(
+                            error=e, count=attempt
+                        )
+                    )
+                    error_code = type(e).__name__
+                    if isinstance(e, botocore.exceptions.ClientError):
+                        error_code = e.response.get("Error", {}).get("Code", error_code)
+                    response = {
+                        "Failed": [
+                            {
+                                "Id": entry["Id"],
+                                # not retried
+                                "SenderFault": not self._is_retryable_publish_error(e),
+                                "Code": error_code,
+                                "Message": str(e),
+                            }
+                            for entry in entries
+                        ]
+                    }
+                successful.extend(response.get("Successful", []))
+                attempt += 1
+
+                retry_ids = set()
+                for failed_entry in response.get("Failed", []):
+                    if failed_entry.get("SenderFault") or attempt >= max_retries:
+                        failed.append(failed_entry)
+                    else:
+                        retry_ids.add(failed_entry["Id"])
+                entries = [entry for entry in entries if entry["Id"] in retry_ids]
+                if entries:
+                    await asyncio.sleep(self.PUBLISH_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        return {"Successful": successful, "Failed": failed}
+
+    def _is_retryable_publish_error(self, error):
+        if isinstance(error, botocore.exceptions.ClientError):
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            return (
+                error.response.get("Error", {}).get("Code")
+                in self.PUBLISH_RETRYABLE_ERRORS
+                or (status is not None and status >= 500)
+            )
+        # connection errors and timeouts
+        return isinstance(
+            error,
+            (
+                botocore.exceptions.ConnectionError,
+                botocore.exceptions.HTTPClientError,
+                asyncio.TimeoutError,
+            ),
+        )
+
+    def _encode_payload(self, payload, attributes: dict):
+        if self.codec is None or PayloadCodec.ATTRIBUTE_NAME in attributes:
+            return payload, attributes
+        attributes = dict(attributes)
+        attributes[PayloadCodec.ATTRIBUTE_NAME] = self.codec.message_attribute()
+        return self.codec.encode(payload), attributes
+
+    async def _offload_entry(self, entry: dict):
+        if self.large_payload_store is None:
+            return entry
+        return await self.large_payload_store.offload(
+            entry, self._get_entry_size(entry)
+        )
+
+    def _encode_entry(self, message: dict):
+        entry = dict(message)
+        entry["MessageBody"], entry["MessageAttributes"] = self._encode_payload(
+            entry.get("MessageBody", ""), entry.get("MessageAttributes") or {}
+        )
+        return entry
+
+    @classmethod
+    def _chunk_entries(cls, entries: list):
+        chunk, chunk_size = [], 0
+        for entry in entries:
+            entry_size = cls._get_entry_size(entry)
+            if chunk and (
+                len(chunk) == Constant.SQS_MAX_BATCH_ENTRIES
+                or chunk_size + entry_size > Constant.SQS_MAX_PAYLOAD_SIZE
+            ):
+                yield chunk
+                chunk, chunk_size = [], 0
+            chunk.append(entry)
+            chunk_size += entry_size
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _get_entry_size(entry: dict):
+        """
+        Size of a message as SQS counts it: body plus name, type and value of every attribute
+        """
+        size = len(entry.get("MessageBody", "").encode(Constant.UTF8))
+        for name, attribute in (entry.get("MessageAttributes") or {}).items():
+            size += len(name.encode(Constant.UTF8))
+            size += len(attribute.get("DataType", "").encode(Constant.UTF8))
+            if "StringValue" in attribute:
+                size += len(attribute["StringValue"].encode(Constant.UTF8))
+            if "BinaryValue" in attribute:
+                size += len(attribute["BinaryValue"])
+        return size
+
     @staticmethod
     def _validate_publish_to_sqs(
         queue_type, message_group_id, message_deduplication_id
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+
+from ....constants import Constant, ErrorMessages, SQSQueueType
+from .base_sqs_wrapper import BaseSQSWrapper
+
+logger = logging.getLogger()
+
+
+class BufferedSQSProducer:
+    """
+    Buffers single messages in memory and publishes them with publish_batch_to_sqs once
+    10 messages are buffered or linger seconds have passed, whichever comes first (a flush
+    above 256 KB is split into several SendMessageBatch calls). Flushes to a FIFO queue are
+    published one after the other so the order of a message group is kept.
+    Usage:
+        producer = BufferedSQSProducer(base_sqs_wrapper)
+        future = await producer.send(payload)
+        message_id = await future  # optional, only if the caller needs the MessageId
+    Call close() on shutdown (e.g. in a before_server_stop listener) to flush buffered messages.
+    """
+
+    def __init__(
+        self,
+        sqs_wrapper: BaseSQSWrapper,
+        linger: float = 0.05,
+        max_buffered_messages: int = 1000,
+        max_parallel_batches: int = 4,
+        max_retries: int = 3,
+    ):
+        """
+        :param sqs_wrapper: BaseSQSWrapper with an initialised client
+        :param linger: max seconds a message waits in the buffer
+        :param max_buffered_messages: messages buffered or in flight, send() waits when this is reached
+        :param max_parallel_batches: max number of SendMessageBatch calls in flight
+        :param max_retries: attempts per message for retryable failures
+        """
+        self._sqs_wrapper = sqs_wrapper
+        self.linger = linger
+        self.max_parallel_batches = max_parallel_batches
+        self.max_retries = max_retries
+        self._capacity = asyncio.Semaphore(max_buffered_messages)
+        self._buffer = []
+        self._next_id = 0
+        self._timer = None
+        self._in_flight = set()
+        self._fifo_lock = asyncio.Lock()
+        self._closed = False
+
+    async def send(self, payload: str, attributes: dict = None, **kwargs):
+        """
+        Buffer a message for publishing
+        :param payload: message body
+        :param attributes: message attributes related to payload
+        :param message_group_id: required for fifo queues
+        :param message_deduplication_id: optional, fifo queues only
+        :param delay_seconds: optional, 0 to 900, standard queues only
+        :return: asyncio.Future resolving to the MessageId of this message
+        """
+        if self._closed:
+            raise Exception(
+                ErrorMessages.AwsSQSPublishError.value.format(
+                    error="producer is closed", count=0
+                )
+            )
+        entry = self._get_entry(payload, attributes, **kwargs)
+        await self._capacity.acquire()
+        future = asyncio.get_running_loop().create_future()
+        # failures of futures nobody awaits are not reported as never retrieved
+        future.add_done_callback(self._retrieve_exception)
+        self._buffer.append((entry, future))
+        if len(self._buffer) >= Constant.SQS_MAX_BATCH_ENTRIES:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.linger, self._dispatch
+            )
+        return future
+
+    async def flush(self):
+        """
+        Publish everything buffered and wait for all in-flight batches
+        """
+        self._dispatch()
+        if self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    async def close(self):
+        self._closed = True
+        await self.flush()
+
+    def _get_entry(self, payload, attributes, **kwargs):
+        message_group_id = kwargs.get("message_group_id")
+        message_deduplication_id = kwargs.get("message_deduplication_id")
+        delay_seconds = kwargs.get("delay_seconds")
+        entry = {"MessageBody": payload, "MessageAttributes": attributes or {}}
+        if self._is_fifo():
+            if not message_group_id:
+                raise Exception(
+                    ErrorMessages.PARAMETER_REQUIRED.value.format(
+                        param_key="message_group_id", queue_name="sqs fifo queue push"
+                    )
+                )
+            if delay_seconds is not None:
+                raise Exception(
+                    ErrorMessages.PARAMETERS_NOT_ALLOWED.value.format(
+                        param_key="delay_seconds", queue_name="sqs fifo queue push"
+                    )
+                )
+            entry["MessageGroupId"] = message_group_id
+            if message_deduplication_id:
+                entry["MessageDeduplicationId"] = message_deduplication_id
+            return entry
+
+        if message_group_id or message_deduplication_id:
+            raise Exception(
+                ErrorMessages.PARAMETERS_NOT_ALLOWED.value.format(
+                    param_key="message_group_id and message_deduplication_id",
+                    queue_name="sqs standard queue push",
+                )
+            )
+        if delay_seconds is not None:
+            if (
+                not isinstance(delay_seconds, int)
+                or not 0 <= delay_seconds <= Constant.SQS_MAX_DELAY_SECONDS
+            ):
+                raise Exception(
+                    ErrorMessages.AwsSQSInvalidDelaySeconds.value.format(
+                        max_delay=Constant.SQS_MAX_DELAY_SECONDS,
+                        delay_seconds=delay_seconds,
+                    )
+                )
+            entry["DelaySeconds"] = delay_seconds
+        return entry
+
+    def _is_fifo(self):
+        return (
+            self._sqs_wrapper.get_queue_type() == SQSQueueType.STANDARD_QUEUE_FIFO.value
+        )
+
+    @staticmethod
+    def _retrieve_exception(future):
+        if not future.cancelled():
+            future.exception()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        if self._is_fifo():
+            # tasks wait on the lock in dispatch order
+            task = asyncio.ensure_future(self._publish_in_order(batch))
+        else:
+            task = asyncio.ensure_future(self._publish(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _publish_in_order(self, batch):
+        async with self._fifo_lock:
+            await self._publish(batch, max_parallel_batches=1)
+
+    async def _publish(self, batch, max_parallel_batches=None):
+        futures = {}
+        entries = []
+        for entry, future in batch:
+            entry["Id"] = str(self._next_id)
+            self._next_id += 1
+            futures[entry["Id"]] = future
+            entries.append(entry)
+        try:
+            response = await self._sqs_wrapper.publish_batch_to_sqs(
+                entries,
+                max_parallel_batches=max_parallel_batches or self.max_parallel_batches,
+                max_retries=self.max_retries,
+            )
+            for successful in response["Successful"]:
+                future = futures.pop(successful["Id"])
+                if not future.done():
+                    future.set_result(successful.get("MessageId"))
+            for failed in response["Failed"]:
+                future = futures.pop(failed["Id"])
+                if not future.done():
+                    future.set_exception(
+                        Exception(
+                            ErrorMessages.AwsSQSPublishError.value.format(
+                                error=failed.get("Message") or failed.get("Code"),
+                                count=self.max_retries,
+                            )
+                        )
+                    )
+        except Exception as e:
+            logger.exception(
+                "Exception while publishing buffered SQS messages {}".format(str(e))
+            )
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            futures = {}
+        finally:
+            for future in futures.values():
+                # entries missing from the response, should not happen
+                if not future.done():
+                    future.set_exception(
+                        Exception(
+                            ErrorMessages.AwsSQSPublishError.value.format(
+                                error="no result returned", count=self.max_retries
+                            )
+                        )
+                    )
+            for _ in batch:
+                self._capacity.release()
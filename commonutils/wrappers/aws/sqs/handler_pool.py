@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+logger = logging.getLogger()
+
+
+class HandlerPool:
+    """
+    Bounded pool of in-flight SQS message handlers.
+    Receive loops reserve slots before polling SQS, so when every slot is busy
+    receiving pauses until a handler finishes (backpressure).
+    """
+
+    def __init__(self, size: int):
+        """
+        :param size: maximum number of handlers running at the same time
+        """
+        self.size = size
+        self._in_flight = 0
+        self._tasks = set()
+        self._condition = asyncio.Condition()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def reserve(self, max_slots: int):
+        """
+        Wait until at least one slot is free and reserve up to max_slots of them.
+        :param max_slots: number of slots wanted by the caller
+        :return: number of slots actually reserved (>= 1)
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.size)
+            slots = min(max_slots, self.size - self._in_flight)
+            self._in_flight += slots
+            return slots
+
+    async def release(self, slots: int = 1):
+        if slots <= 0:
+            return
+        async with self._condition:
+            self._in_flight -= slots
+            self._condition.notify_all()
+
+    def submit(self, coroutine):
+        """
+        Run coroutine in the pool, it must be backed by a slot reserved earlier.
+        The slot is released once the coroutine finishes.
+        """
+        task = asyncio.ensure_future(self._run(coroutine))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            logger.exception("Exception in SQS handler pool {}".format(str(e)))
+        finally:
+            await self.release()
+
+    async def join(self):
+        """
+        Wait for all in-flight handlers to finish.
+        """
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
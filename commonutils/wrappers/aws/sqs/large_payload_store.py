@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+
+import ujson
+
+from ....constants import Constant
+
+logger = logging.getLogger()
+
+# characters of the body encoded at a time while uploading
+ENCODE_CHUNK_SIZE = 1024 * 1024
+
+
+class LargePayloadStore:
+    """
+    Offloads SQS message bodies above threshold bytes to S3 and publishes a small pointer
+    instead, the pointer format is the one of the AWS extended client libraries so messages
+    can be shared with Java/Python producers and consumers using them.
+    Consumers fetch the body back before handle_event (through a bounded in-memory cache) and
+    the S3 object is deleted in the background once the message is acked.
+    """
+
+    POINTER_CLASS = "software.amazon.payloadoffloading.PayloadS3Pointer"
+    SIZE_ATTRIBUTE = "ExtendedPayloadSize"
+    LEGACY_SIZE_ATTRIBUTE = "SQSLargePayloadSize"
+
+    def __init__(
+        self,
+        s3_wrapper,
+        bucket: str = None,
+        prefix: str = "sqs-payloads",
+        threshold: int = Constant.SQS_MAX_PAYLOAD_SIZE,
+        cache_size_in_bytes: int = 32 * 1024 * 1024,
+        delete_after_ack: bool = True,
+    ):
+        """
+        :param s3_wrapper: BaseS3Wrapper used to store the payloads
+        :param bucket: defaults to S3_BUCKET of the s3 wrapper config
+        :param prefix: key prefix of stored payloads
+        :param threshold: message size (body and attributes) above which the body is offloaded
+        :param cache_size_in_bytes: max size of fetched bodies kept in memory
+        :param delete_after_ack: delete the S3 object once the message is acked
+        """
+        self._s3_wrapper = s3_wrapper
+        self.bucket = bucket or s3_wrapper.config["S3_BUCKET"]
+        self.prefix = prefix
+        self.threshold = threshold
+        self.cache_size_in_bytes = cache_size_in_bytes
+        self.delete_after_ack = delete_after_ack
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._deletes = set()
+
+    async def offload(self, entry: dict, entry_size: int):
+        """
+        :param entry: SendMessage / SendMessageBatch entry
+        :param entry_size: size of the entry as SQS counts it
+        :return: entry with the body replaced by an S3 pointer when it is above threshold
+        """
+        if entry_size <= self.threshold:
+            return entry
+        key = "{}/{}".format(self.prefix, uuid.uuid4())
+        _, size = await self._s3_wrapper.stream_to_object(
+            {
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": "application/octet-stream",
+            },
+            self._iter_encoded(entry.get("MessageBody", "")),
+        )
+        entry = dict(entry)
+        entry["MessageBody"] = ujson.dumps(
+            [self.POINTER_CLASS, {"s3BucketName": self.bucket, "s3Key": key}]
+        )
+        attributes = dict(entry.get("MessageAttributes") or {})
+        attributes[self.SIZE_ATTRIBUTE] = {
+            "DataType": "Number",
+            "StringValue": str(size),
+        }
+        entry["MessageAttributes"] = attributes
+        return entry
+
+    @staticmethod
+    async def _iter_encoded(body: str):
+        # streamed to S3 slice by slice, the encoded body is never held whole
+        for start in range(0, len(body), ENCODE_CHUNK_SIZE):
+            yield body[start : start + ENCODE_CHUNK_SIZE].encode(Constant.UTF8)
+
+    def get_pointer(self, message: dict):
+        """
+        :return: (bucket, key) when the message body is an S3 pointer, None otherwise
+        """
+        attributes = message.get("MessageAttributes") or {}
+        if (
+            self.SIZE_ATTRIBUTE not in attributes
+            and self.LEGACY_SIZE_ATTRIBUTE not in attributes
+        ):
+            return None
+        try:
+            pointer_class, pointer = ujson.loads(message["Body"])
+        except ValueError:
+            return None
+        if pointer_class != self.POINTER_CLASS:
+            return None
+        return pointer["s3BucketName"], pointer["s3Key"]
+
+    async def fetch(self, message: dict):
+        """
+        :return: message with Body replaced by the offloaded payload, the message as is
+        when its body is not an S3 pointer
+        """
+        pointer = self.get_pointer(message)
+        if pointer is None:
+            return message
+        cached = self._cache.get(pointer)
+        if cached is None:
+            data = await self._s3_wrapper.read_file(pointer[1], bucket=pointer[0])
+            body = data.decode(Constant.UTF8)
+            self._add_to_cache(pointer, body, len(data))
+        else:
+            body = cached[0]
+            self._cache.move_to_end(pointer)
+        message = dict(message)
+        message["Body"] = body
+        return message
+
+    def on_ack(self, message: dict):
+        """
+        Drop the payload from the cache and delete it from S3 in the background
+        """
+        pointer = self.get_pointer(message)
+        if pointer is None:
+            return
+        cached = self._cache.pop(pointer, None)
+        if cached is not None:
+            self._cache_size -= cached[1]
+        if self.delete_after_ack:
+            task = asyncio.ensure_future(self._delete(*pointer))
+            self._deletes.add(task)
+            task.add_done_callback(self._deletes.discard)
+
+    async def close(self):
+        if self._deletes:
+            await asyncio.gather(*list(self._deletes), return_exceptions=True)
+
+    async def _delete(self, bucket: str, key: str):
+        try:
+            await self._s3_wrapper.delete_file(key, bucket=bucket)
+        except Exception as e:
+            logger.info(
+                "Could not delete offloaded SQS payload {}/{}: {}".format(
+                    bucket, key, str(e)
+                )
+            )
+
+    def _add_to_cache(self, pointer, body: str, size: int):
+        if size > self.cache_size_in_bytes:
+            return
+        self._cache[pointer] = (body, size)
+        self._cache_size += size
+        while self._cache_size > self.cache_size_in_bytes:
+            _, (_, evicted_size) = self._cache.popitem(last=False)
+            self._cache_size -= evicted_size
@@ -0,0 +1,157 @@
+import base64
+import gzip
+import zlib
+
+import ujson
+
+from ....constants import Constant, ErrorMessages
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class PayloadCodec:
+    """
+    Serialises SQS message bodies on publish and deserialises them before handle_event.
+    The codec name (e.g. "json", "msgpack+zstd") is sent in a message attribute, so consumers
+    decode every message with the codec it was published with and producers with different
+    codecs (or none) can share a queue.
+    Binary output (msgpack or compressed payloads) is base64 encoded, SQS bodies must be text.
+    Optional dependencies: orjson, msgpack and zstandard.
+    """
+
+    ATTRIBUTE_NAME = "commonutils.codec"
+    JSON = "json"
+    ORJSON = "orjson"
+    MSGPACK = "msgpack"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+    def __init__(
+        self, serializer: str = JSON, compression: str = None, compression_level=None
+    ):
+        """
+        :param serializer: json (ujson), orjson or msgpack
+        :param compression: None, gzip or zstd
+        :param compression_level: passed to the compressor, library default when not set
+        """
+        self._validate(serializer, compression)
+        self.serializer = serializer
+        self.compression = compression
+        self.compression_level = compression_level
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        :param config: SQS config, uses SQS_CODEC and SQS_COMPRESSION
+        :return: PayloadCodec, None when SQS_CODEC is not configured
+        """
+        serializer = (config or {}).get("SQS_CODEC")
+        if not serializer:
+            return None
+        return cls(serializer, (config or {}).get("SQS_COMPRESSION") or None)
+
+    @property
+    def name(self):
+        if self.compression:
+            return "{}+{}".format(self.serializer, self.compression)
+        return self.serializer
+
+    def message_attribute(self):
+        return {"DataType": "String", "StringValue": self.name}
+
+    def encode(self, payload) -> str:
+        data = self._serialize(payload)
+        if not self.compression and self.serializer != self.MSGPACK:
+            return data.decode(Constant.UTF8)
+        if self.compression:
+            data = self._compress(data)
+        return base64.b64encode(data).decode(Constant.UTF8)
+
+    @classmethod
+    def decode(cls, body: str, name: str):
+        serializer, _, compression = name.partition("+")
+        cls._validate(serializer, compression or None)
+        if compression or serializer == cls.MSGPACK:
+            data = base64.b64decode(body)
+        else:
+            data = body.encode(Constant.UTF8)
+        if compression:
+            data = cls._decompress(data, compression)
+        return cls._deserialize(data, serializer)
+
+    @classmethod
+    def decode_message(cls, message: dict):
+        """
+        :return: decoded body when the message carries the codec attribute, raw Body otherwise
+        """
+        attribute = (message.get("MessageAttributes") or {}).get(cls.ATTRIBUTE_NAME)
+        if not attribute:
+            return message["Body"]
+        return cls.decode(message["Body"], attribute["StringValue"])
+
+    def _serialize(self, payload) -> bytes:
+        if self.serializer == self.ORJSON:
+            return orjson.dumps(payload)
+        if self.serializer == self.MSGPACK:
+            return msgpack.packb(payload, use_bin_type=True)
+        return ujson.dumps(payload, ensure_ascii=False).encode(Constant.UTF8)
+
+    @classmethod
+    def _deserialize(cls, data: bytes, serializer: str):
+        if serializer == cls.ORJSON:
+            return orjson.loads(data)
+        if serializer == cls.MSGPACK:
+            return msgpack.unpackb(data, raw=False)
+        return ujson.loads(data)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == self.ZSTD:
+            if self.compression_level is None:
+                return zstandard.ZstdCompressor().compress(data)
+            return zstandard.ZstdCompressor(level=self.compression_level).compress(
+                data
+            )
+        # gzip framing without a timestamp, so equal payloads give equal bodies
+        # (content based deduplication of fifo queues relies on it)
+        level = -1 if self.compression_level is None else self.compression_level
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    @classmethod
+    def _decompress(cls, data: bytes, compression: str) -> bytes:
+        if compression == cls.ZSTD:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return gzip.decompress(data)
+
+    @classmethod
+    def _validate(cls, serializer: str, compression: str = None):
+        if serializer not in (cls.JSON, cls.ORJSON, cls.MSGPACK):
+            raise Exception(
+                ErrorMessages.AwsSQSInvalidCodec.value.format(codec=serializer)
+            )
+        if compression not in (None, cls.GZIP, cls.ZSTD):
+            raise Exception(
+                ErrorMessages.AwsSQSInvalidCodec.value.format(codec=compression)
+            )
+        missing = (
+            (serializer == cls.ORJSON and orjson is None and "orjson")
+            or (serializer == cls.MSGPACK and msgpack is None and "msgpack")
+            or (compression == cls.ZSTD and zstandard is None and "zstandard")
+        )
+        if missing:
+            raise Exception(
+                ErrorMessages.AwsSQSCodecNotInstalled.value.format(package=missing)
+            )
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+
+from ....constants import Constant
+
+logger = logging.getLogger()
+
+
+class VisibilityHeartbeat:
+    """
+    Keeps in-flight SQS messages invisible while their handlers are still running.
+    Every interval seconds the visibility timeout of all tracked messages is reset with
+    ChangeMessageVisibilityBatch, until the message is untracked (acked or failed) or
+    max_extension seconds have passed since it was received.
+    """
+
+    # SQS does not allow a message to stay in flight for more than 12 hours
+    MAX_EXTENSION_IN_SECONDS = 12 * 60 * 60
+
+    def __init__(
+        self,
+        sqs_wrapper,
+        visibility_timeout: int = 30,
+        interval: float = None,
+        max_extension: int = MAX_EXTENSION_IN_SECONDS,
+    ):
+        """
+        :param sqs_wrapper: BaseSQSWrapper whose queue the messages were received from
+        :param visibility_timeout: seconds of visibility set on every extension
+        :param interval: seconds between extensions, half of visibility_timeout by default
+        :param max_extension: stop extending a message after these many seconds
+        """
+        self._sqs_wrapper = sqs_wrapper
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or max(visibility_timeout / 2, 1)
+        self.max_extension = min(max_extension, self.MAX_EXTENSION_IN_SECONDS)
+        self._in_flight = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def track(self, receipt_handle: str):
+        self._in_flight[receipt_handle] = time.monotonic()
+
+    def untrack(self, receipt_handle: str):
+        self._in_flight.pop(receipt_handle, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.extend()
+            except Exception as e:
+                logger.exception(
+                    "Exception while extending SQS message visibility {}".format(str(e))
+                )
+
+    async def extend(self):
+        now = time.monotonic()
+        receipt_handles = []
+        for receipt_handle, received_at in list(self._in_flight.items()):
+            if now - received_at + self.visibility_timeout > self.max_extension:
+                logger.warning(
+                    "SQS message in flight for {} seconds, "
+                    "not extending its visibility".format(int(now - received_at))
+                )
+                self.untrack(receipt_handle)
+            else:
+                receipt_handles.append(receipt_handle)
+
+        batch_size = Constant.SQS_MAX_BATCH_ENTRIES
+        await asyncio.gather(
+            *[
+                self._extend_batch(receipt_handles[index : index + batch_size])
+                for index in range(0, len(receipt_handles), batch_size)
+            ]
+        )
+
+    async def _extend_batch(self, receipt_handles: list):
+        response = await self._sqs_wrapper.change_visibility_batch(
+            receipt_handles, self.visibility_timeout
+        )
+        for failed in response.get("Failed", []):
+            if failed.get("SenderFault"):
+                # message was deleted or its receipt handle expired, nothing left to extend
+                self.untrack(receipt_handles[int(failed["Id"])])
+            logger.info(
+                "Could not extend SQS message visibility, code: {}, message: {}".format(
+                    failed.get("Code"), failed.get("Message")
+                )
+            )
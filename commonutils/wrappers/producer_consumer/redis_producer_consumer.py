@@ -30,10 +30,17 @@ class RedisProducerConsumerManager:
         :return:
         """
         try:
-            await self._redis_wrapper.lpush(self._queue_name, payload)
+            await self.push_data(payload)
         except Exception as e:
             logger.error("Push to queue failed with error %s", repr(e))
 
+    async def push_data(self, payload: str):
+        """
+        Push the data to the start of the queue like produce_data, errors are raised
+        :param str payload: Payload to publish with the event
+        """
+        await self._redis_wrapper.lpush(self._queue_name, payload)
+
     async def consume_data(self, handler):
         """
         :param handler : a method to be called when the data is received from the queue
@@ -0,0 +1,68 @@
+import asyncio
+
+from commonutils.wrappers.aws.sqs.ack_batcher import AckBatcher
+
+
+class FakeSQSWrapper:
+    def __init__(self, failures=None):
+        # receipt handle -> (number of failed attempts, sender fault)
+        self.failures = dict(failures or {})
+        self.batches = []
+
+    async def purge_batch(self, receipt_handles):
+        self.batches.append(list(receipt_handles))
+        successful, failed = [], []
+        for index, receipt_handle in enumerate(receipt_handles):
+            attempts, sender_fault = self.failures.get(receipt_handle, (0, False))
+            if attempts:
+                self.failures[receipt_handle] = (attempts - 1, sender_fault)
+                failed.append(
+                    {"Id": str(index), "SenderFault": sender_fault, "Code": "Error"}
+                )
+            else:
+                successful.append({"Id": str(index)})
+        return {"Successful": successful, "Failed": failed}
+
+
+def test_full_batches_are_deleted_right_away():
+    sqs_wrapper = FakeSQSWrapper()
+
+    async def _run():
+        batcher = AckBatcher(sqs_wrapper, flush_interval=60)
+        for index in range(23):
+            await batcher.add(str(index))
+        pending = batcher.pending
+        await batcher.close()
+        return pending
+
+    assert asyncio.run(_run()) == 3
+    assert [len(batch) for batch in sqs_wrapper.batches] == [10, 10, 3]
+
+
+def test_partial_batch_is_flushed_by_the_timer():
+    sqs_wrapper = FakeSQSWrapper()
+    deleted = []
+
+    async def _run():
+        batcher = AckBatcher(sqs_wrapper, flush_interval=0.01)
+        await batcher.add("a", on_deleted=lambda: deleted.append("a"))
+        await asyncio.sleep(0.05)
+        return batcher.pending
+
+    assert asyncio.run(_run()) == 0
+    assert sqs_wrapper.batches == [["a"]]
+    assert deleted == ["a"]
+
+
+def test_only_failed_entries_are_retried():
+    sqs_wrapper = FakeSQSWrapper({"b": (1, False), "c": (1, True), "d": (5, False)})
+
+    async def _run():
+        batcher = AckBatcher(sqs_wrapper, flush_interval=60, max_retries=3)
+        for receipt_handle in "abcd":
+            await batcher.add(receipt_handle)
+        await batcher.close()
+
+    asyncio.run(_run())
+    # c is a sender fault and d gives up after max_retries attempts
+    assert sqs_wrapper.batches == [["a", "b", "c", "d"], ["b", "d"], ["d"]]
@@ -0,0 +1,69 @@
+import asyncio
+
+from commonutils.wrappers.aws.aws_client import AWSClient
+from commonutils.wrappers.aws.client_registry import AWSClientRegistry
+
+
+class FakeClientContext:
+    created = []
+
+    def __init__(self):
+        self.closed = False
+        FakeClientContext.created.append(self)
+
+    async def __aenter__(self):
+        # give concurrent acquire() calls a chance to race
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def __aexit__(self, *args):
+        self.closed = True
+
+
+def _patch_client_creation(monkeypatch):
+    FakeClientContext.created = []
+
+    async def _create_aws_client(cls, aws_service_name, region_name, **kwargs):
+        return FakeClientContext()
+
+    monkeypatch.setattr(AWSClient, "create_aws_client", classmethod(_create_aws_client))
+
+
+def test_clients_are_shared_and_closed_with_their_last_reference(monkeypatch):
+    _patch_client_creation(monkeypatch)
+
+    async def _run():
+        clients = await asyncio.gather(
+            *[AWSClientRegistry.acquire("sqs", "ap-south-1") for _ in range(3)]
+        )
+        assert len({id(client) for client in clients}) == 1
+        for client in clients[:2]:
+            await AWSClientRegistry.release(client)
+        assert not FakeClientContext.created[0].closed
+        await AWSClientRegistry.release(clients[2])
+
+    asyncio.run(_run())
+    assert len(FakeClientContext.created) == 1
+    assert FakeClientContext.created[0].closed
+    assert AWSClientRegistry._entries == {}
+
+
+def test_locks_are_dropped_once_clients_are_created(monkeypatch):
+    _patch_client_creation(monkeypatch)
+
+    async def _run():
+        clients = await asyncio.gather(
+            *[
+                AWSClientRegistry.acquire("s3", region)
+                for region in ("ap-south-1", "us-east-1", "ap-south-1")
+            ]
+        )
+        assert AWSClientRegistry._locks == {}
+        await AWSClientRegistry.close_all()
+        return clients
+
+    clients = asyncio.run(_run())
+    assert clients[0] is clients[2]
+    assert len(FakeClientContext.created) == 2
+    assert AWSClientRegistry._entries == {}
+    assert AWSClientRegistry._locks == {}
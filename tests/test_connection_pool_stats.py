@@ -0,0 +1,49 @@
+from collections import deque, namedtuple
+
+from commonutils.wrappers.aws.aws_client import AWSClient
+
+ConnectionKey = namedtuple("ConnectionKey", ["host", "port"])
+
+
+class FakeClient:
+    def __init__(self, connector):
+        http_session = type("HttpSession", (), {"_connector": connector})()
+        self._endpoint = type("Endpoint", (), {"http_session": http_session})()
+
+
+class Connector:
+    limit = 10
+    limit_per_host = 0
+
+
+def test_pool_usage_is_reported():
+    connector = Connector()
+    connector._acquired = {1, 2, 3}
+    connector._acquired_per_host = {ConnectionKey("sqs", 443): {1, 2}, "s3": {3}}
+    connector._waiters = {ConnectionKey("sqs", 443): deque([1, 2])}
+
+    stats = AWSClient.get_connection_pool_stats(FakeClient(connector))
+
+    assert stats == {
+        "limit": 10,
+        "limit_per_host": 0,
+        "acquired": 3,
+        "acquired_per_host": {"sqs": 2, "s3": 1},
+        "waiting": 2,
+    }
+
+
+def test_missing_aiohttp_internals_are_reported_as_none():
+    stats = AWSClient.get_connection_pool_stats(FakeClient(Connector()))
+
+    assert stats == {
+        "limit": 10,
+        "limit_per_host": 0,
+        "acquired": None,
+        "acquired_per_host": None,
+        "waiting": None,
+    }
+
+
+def test_client_without_pool():
+    assert AWSClient.get_connection_pool_stats(object()) is None
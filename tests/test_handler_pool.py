@@ -0,0 +1,63 @@
+import asyncio
+
+from commonutils.wrappers.aws.sqs.handler_pool import HandlerPool
+
+
+def test_reserve_is_capped_by_free_slots():
+    async def _run():
+        pool = HandlerPool(5)
+        first = await pool.reserve(3)
+        second = await pool.reserve(10)
+        return first, second, pool.in_flight
+
+    assert asyncio.run(_run()) == (3, 2, 5)
+
+
+def test_reserve_waits_for_a_finished_handler():
+    async def _run():
+        pool = HandlerPool(2)
+        await pool.reserve(2)
+        release = asyncio.Event()
+
+        async def _handler():
+            await release.wait()
+
+        pool.submit(_handler())
+        pool.submit(_handler())
+        waiting = asyncio.ensure_future(pool.reserve(2))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        release.set()
+        slots = await waiting
+        await pool.join()
+        return slots, pool.in_flight
+
+    # both handlers finished, so both slots are free again
+    assert asyncio.run(_run()) == (2, 2)
+
+
+def test_failing_handler_releases_its_slot():
+    async def _run():
+        pool = HandlerPool(1)
+        await pool.reserve(1)
+
+        async def _handler():
+            raise ValueError("handler failed")
+
+        pool.submit(_handler())
+        await pool.join()
+        return pool.in_flight
+
+    assert asyncio.run(_run()) == 0
+
+
+def test_unused_slots_are_released():
+    async def _run():
+        pool = HandlerPool(10)
+        slots = await pool.reserve(10)
+        # fewer messages received than slots reserved
+        await pool.release(slots - 3)
+        await pool.release(0)
+        return pool.in_flight
+
+    assert asyncio.run(_run()) == 3
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from commonutils.wrappers.aws.sqs import BaseSQSWrapper, LargePayloadStore
+from commonutils.wrappers.aws.sqs.large_payload_store import ENCODE_CHUNK_SIZE
+
+
+class FakeS3Wrapper:
+    def __init__(self):
+        self.config = {"S3_BUCKET": "payloads"}
+        self.objects = {}
+
+    async def stream_to_object(
+        self, object_args, source, part_size=None, max_concurrency=None
+    ):
+        body = b"".join([chunk async for chunk in source])
+        self.objects[(object_args["Bucket"], object_args["Key"])] = body
+        return '"etag"', len(body)
+
+    async def read_file(self, key, bucket=None):
+        return self.objects[(bucket, key)]
+
+    async def delete_file(self, key, bucket=None):
+        self.objects.pop((bucket, key), None)
+
+
+class FakeSQSClient:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+        return {"MessageId": "1"}
+
+
+def _get_wrapper(store, queue_url="https://sqs/queue"):
+    wrapper = BaseSQSWrapper({"SQS": {}}, large_payload_store=store)
+    wrapper.client = FakeSQSClient()
+    wrapper.queue_url = queue_url
+    return wrapper
+
+
+def test_large_payload_round_trip():
+    s3_wrapper = FakeS3Wrapper()
+    store = LargePayloadStore(s3_wrapper, threshold=1024)
+    body = "é" * 4096
+
+    async def _run():
+        entry = await store.offload({"MessageBody": body}, len(body.encode()))
+        message = {
+            "Body": entry["MessageBody"],
+            "MessageAttributes": entry["MessageAttributes"],
+        }
+        return entry, await store.fetch(message)
+
+    entry, message = asyncio.run(_run())
+    assert len(entry["MessageBody"]) < 1024
+    assert entry["MessageAttributes"]["ExtendedPayloadSize"]["StringValue"] == "8192"
+    assert message["Body"] == body
+
+
+def test_small_payload_is_not_offloaded():
+    s3_wrapper = FakeS3Wrapper()
+    store = LargePayloadStore(s3_wrapper, threshold=1024)
+
+    entry = asyncio.run(store.offload({"MessageBody": "small"}, 5))
+
+    assert entry == {"MessageBody": "small"}
+    assert s3_wrapper.objects == {}
+
+
+def test_invalid_publish_leaves_no_payload_in_s3():
+    s3_wrapper = FakeS3Wrapper()
+    wrapper = _get_wrapper(
+        LargePayloadStore(s3_wrapper, threshold=1024),
+        queue_url="https://sqs/queue.fifo",
+    )
+
+    # a FIFO queue needs a message_group_id
+    with pytest.raises(Exception):
+        asyncio.run(wrapper.publish_to_sqs(payload="x" * 4096, batch=False))
+
+    assert s3_wrapper.objects == {}
+    assert wrapper.client.sent == []
+
+
+def test_payload_is_streamed_in_chunks():
+    s3_wrapper = FakeS3Wrapper()
+    store = LargePayloadStore(s3_wrapper, threshold=1024)
+    body = "é" * (ENCODE_CHUNK_SIZE + 5)
+    chunks = []
+    stream_to_object = s3_wrapper.stream_to_object
+
+    async def _stream_to_object(object_args, source):
+        async def _record():
+            async for chunk in source:
+                chunks.append(len(chunk))
+                yield chunk
+
+        return await stream_to_object(object_args, _record())
+
+    s3_wrapper.stream_to_object = _stream_to_object
+    asyncio.run(store.offload({"MessageBody": body}, 2 * len(body)))
+
+    assert chunks == [2 * ENCODE_CHUNK_SIZE, 10]
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from datetime import datetime
+
+from dateutil import tz
+
+from commonutils.utils import Singleton
+from commonutils.wrappers import RedisProducerConsumerManager
+from commonutils.wrappers.aws.event_bridge_scheduler import (LocalScheduler,
+                                                            SchedulerClientWrapper)
+
+
+class FakeRedis:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.pushed = []
+
+    async def lpush(self, queue_name, payload):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis unavailable")
+        self.pushed.append((queue_name, payload))
+        return len(self.pushed)
+
+
+class Handler:
+    received = []
+
+    @classmethod
+    async def handle_event(cls, body):
+        cls.received.append(body)
+
+
+def _get_scheduler(backend):
+    # a new wrapper per test
+    Singleton._instances.pop(SchedulerClientWrapper, None)
+    return SchedulerClientWrapper(
+        {
+            "EVENT_SCHEDULER": {
+                "SQS_QUEUE_NAME": "queue",
+                "AWS_ACCESS_KEY_ID": "key",
+                "AWS_SECRET_ACCESS_KEY": "secret",
+            }
+        },
+        backend=backend,
+    )
+
+
+def _in_a_second():
+    # at() expressions are in the schedule timezone, with a one second resolution
+    return datetime.fromtimestamp(time.time() + 1, tz.gettz("Asia/Calcutta")).strftime(
+        "%Y-%m-%dT%H:%M:%S"
+    )
+
+
+async def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_schedule_is_delivered_to_the_queue_handler():
+    Handler.received = []
+    local_scheduler = LocalScheduler(retry_backoff=0.01)
+    scheduler = _get_scheduler(local_scheduler)
+
+    async def _run():
+        await scheduler.initialize_event_scheduler(Handler)
+        await scheduler.create_sqs_event_schedule(
+            "reminder", "at({})".format(_in_a_second()), msg="hello"
+        )
+        await _wait_for(lambda: Handler.received)
+        schedules = [
+            schedule["Name"] async for schedule in scheduler.list_event_schedules()
+        ]
+        await local_scheduler.close()
+        return schedules
+
+    schedules = asyncio.run(_run())
+    assert Handler.received == ["hello"]
+    # one time schedules are deleted once delivered
+    assert schedules == []
+
+
+def test_failed_producer_delivery_is_retried():
+    redis = FakeRedis(failures=2)
+    local_scheduler = LocalScheduler(
+        producer=RedisProducerConsumerManager(redis, "jobs"), retry_backoff=0.01
+    )
+    scheduler = _get_scheduler(local_scheduler)
+
+    async def _run():
+        await scheduler.initialize_event_scheduler()
+        await scheduler.create_sqs_event_schedule(
+            "job", "at({})".format(_in_a_second()), msg="payload"
+        )
+        await _wait_for(lambda: redis.pushed)
+        await local_scheduler.close()
+
+    asyncio.run(_run())
+    assert redis.failures == 0
+    assert redis.pushed == [("jobs", "payload")]
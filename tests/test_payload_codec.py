@@ -0,0 +1,46 @@
+import pytest
+
+from commonutils.wrappers.aws.sqs import PayloadCodec
+
+PAYLOAD = {"order_id": 42, "items": ["é", "ü"], "paid": True, "total": 10.5}
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+def test_round_trip(serializer, compression):
+    codec = PayloadCodec(serializer, compression)
+
+    message = {
+        "Body": codec.encode(PAYLOAD),
+        "MessageAttributes": {PayloadCodec.ATTRIBUTE_NAME: codec.message_attribute()},
+    }
+
+    assert isinstance(message["Body"], str)
+    assert PayloadCodec.decode_message(message) == PAYLOAD
+
+
+def test_gzip_bodies_are_deterministic():
+    codec = PayloadCodec("json", "gzip")
+
+    assert codec.encode(PAYLOAD) == codec.encode(dict(PAYLOAD))
+
+
+def test_message_without_codec_attribute_is_returned_as_is():
+    assert PayloadCodec.decode_message({"Body": "plain"}) == "plain"
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(Exception):
+        PayloadCodec("pickle")
+    with pytest.raises(Exception):
+        PayloadCodec.decode("body", "json+lz4")
+
+
+def test_from_config():
+    assert PayloadCodec.from_config({}) is None
+    assert (
+        PayloadCodec.from_config(
+            {"SQS_CODEC": "msgpack", "SQS_COMPRESSION": "zstd"}
+        ).name
+        == "msgpack+zstd"
+    )
@@ -0,0 +1,95 @@
+import asyncio
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.s3 import PresignedUrlCache, Presigner
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.signed = []
+
+    async def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.signed.append(ExpiresIn)
+        return "https://{}.s3/{}?expires={}&n={}".format(
+            Params["Bucket"], Params["Key"], ExpiresIn, len(self.signed)
+        )
+
+
+def _get_presigner(client):
+    # a new presigner and cache per test
+    Singleton._instances.pop(Presigner, None)
+    presigner = Presigner({"S3_REGION": "ap-south-1"}, url_cache=PresignedUrlCache())
+
+    async def _s3_client():
+        return client
+
+    presigner._s3_client = _s3_client
+    return presigner
+
+
+def test_cached_url_is_reused_for_the_same_expiry():
+    client = FakeS3Client()
+    presigner = _get_presigner(client)
+
+    async def _run():
+        first = await presigner.get_presigned_url("bucket", "a.pdf", expires_in=600)
+        second = await presigner.get_presigned_url("bucket", "a.pdf", expires_in=600)
+        return first, second
+
+    first, second = asyncio.run(_run())
+    assert first == second
+    assert client.signed == [600]
+
+
+def test_longer_expiry_signs_a_fresh_url():
+    client = FakeS3Client()
+    presigner = _get_presigner(client)
+
+    async def _run():
+        short = await presigner.get_presigned_url("bucket", "a.pdf", expires_in=600)
+        long = await presigner.get_presigned_url("bucket", "a.pdf", expires_in=21600)
+        return short, long
+
+    short, long = asyncio.run(_run())
+    assert short != long
+    assert client.signed == [600, 21600]
+
+
+def test_batch_longer_expiry_signs_fresh_urls():
+    client = FakeS3Client()
+    presigner = _get_presigner(client)
+
+    async def _run():
+        await presigner.get_presigned_url("bucket", "a.pdf", expires_in=600)
+        return await presigner.get_presigned_urls_batch(
+            "bucket", ["a.pdf"], expires_in=21600
+        )
+
+    urls = asyncio.run(_run())
+    assert client.signed == [600, 21600]
+    assert "expires=21600" in urls[0]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+
+def test_urls_are_shared_through_redis():
+    redis = FakeRedis()
+    first, second = PresignedUrlCache(redis_wrapper=redis), PresignedUrlCache(
+        redis_wrapper=redis
+    )
+
+    async def _run():
+        await first.set("bucket", "a.pdf", "get_object", "https://signed", 3600)
+        return await second.get("bucket", "a.pdf", "get_object", expires_in=3600)
+
+    assert asyncio.run(_run()) == "https://signed"
+    assert second.stats()["redis_hits"] == 1
@@ -0,0 +1,99 @@
+import asyncio
+
+import botocore.exceptions
+import pytest
+
+from commonutils.wrappers.aws.resolution_cache import ResolutionCache
+
+
+class FakeResolver:
+    def __init__(self, errors=None, value="arn"):
+        self.errors = list(errors or [])
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.errors:
+            error = self.errors.pop(0)
+            # wrappers re-raise botocore errors as Exception
+            try:
+                raise error
+            except botocore.exceptions.ClientError:
+                raise Exception("lookup failed")
+        return self.value
+
+
+def _client_error(code):
+    return botocore.exceptions.ClientError({"Error": {"Code": code}}, "GetQueueUrl")
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    ResolutionCache.invalidate()
+    yield
+    ResolutionCache.invalidate()
+
+
+def test_value_is_cached():
+    resolver = FakeResolver()
+
+    async def _run():
+        await ResolutionCache.resolve(("queue_url", None, None, "a"), resolver)
+        return await ResolutionCache.resolve(("queue_url", None, None, "a"), resolver)
+
+    assert asyncio.run(_run()) == "arn"
+    assert resolver.calls == 1
+
+
+def test_concurrent_lookups_share_one_call():
+    resolver = FakeResolver()
+
+    async def _run():
+        return await asyncio.gather(
+            *[
+                ResolutionCache.resolve(("queue_url", None, None, "b"), resolver)
+                for _ in range(5)
+            ]
+        )
+
+    assert asyncio.run(_run()) == ["arn"] * 5
+    assert resolver.calls == 1
+
+
+def test_not_found_is_cached():
+    resolver = FakeResolver(
+        errors=[_client_error("AWS.SimpleQueueService.NonExistentQueue")]
+    )
+
+    async def _run():
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await ResolutionCache.resolve(("queue_url", None, None, "c"), resolver)
+
+    asyncio.run(_run())
+    assert resolver.calls == 1
+
+
+def test_throttling_is_not_cached():
+    resolver = FakeResolver(errors=[_client_error("RequestThrottled")])
+
+    async def _run():
+        with pytest.raises(Exception):
+            await ResolutionCache.resolve(("queue_url", None, None, "d"), resolver)
+        return await ResolutionCache.resolve(("queue_url", None, None, "d"), resolver)
+
+    assert asyncio.run(_run()) == "arn"
+    assert resolver.calls == 2
+
+
+def test_keys_are_scoped_by_credentials():
+    resolver = FakeResolver()
+
+    async def _run():
+        await ResolutionCache.resolve(("queue_url", None, "key-1", "e"), resolver)
+        await ResolutionCache.resolve(("queue_url", None, "key-2", "e"), resolver)
+
+    asyncio.run(_run())
+    assert resolver.calls == 2
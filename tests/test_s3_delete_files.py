@@ -0,0 +1,88 @@
+import asyncio
+
+import botocore.exceptions
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.s3 import BaseS3Wrapper
+
+
+class FakeS3Client:
+    def __init__(self, errors=None, failed_keys=None):
+        self.errors = list(errors or [])
+        self.failed_keys = dict(failed_keys or {})
+        self.batches = []
+
+    async def delete_objects(self, Bucket, Delete):
+        keys = [item["Key"] for item in Delete["Objects"]]
+        self.batches.append(keys)
+        if self.errors:
+            raise self.errors.pop(0)
+        errors = [
+            {"Key": key, "Code": self.failed_keys.pop(key), "Message": "failed"}
+            for key in keys
+            if key in self.failed_keys
+        ]
+        return {"Errors": errors}
+
+
+def _get_wrapper(client):
+    # a new wrapper per test
+    Singleton._instances.pop(BaseS3Wrapper, None)
+    wrapper = BaseS3Wrapper({"S3_BUCKET": "bucket"}, client)
+    wrapper.DELETE_RETRY_BACKOFF = 0
+    return wrapper
+
+
+def _client_error(code, status):
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "DeleteObjects",
+    )
+
+
+def test_keys_are_deleted_in_batches_of_1000():
+    client = FakeS3Client()
+    keys = ["key-{}".format(index) for index in range(2500)]
+
+    result = asyncio.run(_get_wrapper(client).delete_files(keys=keys))
+
+    assert sorted(len(batch) for batch in client.batches) == [500, 1000, 1000]
+    assert sorted(result["Deleted"]) == sorted(keys)
+    assert result["Errors"] == []
+
+
+def test_only_retryable_key_errors_are_retried():
+    client = FakeS3Client(failed_keys={"a": "SlowDown", "b": "AccessDenied"})
+
+    result = asyncio.run(_get_wrapper(client).delete_files(keys=["a", "b", "c"]))
+
+    assert client.batches == [["a", "b", "c"], ["a"]]
+    assert sorted(result["Deleted"]) == ["a", "c"]
+    assert [error["Key"] for error in result["Errors"]] == ["b"]
+
+
+def test_access_denied_request_is_not_retried():
+    client = FakeS3Client(errors=[_client_error("AccessDenied", 403)])
+
+    result = asyncio.run(_get_wrapper(client).delete_files(keys=["a"]))
+
+    assert len(client.batches) == 1
+    assert result["Errors"][0]["Code"] == "AccessDenied"
+
+
+def test_programming_errors_are_not_retried():
+    client = FakeS3Client(errors=[TypeError("bad argument")])
+
+    result = asyncio.run(_get_wrapper(client).delete_files(keys=["a"]))
+
+    assert len(client.batches) == 1
+    assert result["Errors"][0]["Code"] == "TypeError"
+
+
+def test_server_errors_are_retried():
+    client = FakeS3Client(errors=[_client_error("InternalError", 500)])
+
+    result = asyncio.run(_get_wrapper(client).delete_files(keys=["a"]))
+
+    assert len(client.batches) == 2
+    assert result == {"Deleted": ["a"], "Errors": []}
@@ -0,0 +1,101 @@
+import asyncio
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.s3 import BaseS3Wrapper, S3Object
+
+
+class FakePaginator:
+    def __init__(self, keys, calls):
+        self.keys = keys
+        self.calls = calls
+
+    async def paginate(self, Bucket, Prefix, PaginationConfig, **kwargs):
+        self.calls.append(dict(kwargs, Prefix=Prefix))
+        delimiter = kwargs.get("Delimiter")
+        keys = [
+            key
+            for key in sorted(self.keys)
+            if key.startswith(Prefix) and key > kwargs.get("StartAfter", "")
+        ]
+        contents, common_prefixes = [], []
+        for key in keys:
+            rest = key[len(Prefix) :]
+            if delimiter and delimiter in rest:
+                common_prefix = Prefix + rest.split(delimiter)[0] + delimiter
+                if common_prefix not in common_prefixes:
+                    common_prefixes.append(common_prefix)
+            else:
+                contents.append(
+                    {"Key": key, "Size": self.keys[key], "ETag": '"{}"'.format(key)}
+                )
+        page_size = PaginationConfig["PageSize"]
+        for start in range(0, max(len(contents), 1), page_size):
+            page = {"Contents": contents[start : start + page_size]}
+            if start == 0:
+                page["CommonPrefixes"] = [
+                    {"Prefix": prefix} for prefix in common_prefixes
+                ]
+            yield page
+
+
+class FakeS3Client:
+    def __init__(self, keys):
+        self.keys = keys
+        self.calls = []
+
+    def get_paginator(self, operation):
+        return FakePaginator(self.keys, self.calls)
+
+
+KEYS = {
+    "a/1.csv": 10,
+    "a/2.json": 20,
+    "b/3.csv": 300,
+    "b/c/4.csv": 40,
+    "top.csv": 5,
+}
+
+
+def _get_wrapper(client):
+    # a new wrapper per test
+    Singleton._instances.pop(BaseS3Wrapper, None)
+    return BaseS3Wrapper({"S3_BUCKET": "bucket"}, client)
+
+
+def _list(wrapper, **kwargs):
+    async def _run():
+        return [s3_object async for s3_object in wrapper.list_files(**kwargs)]
+
+    return asyncio.run(_run())
+
+
+def test_pages_are_listed_in_order():
+    objects = _list(_get_wrapper(FakeS3Client(KEYS)), page_size=2)
+
+    assert [s3_object.key for s3_object in objects] == sorted(KEYS)
+    assert objects[0] == S3Object("bucket", "a/1.csv", size=10, etag="a/1.csv")
+
+
+def test_filters_are_applied_to_each_page():
+    objects = _list(
+        _get_wrapper(FakeS3Client(KEYS)), suffix=".csv", min_size=6, max_size=100
+    )
+
+    assert [s3_object.key for s3_object in objects] == ["a/1.csv", "b/c/4.csv"]
+
+
+def test_fan_out_lists_every_common_prefix():
+    client = FakeS3Client(KEYS)
+
+    objects = _list(_get_wrapper(client), fan_out=True)
+
+    assert sorted(s3_object.key for s3_object in objects) == sorted(KEYS)
+    assert sorted(call["Prefix"] for call in client.calls) == ["", "a/", "b/"]
+
+
+def test_objects_are_hashable():
+    first = S3Object("bucket", "a", size=1, etag="x")
+    same = S3Object("bucket", "a", size=1, etag="x")
+
+    assert {first, same} == {first}
+    assert {first: 1}[same] == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+import botocore.exceptions
+import pytest
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.s3 import BaseS3Wrapper
+
+CSV = b"city,amount\nDelhi,10\nPune,20\nDelhi,30\n"
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+class FakeS3Client:
+    def __init__(self, select_error=None):
+        self.select_error = select_error
+        self.gets = 0
+
+    async def select_object_content(self, **kwargs):
+        if self.select_error is not None:
+            raise self.select_error
+
+        async def _events():
+            # a record split across two events
+            yield {"Records": {"Payload": b'{"city": "Delhi", "amount": "10"}\n{"ci'}}
+            yield {"Records": {"Payload": b'ty": "Delhi", "amount": "30"}\n'}}
+            yield {"End": {}}
+
+        return {"Payload": _events()}
+
+    async def head_object(self, Bucket, Key, **kwargs):
+        return {"ContentLength": len(CSV), "ETag": '"etag"'}
+
+    async def get_object(self, Bucket, Key, Range, IfMatch):
+        self.gets += 1
+        start, end = (int(value) for value in Range[len("bytes=") :].split("-"))
+        return {"Body": FakeBody(CSV[start : end + 1])}
+
+
+def _client_error(code):
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code}}, "SelectObjectContent"
+    )
+
+
+def _select(client):
+    Singleton._instances.pop(BaseS3Wrapper, None)
+    wrapper = BaseS3Wrapper({"S3_BUCKET": "bucket"}, client)
+
+    async def _run():
+        return [
+            record
+            async for record in wrapper.select_records(
+                "orders.csv",
+                expression="SELECT * FROM S3Object s WHERE s.city = 'Delhi'",
+                predicate=lambda record: record["city"] == "Delhi",
+                input_format="CSV",
+            )
+        ]
+
+    return asyncio.run(_run())
+
+
+EXPECTED = [{"city": "Delhi", "amount": "10"}, {"city": "Delhi", "amount": "30"}]
+
+
+def test_records_are_selected_in_s3():
+    client = FakeS3Client()
+
+    assert _select(client) == EXPECTED
+    assert client.gets == 0
+
+
+@pytest.mark.parametrize(
+    "code", ["MethodNotAllowed", "NotImplemented", "UnsupportedSqlOperation"]
+)
+def test_falls_back_to_streaming_when_select_is_not_supported(code):
+    client = FakeS3Client(select_error=_client_error(code))
+
+    assert _select(client) == EXPECTED
+    assert client.gets == 1
+
+
+@pytest.mark.parametrize("code", ["AccessDenied", "InvalidRequest", "NoSuchKey"])
+def test_other_errors_are_raised(code):
+    client = FakeS3Client(select_error=_client_error(code))
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        _select(client)
+    assert client.gets == 0
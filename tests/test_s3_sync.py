@@ -0,0 +1,95 @@
+import asyncio
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.s3 import BaseS3Wrapper, S3Sync
+
+MB = 1024 * 1024
+
+
+class FakeS3Wrapper:
+    def __init__(self):
+        self.config = {"ACL": "no-acl"}
+        self.uploads = {}
+
+    async def _s3_client(self):
+        pass
+
+    async def list_files(self, prefix, bucket=None, fan_out=False):
+        for _ in ():
+            yield
+
+    async def stream_to_object(self, object_args, source, part_size, max_concurrency):
+        size = 0
+        async for chunk in source:
+            size += len(chunk)
+        self.uploads[object_args["Key"]] = size
+        return '"etag"', size
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+class FakeS3Client:
+    def __init__(self, data):
+        self.data = data
+
+    async def head_object(self, Bucket, Key, **kwargs):
+        return {"ContentLength": len(self.data), "ETag": '"etag"'}
+
+    async def get_object(self, Bucket, Key, Range, IfMatch):
+        start, end = (int(value) for value in Range[len("bytes=") :].split("-"))
+        return {"Body": FakeBody(self.data[start : end + 1])}
+
+
+def _record_acquires(s3_sync):
+    acquired = []
+
+    async def _acquire(amount):
+        acquired.append(amount)
+
+    s3_sync.rate_limiter.acquire = _acquire
+    return acquired
+
+
+def test_upload_is_throttled_chunk_by_chunk(tmp_path):
+    (tmp_path / "a.bin").write_bytes(b"x" * (3 * MB + 10))
+    s3_wrapper = FakeS3Wrapper()
+    s3_sync = S3Sync(s3_wrapper, bytes_per_second=MB)
+    acquired = _record_acquires(s3_sync)
+
+    result = asyncio.run(s3_sync.sync(str(tmp_path), "s3://bucket/backup"))
+
+    assert result["Transferred"] == ["a.bin"]
+    assert s3_wrapper.uploads == {"backup/a.bin": 3 * MB + 10}
+    assert acquired == [MB, MB, MB, 10]
+
+
+def test_download_is_throttled_chunk_by_chunk(tmp_path):
+    Singleton._instances.pop(BaseS3Wrapper, None)
+    data = b"y" * (200 * 1024)
+    s3_wrapper = BaseS3Wrapper({"S3_BUCKET": "bucket"}, FakeS3Client(data))
+    acquired = []
+
+    async def _throttle(amount):
+        acquired.append(amount)
+
+    destination = str(tmp_path / "b.bin")
+    asyncio.run(
+        s3_wrapper.download("b.bin", destination, verify=False, throttle=_throttle)
+    )
+
+    assert (tmp_path / "b.bin").read_bytes() == data
+    assert sum(acquired) == len(data)
+    assert max(acquired) < len(data)
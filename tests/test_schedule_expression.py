@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from commonutils.wrappers.aws.event_bridge_scheduler import ScheduleExpression
+
+# a Saturday
+AFTER = datetime(2026, 10, 17, 10, 7, tzinfo=timezone.utc)
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def _next_fire_time(expression, after=AFTER, start=None):
+    return ScheduleExpression(expression, "UTC").next_fire_time(after, start=start)
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        # a/1 runs every minute from a
+        ("cron(5/1 * * * ? *)", _utc(2026, 10, 17, 10, 8)),
+        ("cron(5/20 * * * ? *)", _utc(2026, 10, 17, 10, 25)),
+        ("cron(0/15 9-18 ? * MON-FRI *)", _utc(2026, 10, 19, 9, 0)),
+        ("cron(0 8-9 * * ? *)", _utc(2026, 10, 18, 8, 0)),
+        ("cron(0 10,20 * * ? *)", _utc(2026, 10, 17, 20, 0)),
+        ("cron(0 10 L * ? *)", _utc(2026, 10, 31, 10, 0)),
+        # November 15th is a Sunday, the nearest weekday is Monday 16th
+        ("cron(0 10 15W * ? *)", _utc(2026, 11, 16, 10, 0)),
+        # October 31st is a Saturday, the last weekday is Friday 30th
+        ("cron(0 10 LW * ? *)", _utc(2026, 10, 30, 10, 0)),
+        # first Monday of the month
+        ("cron(0 10 ? * 2#1 *)", _utc(2026, 11, 2, 10, 0)),
+        # last Friday of the month
+        ("cron(0 10 ? * 6L *)", _utc(2026, 10, 30, 10, 0)),
+        ("cron(0 0 29 FEB ? *)", _utc(2028, 2, 29, 0, 0)),
+        ("cron(0 10 * * ? 2025)", None),
+    ],
+)
+def test_cron_next_fire_time(expression, expected):
+    assert _next_fire_time(expression) == expected
+
+
+def test_cron_step_covers_the_rest_of_the_range():
+    after = _utc(2026, 10, 17, 10, 59)
+    assert _next_fire_time("cron(5/1 * * * ? *)", after) == _utc(2026, 10, 17, 11, 5)
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("rate(1 minute)", _utc(2026, 10, 17, 10, 8)),
+        ("rate(5 minutes)", _utc(2026, 10, 17, 10, 10)),
+        ("rate(1 hour)", _utc(2026, 10, 17, 11, 0)),
+    ],
+)
+def test_rate_next_fire_time(expression, expected):
+    assert _next_fire_time(expression, start=_utc(2026, 10, 17, 10, 0)) == expected
+
+
+def test_at_is_in_the_schedule_timezone():
+    expression = ScheduleExpression("at(2026-10-17T18:00:00)", "Asia/Calcutta")
+    assert expression.next_fire_time(AFTER) == _utc(2026, 10, 17, 12, 30)
+    assert expression.next_fire_time(_utc(2026, 10, 18)) is None
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "cron(0 10 * * * *)",
+        "cron(0 10 ? * ? *)",
+        "cron(61 * * * ? *)",
+        "cron(0 10 * * ?)",
+        "cron(0 10 ? * 8 *)",
+        "rate(0 minutes)",
+        "rate(5 seconds)",
+        "at(2026-13-01T00:00:00)",
+        "every day",
+    ],
+)
+def test_invalid_expressions_raise(expression):
+    with pytest.raises(Exception):
+        ScheduleExpression(expression, "UTC")
+
+
+def test_unknown_timezone_raises():
+    with pytest.raises(Exception):
+        ScheduleExpression("rate(1 minute)", "Mars/Olympus")
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from commonutils.utils import Singleton
+from commonutils.wrappers.aws.event_bridge_scheduler import SchedulerClientWrapper
+
+
+class FakeBackend:
+    def __init__(self):
+        self.arn_lookups = []
+        self.calls = []
+
+    async def start(self, event_handler=None, queue_name=None):
+        pass
+
+    def get_target_arn(self, target_type, target_resource_name):
+        self.arn_lookups.append(target_resource_name)
+        return "arn:aws:{}:ap-south-1:123456789012:{}".format(
+            target_type, target_resource_name
+        )
+
+    async def call_api(self, method, full_path, schedule_definition=None):
+        self.calls.append((method, full_path, schedule_definition))
+        return 200, {}
+
+
+def _get_scheduler(backend):
+    # a new wrapper per test
+    Singleton._instances.pop(SchedulerClientWrapper, None)
+    return SchedulerClientWrapper(
+        {
+            "EVENT_SCHEDULER": {
+                "SQS_QUEUE_NAME": "queue",
+                "AWS_ACCESS_KEY_ID": "key",
+                "AWS_SECRET_ACCESS_KEY": "secret",
+            }
+        },
+        backend=backend,
+    )
+
+
+def test_step_expression_is_accepted():
+    backend = FakeBackend()
+    scheduler = _get_scheduler(backend)
+
+    asyncio.run(
+        scheduler.create_sqs_event_schedule("every-minute", "cron(5/1 * * * ? *)")
+    )
+
+    method, full_path, definition = backend.calls[0]
+    assert (method, full_path) == ("POST", "/schedules/every-minute")
+    assert definition["ScheduleExpression"] == "cron(5/1 * * * ? *)"
+
+
+def test_invalid_expression_fails_before_arn_lookup():
+    backend = FakeBackend()
+    scheduler = _get_scheduler(backend)
+
+    with pytest.raises(Exception):
+        asyncio.run(scheduler.create_sqs_event_schedule("bad", "cron(0 10 * * * *)"))
+
+    assert backend.arn_lookups == []
+    assert backend.calls == []
+
+
+def test_invalid_update_expression_fails_before_get():
+    backend = FakeBackend()
+    scheduler = _get_scheduler(backend)
+
+    with pytest.raises(Exception):
+        asyncio.run(scheduler.update_event_schedule("bad", "rate(0 minutes)"))
+
+    assert backend.calls == []
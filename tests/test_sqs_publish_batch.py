@@ -0,0 +1,125 @@
+import asyncio
+
+import botocore.exceptions
+import pytest
+
+from commonutils.wrappers.aws.sqs import BaseSQSWrapper
+
+
+class FakeSQSClient:
+    def __init__(self, errors=None, fail_ids=None):
+        self.errors = list(errors or [])
+        self.fail_ids = set(fail_ids or [])
+        self.batches = []
+        self.calls = 0
+
+    async def send_message_batch(self, QueueUrl, Entries):
+        # odd calls are slower, so parallel sends complete out of order
+        self.calls += 1
+        await asyncio.sleep(0.01 if self.calls % 2 else 0)
+        self.batches.append([entry["Id"] for entry in Entries])
+        if self.errors:
+            raise self.errors.pop(0)
+        failed = [entry for entry in Entries if entry["Id"] in self.fail_ids]
+        self.fail_ids -= {entry["Id"] for entry in failed}
+        return {
+            "Successful": [
+                {"Id": entry["Id"], "MessageId": "m" + entry["Id"]}
+                for entry in Entries
+                if entry not in failed
+            ],
+            "Failed": [
+                {"Id": entry["Id"], "SenderFault": False, "Code": "InternalError"}
+                for entry in failed
+            ],
+        }
+
+
+def _get_wrapper(client, queue_url="https://sqs/queue"):
+    wrapper = BaseSQSWrapper({"SQS": {}})
+    wrapper.client = client
+    wrapper.queue_url = queue_url
+    wrapper.PUBLISH_RETRY_BACKOFF = 0
+    return wrapper
+
+
+def _client_error(code, status):
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "SendMessageBatch",
+    )
+
+
+def test_batches_are_chunked_at_10_entries():
+    client = FakeSQSClient()
+    wrapper = _get_wrapper(client)
+    messages = [{"MessageBody": str(index)} for index in range(25)]
+
+    response = asyncio.run(wrapper.publish_batch_to_sqs(messages))
+
+    assert sorted(len(batch) for batch in client.batches) == [5, 10, 10]
+    assert len(response["Successful"]) == 25
+    assert response["Failed"] == []
+
+
+def test_batches_are_chunked_at_256_kb():
+    client = FakeSQSClient()
+    wrapper = _get_wrapper(client)
+    messages = [{"MessageBody": "x" * 100 * 1024} for _ in range(3)]
+
+    asyncio.run(wrapper.publish_batch_to_sqs(messages))
+
+    assert sorted(len(batch) for batch in client.batches) == [1, 2]
+
+
+def test_only_failed_entries_are_retried():
+    client = FakeSQSClient(fail_ids={"3"})
+    wrapper = _get_wrapper(client)
+    messages = [{"MessageBody": str(index)} for index in range(5)]
+
+    response = asyncio.run(wrapper.publish_batch_to_sqs(messages))
+
+    assert client.batches == [["0", "1", "2", "3", "4"], ["3"]]
+    assert len(response["Successful"]) == 5
+
+
+def test_access_denied_is_not_retried():
+    client = FakeSQSClient(errors=[_client_error("AccessDenied", 403)])
+    wrapper = _get_wrapper(client)
+
+    response = asyncio.run(wrapper.publish_batch_to_sqs([{"MessageBody": "a"}]))
+
+    assert len(client.batches) == 1
+    assert response["Failed"][0]["Code"] == "AccessDenied"
+
+
+def test_throttling_is_retried():
+    client = FakeSQSClient(errors=[_client_error("RequestThrottled", 400)])
+    wrapper = _get_wrapper(client)
+
+    response = asyncio.run(wrapper.publish_batch_to_sqs([{"MessageBody": "a"}]))
+
+    assert len(client.batches) == 2
+    assert response["Failed"] == []
+
+
+def test_fifo_batches_are_sent_in_order():
+    client = FakeSQSClient()
+    wrapper = _get_wrapper(client, queue_url="https://sqs/queue.fifo")
+    messages = [
+        {"MessageBody": str(index), "MessageGroupId": "group"} for index in range(35)
+    ]
+
+    asyncio.run(wrapper.publish_batch_to_sqs(messages))
+
+    sent = [int(entry_id) for batch in client.batches for entry_id in batch]
+    assert sent == list(range(35))
+
+
+def test_publish_to_sqs_raises_for_oversized_messages():
+    wrapper = _get_wrapper(FakeSQSClient())
+
+    with pytest.raises(Exception):
+        asyncio.run(
+            wrapper.publish_to_sqs(messages=[{"MessageBody": "x" * 300 * 1024}])
+        )
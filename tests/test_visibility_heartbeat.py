@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from commonutils.wrappers.aws.sqs import BaseSQSWrapper
+from commonutils.wrappers.aws.sqs.visibility_heartbeat import VisibilityHeartbeat
+
+
+class FakeSQSClient:
+    def __init__(self, messages=None):
+        self.messages = list(messages or [])
+        self.extended = []
+        self.deleted = []
+
+    async def receive_message(self, **kwargs):
+        if not self.messages:
+            # long-poll that never returns
+            await asyncio.Event().wait()
+        messages = self.messages[: kwargs["MaxNumberOfMessages"]]
+        self.messages = self.messages[len(messages) :]
+        return {"Messages": messages}
+
+    async def change_message_visibility_batch(self, QueueUrl, Entries):
+        self.extended.append([entry["ReceiptHandle"] for entry in Entries])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    async def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+
+
+def _get_wrapper(client):
+    wrapper = BaseSQSWrapper({"SQS": {}})
+    wrapper.client = client
+    wrapper.queue_url = "https://sqs/queue"
+    return wrapper
+
+
+def test_extensions_are_batched_by_10():
+    client = FakeSQSClient()
+    heartbeat = VisibilityHeartbeat(_get_wrapper(client), visibility_timeout=30)
+    for index in range(25):
+        heartbeat.track(str(index))
+
+    asyncio.run(heartbeat.extend())
+
+    assert sorted(len(batch) for batch in client.extended) == [5, 10, 10]
+
+
+def test_messages_are_not_extended_past_12_hours():
+    client = FakeSQSClient()
+    heartbeat = VisibilityHeartbeat(
+        _get_wrapper(client), visibility_timeout=30, max_extension=24 * 60 * 60
+    )
+    heartbeat.track("old")
+    heartbeat.track("new")
+    heartbeat._in_flight["old"] = time.monotonic() - 12 * 60 * 60 + 10
+
+    asyncio.run(heartbeat.extend())
+
+    assert heartbeat.max_extension == VisibilityHeartbeat.MAX_EXTENSION_IN_SECONDS
+    assert client.extended == [["new"]]
+    assert "old" not in heartbeat._in_flight
+
+
+def test_whole_received_batch_is_tracked_in_sequential_mode():
+    messages = [
+        {"ReceiptHandle": str(index), "Body": '{"n": %d}' % index} for index in range(3)
+    ]
+    client = FakeSQSClient(messages)
+    wrapper = _get_wrapper(client)
+    tracked = []
+
+    class Handler:
+        @classmethod
+        async def handle_event(cls, body):
+            tracked.append(sorted(wrapper._visibility_heartbeat._in_flight))
+            await asyncio.sleep(0)
+
+    async def _run():
+        task = asyncio.ensure_future(
+            wrapper.subscribe_all(Handler, extend_visibility=True, max_no_of_messages=3)
+        )
+        while len(client.deleted) < 3:
+            await asyncio.sleep(0.01)
+        in_flight = dict(wrapper._visibility_heartbeat._in_flight)
+        task.cancel()
+        return in_flight
+
+    in_flight = asyncio.run(_run())
+    # messages 2 and 3 are extended while message 1 is handled
+    assert tracked[0] == ["0", "1", "2"]
+    assert tracked[1] == ["1", "2"]
+    assert in_flight == {}